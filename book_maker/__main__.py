@@ -1,10 +1,16 @@
 import yaml
 
-with open("data.yml", encoding="utf-8") as data:
-    toc = yaml.safe_load(data)
-
-print(toc)
-for section_info in toc:
-    for section, chapters in section_info.items():
-        for chapter in chapters:
-            print(section, chapter)
+
+def main() -> None:
+    with open("data.yml", encoding="utf-8") as data:
+        toc = yaml.safe_load(data)
+
+    print(toc)
+    for section_info in toc:
+        for section, chapters in section_info.items():
+            for chapter in chapters:
+                print(section, chapter)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,12 @@
 Code for AI
 """
 import asyncio
+from typing import AsyncIterator, Optional
 
 import dotenv
 from openai import AsyncOpenAI
 from openai._base_client import AsyncPaginator
+from openai._types import NOT_GIVEN
 from openai.pagination import AsyncPage
 from openai.types import FileObject
 
@@ -15,8 +17,9 @@ dotenv.load_dotenv()
 
 
 class AIFileSystem:
-    def __init__(self, assistant_id: str = None):
-        self.client = AsyncOpenAI()
+    def __init__(self, assistant_id: str = None, client: Optional[AsyncOpenAI] = None):
+        self.client = client or AsyncOpenAI()
+        self.requests = 0
 
     async def create(self, filename: str, file_bytes: bytes, content_type: str):
         """Upload one file"""
@@ -27,6 +30,7 @@ class AIFileSystem:
         # (filename, file( or bytes), content_type)
         file = (filename, file_bytes, content_type)
 
+        self.requests += 1
         file = await self.client.files.create(
             file=file,
             # "fine-tune" or "assistants"
@@ -36,6 +40,7 @@ class AIFileSystem:
         return file
 
     async def delete(self, file_id: str):
+        self.requests += 1
         result = await self.client.files.delete(
             file_id=file_id,
         )
@@ -43,6 +48,7 @@ class AIFileSystem:
         return result
 
     async def retrieve(self, file_id: str):
+        self.requests += 1
         result = await self.client.files.retrieve(
             file_id=file_id,
         )
@@ -50,10 +56,28 @@ class AIFileSystem:
         return result
 
     async def list(self) -> AsyncPaginator[FileObject, AsyncPage[FileObject]]:
+        """First page only, see list_all"""
+        self.requests += 1
         result = await self.client.files.list()
         write_json_to_logs(result, "file_list")
         return result
 
+    async def list_all(self, purpose: Optional[str] = None, page_size: int = 100) -> AsyncIterator[FileObject]:
+        """Every file, following the `after` cursor while the API says there are more pages."""
+        after: Optional[str] = None
+        while True:
+            query: dict[str, object] = {"limit": page_size}
+            if after:
+                query["after"] = after
+            self.requests += 1
+            page = await self.client.files.list(purpose=purpose or NOT_GIVEN, extra_query=query)
+            for file in page.data:
+                yield file
+            # the client's page type doesn't paginate yet, has_more comes through as an extra field
+            if not page.data or not getattr(page, "has_more", False):
+                return
+            after = page.data[-1].id
+
     # TODO retrieve contents
 
 
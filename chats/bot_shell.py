@@ -1,8 +1,9 @@
 """
 Code for AI
 """
+import asyncio
+import inspect
 import json
-import time
 from typing import Any, List, Optional
 
 import untruncate_json
@@ -10,14 +11,18 @@ from openai import AsyncOpenAI
 from openai.types.beta import Assistant, Thread, ThreadDeleted
 from openai.types.beta.threads import Run, ThreadMessage, run_create_params
 
+from chats.run_waiter import RunWaiter
+from chats.telemetry import TELEMETRY, current_record, tracked
+from chats.tool_code.pypi_cache import PyPICache
+from chats.tool_code.pypi_index import PyPINameIndex
 from chats.tool_code.pypi_info import PyPIChecker
-from chats.tool_code.text_shorteners import count_tokens, readability_scores, word_count
+from chats.tool_code.tools import TOOLS
 from chats.utils import SetEncoder, write_json_to_logs
 
 
 class Bot:
     def __init__(self, assistant_id: str = None, model: str = "gpt-3.5-turbo"):
-        self.client = AsyncOpenAI()
+        self.client = AsyncOpenAI(http_client=TELEMETRY.http_client())
         self.model = model
 
         self.assistant_id = assistant_id
@@ -30,11 +35,13 @@ class Bot:
         write_json_to_logs(self.assistant, "assistant")
         return self.assistant
 
+    @tracked("retrieve_assistant")
     async def retrieve_assistant(self) -> Assistant:
         self.assistant = await self.client.beta.assistants.retrieve(assistant_id=self.assistant_id)
         write_json_to_logs(self.assistant, "assistant")
         return self.assistant
 
+    @tracked("create_assistant")
     async def create_assistant(self, bot_name: str, instructions: str) -> Assistant:
         self.assistant = await self.client.beta.assistants.create(
             name=bot_name,
@@ -45,6 +52,7 @@ class Bot:
         write_json_to_logs(self.assistant, "assistant")
         return self.assistant
 
+    @tracked("update_instructions")
     async def update_instructions(self, instuctions: str):
         assistant = await self.client.beta.assistants.update(
             self.assistant.id,
@@ -75,11 +83,23 @@ class Bot:
 
 
 class BotConversation:
-    def __init__(self, assistant: Assistant, thread: Optional[Thread] = None):
-        self.client = AsyncOpenAI()
+    def __init__(self, assistant: Assistant, thread: Optional[Thread] = None, wait_deadline: Optional[float] = 600.0):
+        self.client = AsyncOpenAI(http_client=TELEMETRY.http_client())
         self.model = "gpt-3.5-turbo"
         self.assistant: Assistant = assistant
 
+        # How long to wait on one run before giving up, None to wait forever.
+        self.wait_deadline = wait_deadline
+        self.last_wait: Optional[RunWaiter] = None
+
+        # Seconds one tool call may take, by tool name, before the bot is told it timed out.
+        self.tool_timeout = 60.0
+        self.tool_timeouts: dict[str, float] = {}
+        # passed to tools that take them as keyword only arguments, e.g. code_index for search_code
+        self.tool_context: dict[str, Any] = {}
+        # one PyPI cache for the whole conversation, the file is only opened by the first lookup
+        self.pypi_cache = PyPICache()
+
         self.thread: Optional[Thread] = thread
         if self.thread:
             self.thread_id = thread.id
@@ -92,6 +112,7 @@ class BotConversation:
         write_json_to_logs(self.assistant, "thread")
         return self.thread
 
+    @tracked("create_thread")
     async def create_thread(self) -> Thread:
         """Create thread. It will persist with messages for 30 days."""
         self.thread = await self.client.beta.threads.create()
@@ -99,14 +120,21 @@ class BotConversation:
         write_json_to_logs(self.thread, "thread")
         return self.thread
 
-    async def delete_thread(self) -> ThreadDeleted:
-        """Clean up thread because we can't list them later!"""
-        result = await self.client.beta.threads.delete(self.thread.id)
+    async def delete_thread(self, thread_id: Optional[str] = None) -> ThreadDeleted:
+        """Clean up thread because we can't list them later!
+
+        Args:
+            thread_id(str): A thread this conversation moved on from, defaults to the current thread.
+        """
+        thread_id = thread_id or self.thread.id
+        result = await self.client.beta.threads.delete(thread_id)
         write_json_to_logs(result, "delete_thread")
-        self.thread = None
-        self.thread_id = None
+        if thread_id == self.thread_id:
+            self.thread = None
+            self.thread_id = None
         return result
 
+    @tracked("create_run")
     async def create_run(self, tools: Optional[List[run_create_params.Tool]] = None) -> Run:
         """This is a request to chatbot where the chatbot might make some call backs before
         responding with the final new message"""
@@ -118,24 +146,24 @@ class BotConversation:
         write_json_to_logs(run, "run")
         return run
 
+    @tracked("run")
     async def poll_the_run(self, run: Run, tool: Optional[str] = None) -> Run:
         """Handle polling.
 
-        TODO: Need pointers to the tool handlers!
+        Sleeps with asyncio and adaptive backoff, so other conversations keep running while this one waits.
         """
         if tool:
             tool_tag = f"_{tool}"
         else:
             tool_tag = ""
 
+        waiter = RunWaiter(deadline=self.wait_deadline)
+        self.last_wait = waiter
         while True:
             if run.status in ("queued", "in_progress"):
                 # Don't log this. Too noisy.
                 print(".", end="")
-                time.sleep(1)
-            elif run.status == "failed":
-                write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
-                raise Exception(run.last_error)
+                await waiter.pause()
             elif run.status == "completed":
                 # Don't log this. Too noisy, it only has timing & repeats other run info
                 # write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
@@ -143,31 +171,92 @@ class BotConversation:
             elif run.status == "cancelling":
                 print("Cancelling, this isn't going well.")
                 write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
-                time.sleep(1)
-            elif run.status == "cancelled":
-                print("Cancelled, did you do that?")
-                write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
-                exit()
-            elif run.status == "expired":
-                print("Took too long for us to reply with the output of a function/tool")
-                write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
-                exit()
+                await waiter.pause()
             elif run.status == "requires_action":
                 write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
-                await self.process_tool_calls(run)
+                # polls the run after submitting, so this is finished.
+                run = await self.process_tool_calls(run)
+                break
             else:
-                raise Exception(f"Out of bounds, don't know what to do with run.status {run.status}")
+                self.handle_stopped_run(run, tool_tag)
             # poll
             run = await self.check_run(run)
+            waiter.retrieve_calls += 1
 
+        self.record_wait(run, waiter)
         return run
 
+    def record_wait(self, run: Run, waiter: RunWaiter) -> None:
+        """Add time spent polling and queued to the telemetry of the call in progress."""
+        record = current_record()
+        if record is None:
+            return
+        record.poll_seconds = round(record.poll_seconds + waiter.slept, 3)
+        if getattr(run, "started_at", None) and getattr(run, "created_at", None) and not record.queue_seconds:
+            record.queue_seconds = run.started_at - run.created_at
+
+    def handle_stopped_run(self, run: Run, tool_tag: str = "") -> None:
+        """Run stopped without completing."""
+        if run.status == "failed":
+            write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
+            raise Exception(run.last_error)
+        if run.status == "cancelled":
+            print("Cancelled, did you do that?")
+            write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
+            exit()
+        if run.status == "expired":
+            print("Took too long for us to reply with the output of a function/tool")
+            write_json_to_logs(run, f"run_poll_{run.status}{tool_tag}")
+            exit()
+        raise Exception(f"Out of bounds, don't know what to do with run.status {run.status}")
+
+    def supports_streaming(self) -> bool:
+        """Newer openai clients can stream run events."""
+        return "stream" in inspect.signature(self.client.beta.threads.runs.create).parameters
+
+    @tracked("run")
+    async def stream_run(self, tools: Optional[List[run_create_params.Tool]] = None) -> Run:
+        """Create a run and follow its status pushes instead of polling.
+
+        Falls back to create_run + poll_the_run if the installed openai client can't stream runs.
+        """
+        if not self.supports_streaming():
+            run = await self.create_run(tools=tools)
+            return await self.poll_the_run(run)
+
+        waiter = RunWaiter(deadline=self.wait_deadline)
+        self.last_wait = waiter
+        stream = await self.client.beta.threads.runs.create(
+            thread_id=self.thread_id,
+            assistant_id=self.assistant.id,
+            tools=tools,
+            stream=True,
+        )
+        while True:
+            run = await waiter.follow(stream)
+            if run is None:
+                raise Exception("Run event stream ended before the run did")
+            if run.status == "completed":
+                self.record_wait(run, waiter)
+                return run
+            if run.status != "requires_action":
+                self.handle_stopped_run(run, "_stream")
+            write_json_to_logs(run, f"run_stream_{run.status}")
+            tool_outputs = await self.run_tool_calls(run)
+            stream = await self.client.beta.threads.runs.submit_tool_outputs(
+                thread_id=self.thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs,
+                stream=True,
+            )
+
     async def check_run(self, run: Run) -> Run:
         """This is a request to chatbot where the chatbot might make some call backs before
         responding with the final new message"""
         run = await self.client.beta.threads.runs.retrieve(thread_id=self.thread_id, run_id=run.id)
         return run
 
+    @tracked("add_user_message")
     async def add_user_message(self, content: str) -> ThreadMessage:
         """Add a persistent message. Messages persist 30 days, same as thread"""
         message = await self.client.beta.threads.messages.create(
@@ -182,6 +271,7 @@ class BotConversation:
         write_json_to_logs(messages, "messages")
         return messages
 
+    @tracked("list_messages")
     async def display_most_recent_bot_message(self) -> Optional[Any]:
         messages = await self.client.beta.threads.messages.list(thread_id=self.thread_id, order="desc")
         # all_messages = []
@@ -193,47 +283,7 @@ class BotConversation:
         # return all_messages
 
     async def process_tool_calls(self, run: Run) -> Run:
-        results = []
-        for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-            name = tool_call.function.name
-            # TODO: Sometimes this isn't really json!
-            args_text = tool_call.function.arguments
-            try:
-                arguments = json.loads(args_text)
-            except json.decoder.JSONDecodeError:
-                print("Truncated json!")
-                arguments = json.loads(untruncate_json.complete(args_text))
-
-            print(arguments)
-            print(name)
-            if name == "package_exists":
-                result = await PyPIChecker().package_exists(arguments["package_name"])
-            elif name == "packages_or_variant_exist":
-                result = await PyPIChecker().packages_or_variant_exist(arguments["package_names"])
-            elif name == "package_is_stdlib":
-                result = PyPIChecker().package_is_stdlib(arguments["package_names"])
-            elif name == "packages_exists":
-                result = await PyPIChecker().packages_exist(arguments["package_names"])
-            elif name == "describe_packages":
-                result = await PyPIChecker().describe_packages(arguments["package_names"])
-            elif name == "count_tokens":
-                result = count_tokens(arguments["text"])
-            elif name == "readability_scores":
-                result = readability_scores(arguments["text"])
-            elif name == "word_count":
-                result = word_count(arguments["text"])
-            else:
-                raise Exception(f"Unknown function name {name}")
-            print(result)
-            print("-----")
-            tool_result = {
-                "tool_call_id": tool_call.id,
-                "output": json.dumps(result, cls=SetEncoder),
-            }
-            write_json_to_logs(tool_call, f"tool_call_{name}")
-            write_json_to_logs(result, f"tool_result_{name}")
-
-            results.append(tool_result)
+        results = await self.run_tool_calls(run)
 
         # submit all tool calls as batch to runs, not the *run*
         post_tool_run = await self.client.beta.threads.runs.submit_tool_outputs(
@@ -244,6 +294,53 @@ class BotConversation:
         post_poll_run = await self.poll_the_run(post_tool_run)
         return post_poll_run
 
+    @tracked("tool_calls")
+    async def run_tool_calls(self, run: Run) -> list[dict[str, str]]:
+        """Run the tools the assistant asked for, return outputs ready to submit.
+
+        The calls in one step are independent, so they all run at once and the step
+        takes as long as the slowest call.
+        """
+        # one connection pool for every pypi tool call in this step, cached across sessions
+        lookups = self.pypi_cache.stats()["lookups"]
+        name_index = PyPINameIndex.load_if_exists()
+        async with PyPIChecker(cache=self.pypi_cache, name_index=name_index) as checker:
+            tool_calls = run.required_action.submit_tool_outputs.tool_calls
+            results = await asyncio.gather(*(self.run_tool_call(tool_call, checker) for tool_call in tool_calls))
+        if self.pypi_cache.stats()["lookups"] > lookups:
+            print(f"PyPI cache: {self.pypi_cache.stats()}")
+        if name_index:
+            name_index.close()
+        return list(results)
+
+    async def run_tool_call(self, tool_call: Any, checker: PyPIChecker) -> dict[str, str]:
+        name = tool_call.function.name
+        # TODO: Sometimes this isn't really json!
+        args_text = tool_call.function.arguments
+        try:
+            arguments = json.loads(args_text)
+        except json.decoder.JSONDecodeError:
+            print("Truncated json!")
+            arguments = json.loads(untruncate_json.complete(args_text))
+
+        print(arguments)
+        print(name)
+        timeout = self.tool_timeouts.get(name, self.tool_timeout)
+        try:
+            call = TOOLS.call(name, arguments, checker=checker, **self.tool_context)
+            result = await asyncio.wait_for(call, timeout=timeout)
+        except asyncio.TimeoutError:
+            result = {"error": f"{name} took longer than {timeout} seconds"}
+        print(result)
+        print("-----")
+        tool_result = {
+            "tool_call_id": tool_call.id,
+            "output": json.dumps(result, cls=SetEncoder),
+        }
+        write_json_to_logs(tool_call, f"tool_call_{name}")
+        write_json_to_logs(result, f"tool_result_{name}")
+        return tool_result
+
     async def submit_tool_results(self, thread_id: str, run: Run, tool_responses: dict[str, Any]):
         run = await self.client.beta.threads.runs.submit_tool_outputs(
             thread_id=thread_id,
@@ -54,6 +54,27 @@ def calculate_thread_file_name(bot_name: str, thread_id: str):
     return file_path
 
 
+def replace_thread_file(bot_name: str, old_thread_id: str, thread: Thread) -> bool:
+    """
+    Point a pickled conversation at the thread that replaced its old one.
+
+    Args:
+        bot_name(str): The name of the bot.
+        old_thread_id(str): The thread the conversation moved on from.
+        thread(Thread): The new thread.
+
+    Returns:
+        False if the old thread wasn't pickled, so there was nothing to replace.
+    """
+    old_path = calculate_thread_file_name(bot_name, old_thread_id)
+    if not os.path.exists(old_path):
+        return False
+    with open(calculate_thread_file_name(bot_name, thread.id), "wb") as convo_file:
+        pickle.dump(thread, convo_file)
+    os.remove(old_path)
+    return True
+
+
 async def get_persistent_bot_convo(bot: Bot, thread_id: str) -> BotConversation:
     # make folder with name of bot if it doesn't exist
     safe_bot_name = bot.assistant.name.replace(" ", "_").lower()
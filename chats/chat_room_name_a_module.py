@@ -10,11 +10,10 @@ import asyncio
 import traceback
 
 import dotenv
-from openai.types import FunctionDefinition
-from openai.types.beta.threads.run import ToolAssistantToolsFunction
 
 from chats.bots import get_persistent_bot, get_persistent_bot_convo
 from chats.chatroom import ChatroomLog
+from chats.tool_code.tools import TOOLS
 
 dotenv.load_dotenv()
 
@@ -71,48 +70,7 @@ If not specified, you'll think up 10. Please answer in a list, e.g. [\n'requests
             print(for_judgement)
             instructions_for_judge = await judge_convo.add_user_message(for_judgement)
 
-            tools = [
-                ToolAssistantToolsFunction(
-                    function=FunctionDefinition(
-                        name="packages_or_variant_exist",
-                        description="Check if a package (or close variants) exists on pypi",
-                        parameters={
-                            "type": "object",
-                            "properties": {
-                                "package_names": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                    },
-                                    "description": "Names of packages we want to check for existence",
-                                },
-                            },
-                            "required": ["package_names"],
-                        },
-                    ),
-                    type="function",
-                ),
-                ToolAssistantToolsFunction(
-                    function=FunctionDefinition(
-                        name="package_is_stdlib",
-                        description="Check if packages names conflict with stdlib for any version of python",
-                        parameters={
-                            "type": "object",
-                            "properties": {
-                                "package_names": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                    },
-                                    "description": "Names of packages we want to check for conflict with stdlib",
-                                },
-                            },
-                            "required": ["package_names"],
-                        },
-                    ),
-                    type="function",
-                ),
-            ]
+            tools = TOOLS.assistant_tools("packages_or_variant_exist", "package_is_stdlib")
 
             # Submit user req to agent. Run may involve bot asking to use `functions`
             judge_run = await judge_convo.create_run(tools=tools)
@@ -7,17 +7,35 @@ Pypi Name Judge Bot - evaluates names
 """
 
 import asyncio
+import importlib.util
+import os
 import traceback
+from typing import Any, Optional
 
 import dotenv
-from openai.types import FunctionDefinition
-from openai.types.beta.threads.run import ToolAssistantToolsFunction
+from openai.types.beta.threads import ThreadMessage
 
 from chats.bots import get_persistent_bot, get_persistent_bot_convo
 from chats.chatroom import ChatroomLog
+from chats.tool_code.tools import TOOLS
+from chats.utils import user_cache_dir
 
 dotenv.load_dotenv()
 
+
+def semantic_cache_path() -> str:
+    return os.path.join(user_cache_dir(), "package_suggestions.json")
+
+
+def open_semantic_cache() -> Optional[Any]:
+    """Answers to earlier, similarly worded requests. None if numpy isn't installed."""
+    if importlib.util.find_spec("numpy") is None:
+        return None
+    from chats.semantic_cache import SemanticCache
+
+    return SemanticCache.load(semantic_cache_path())
+
+
 if __name__ == "__main__":
 
     async def main():
@@ -68,26 +86,39 @@ Polars and Pandas are good packages for dataframes.
                 "version number. For example, I need pylint, ruff and broot and dua, each at version 1.0.0 or higher."
             )
             print(package_description)
-            start_message = await name_convo.add_user_message(package_description)
-            chatroom.add_starting_user_message(start_message)
-
-            # TODO: message is an uploaded file.
-
-            # Submit user req to agent. Run may involve bot asking to use `functions`
-            run = await name_convo.create_run()
-
-            # check run over and over to see if it blew up or finished.
-            run = await name_convo.poll_the_run(run)
-
-            # retrieve new messages that appear via threads.messages.list()
-            # how do we know they're new?
-            # Optionally look at run steps to see if Bot was using code_interpretor, dall-e or bing
 
-            # Show everything. This makes an API call
-            bots_ideas_message = await name_convo.display_most_recent_bot_message()
-            chatroom.add_bot_message(name_bot, bots_ideas_message)
+            # A rephrased request gets the answer to the earlier one. Nothing is added to the thread and there is
+            # no run, so the thread isn't left with an unanswered message.
+            suggestions = open_semantic_cache()
+            earlier = suggestions.lookup(package_description) if suggestions else None
+            if earlier:
+                print(f"Answered before ({earlier.similarity:.2f} similar): {earlier.prompt}")
+                ideas = ThreadMessage.model_validate(earlier.answer).content[0].text.value
+                chatroom.add_cached_answer(name_bot, package_description, ideas, earlier.prompt)
+            else:
+                start_message = await name_convo.add_user_message(package_description)
+                chatroom.add_starting_user_message(start_message)
+
+                # TODO: message is an uploaded file.
+
+                # Submit user req to agent. Run may involve bot asking to use `functions`
+                run = await name_convo.create_run()
+
+                # check run over and over to see if it blew up or finished.
+                run = await name_convo.poll_the_run(run)
+
+                # retrieve new messages that appear via threads.messages.list()
+                # how do we know they're new?
+                # Optionally look at run steps to see if Bot was using code_interpretor, dall-e or bing
+
+                # Show everything. This makes an API call
+                bots_ideas_message = await name_convo.display_most_recent_bot_message()
+                if suggestions is not None:
+                    suggestions.add(package_description, bots_ideas_message.model_dump(mode="json"))
+                    suggestions.save(semantic_cache_path())
+                chatroom.add_bot_message(name_bot, bots_ideas_message)
+                ideas = bots_ideas_message.content[0].text.value
 
-            ideas = bots_ideas_message.content[0].text.value
             print(ideas)
             # "- The project name must not be  too similar to an existing project and may be confusable. " \
             for_judgement = (
@@ -98,48 +129,7 @@ Polars and Pandas are good packages for dataframes.
             print(for_judgement)
             instructions_for_judge = await judge_convo.add_user_message(for_judgement)
 
-            tools = [
-                ToolAssistantToolsFunction(
-                    function=FunctionDefinition(
-                        name="packages_exists",
-                        description="Check if a package exists on pypi",
-                        parameters={
-                            "type": "object",
-                            "properties": {
-                                "package_names": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                    },
-                                    "description": "Names of packages we want to check for existence",
-                                },
-                            },
-                            "required": ["package_names"],
-                        },
-                    ),
-                    type="function",
-                ),
-                ToolAssistantToolsFunction(
-                    function=FunctionDefinition(
-                        name="describe_packages",
-                        description="Get some descriptive info about packages",
-                        parameters={
-                            "type": "object",
-                            "properties": {
-                                "package_names": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                    },
-                                    "description": "Names of packages we want descriptive info about",
-                                },
-                            },
-                            "required": ["package_names"],
-                        },
-                    ),
-                    type="function",
-                ),
-            ]
+            tools = TOOLS.assistant_tools("packages_exists", "describe_packages")
 
             # Submit user req to agent. Run may involve bot asking to use `functions`
             judge_run = await judge_convo.create_run(tools=tools)
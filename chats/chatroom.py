@@ -48,6 +48,13 @@ class ChatroomLog:
                 prompt = ""
             f.write(f"\n## {bot.assistant.name}:\n" f"{prompt}" f"\n{message.content[0].text.value}\n")
 
+    def add_cached_answer(self, bot: Bot, request: str, answer: str, earlier_request: str):
+        """A request answered from the semantic cache, the bot's thread never saw it."""
+        self.messages.append(answer)
+        with open(self.filename, "a", encoding="utf-8", errors="backslashreplace") as f:
+            f.write(f"## User:\n{request}\n\n")
+            f.write(f"\n## {bot.assistant.name} (cached answer to: {earlier_request}):\n" f"\n{answer}\n")
+
     def add_python_exception(self, exception: Exception, message: str):
         self.messages.append(message)
         with open(self.filename, "a", encoding="utf-8", errors="backslashreplace") as f:
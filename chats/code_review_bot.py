@@ -2,6 +2,7 @@
 Python build script bot.
 """
 
+import argparse
 import asyncio
 import traceback
 
@@ -12,6 +13,10 @@ from openai.types.beta.threads.run import ToolAssistantToolsRetrieval
 from chats.ai_filesystem import AIFileSystem
 from chats.bots import get_persistent_bot, get_persistent_bot_convo
 from chats.chatroom import ChatroomLog
+from chats.file_sync import FileSync, SyncManifest, SyncReport
+from chats.thread_budget import ThreadBudget
+from chats.tool_code.code_index import open_index
+from chats.tool_code.tools import TOOLS
 
 dotenv.load_dotenv()
 
@@ -38,22 +43,17 @@ def get_python_files(base_path):
     return python_files
 
 
-async def upload_all_files(path) -> str:
-    python_files = get_python_files("E:/github/untruncate_json")
-    ai_file_system = AIFileSystem()
-    for path, file_name in python_files.items():
-        with open(path, "rb") as contents:
-            try:
-                # Skip empties.
-                the_bytes = contents.read()
-                if len(the_bytes) > 0:
-                    results = await ai_file_system.create(file_name, the_bytes, "py")
-                    print(results)
-            except openai.BadRequestError as bad:
-                print(bad)
-                raise
-
-    exit()
+async def upload_all_files(path, concurrency: int = 4) -> SyncReport:
+    """Upload new and changed python files, delete remote copies that went stale."""
+    python_files = get_python_files(path)
+    file_sync = FileSync(AIFileSystem(), SyncManifest.for_folder(path), concurrency=concurrency)
+    try:
+        report = await file_sync.sync(python_files)
+    except openai.BadRequestError as bad:
+        print(bad)
+        raise
+    print(f"Synced {path}: {report}")
+    return report
 
 
 async def review_code(path) -> str:
@@ -61,11 +61,9 @@ async def review_code(path) -> str:
     fs = AIFileSystem()
     file_ids = []
     files = []
-    for key, value in await fs.list():
-        if key == "data":
-            for file in value:
-                files.append(file)
-                file_ids.append(file.id)
+    async for file in fs.list_all(purpose="assistants"):
+        files.append(file)
+        file_ids.append(file.id)
 
     instructions = """You review python code."""
     review_bot = await get_persistent_bot(
@@ -80,6 +78,8 @@ async def review_code(path) -> str:
         await review_bot.enable_file(file_ids)
 
     review_convo = await get_persistent_bot_convo(review_bot, "")
+    # every run re-reads the whole thread, past the budget carry on in a new thread from a summary
+    budget = ThreadBudget(review_convo, max_tokens=6000, policy="summarize")
 
     chatroom = ChatroomLog("Review Code", review_convo.thread_id)
     chatroom.write_header(review_bot)
@@ -99,13 +99,14 @@ async def review_code(path) -> str:
         "Do you see any functions here that could be written better, please show me the refactor. Thanks!"
     )
     print(initial_message)
-    start_message = await review_convo.add_user_message(initial_message)
+    start_message = await budget.add_user_message(initial_message)
     chatroom.add_starting_user_message(start_message)
 
     # Dance to get a reply from the bot.
+    await budget.before_run()
     run = await review_convo.create_run(tools=tools)
     run = await review_convo.poll_the_run(run)
-    final_message = await review_convo.display_most_recent_bot_message()
+    final_message = await budget.latest_reply()
     chatroom.add_bot_message(review_bot, final_message)
 
     final_message_text = final_message.content[0].text.value
@@ -125,14 +126,18 @@ async def review_code(path) -> str:
                 f"of python files. Please look at the file `{file.filename}` "
                 f"and provide suggestions for improvement."
             )
-            start_message = await review_convo.add_user_message(initial_message)
+            start_message = await budget.add_user_message(initial_message)
             chatroom.add_starting_user_message(start_message)
 
             # All the bot requests.
+            report = await budget.before_run()
+            if report.rebuilt:
+                print(f"Moved to thread {report.thread_id}, {report.thread_tokens} tokens")
             run = await review_convo.create_run(tools=tools)
             run = await review_convo.poll_the_run(run)
-            final_message = await review_convo.display_most_recent_bot_message()
+            final_message = await budget.latest_reply()
             chatroom.add_bot_message(review_bot, final_message)
+            print(f"Thread holds {report.thread_tokens} tokens, {report.saved} saved this run")
 
             final_message_text = final_message.content[0].text.value
             print(final_message_text)
@@ -142,9 +147,59 @@ async def review_code(path) -> str:
         chatroom.add_python_exception(ex, traceback.format_exc())
         print("Failed!")
         raise
+    print(f"{budget.tokens_saved} tokens saved over {len(budget.reports)} runs")
+
+
+async def review_code_locally(path) -> None:
+    """Like review_code, but the bot searches a local index of the code instead of uploaded files.
+
+    No upload, no 20 file limit, and only the chunks the bot asks for are billed.
+    """
+    code_index = open_index(path)
+    print(f"Code index {code_index.stats()}")
+    review_bot = await get_persistent_bot(
+        bot_name="Python Code Review bot (local search)",
+        bot_instructions="You review python code. Use search_code to find the code you need to see.",
+        model="gpt-3.5-turbo-1106",
+    )
+    review_convo = await get_persistent_bot_convo(review_bot, "")
+    review_convo.tool_context["code_index"] = code_index
+    budget = ThreadBudget(review_convo, max_tokens=6000, policy="summarize")
+
+    chatroom = ChatroomLog("Review Code", review_convo.thread_id)
+    chatroom.write_header(review_bot)
+    tools = TOOLS.assistant_tools("search_code")
+    try:
+        for file_name in sorted(code_index.files):
+            if any(skip in file_name for skip in ("main", "version", "init")):
+                continue
+            print(f"Working on {file_name}")
+            start_message = await budget.add_user_message(
+                f"Please look at the code in `{file_name}` and provide suggestions for improvement."
+            )
+            chatroom.add_starting_user_message(start_message)
+
+            await budget.before_run()
+            run = await review_convo.create_run(tools=tools)
+            run = await review_convo.poll_the_run(run)
+            final_message = await budget.latest_reply()
+            chatroom.add_bot_message(review_bot, final_message)
+
+            print(final_message.content[0].text.value)
+            if input("continue?") != "y":
+                break
+    except Exception as ex:
+        chatroom.add_python_exception(ex, traceback.format_exc())
+        print("Failed!")
+        raise
+    print(f"{budget.tokens_saved} tokens saved over {len(budget.reports)} runs")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m chats.code_review_bot")
+    parser.add_argument("path", nargs="?", default="E:/github/untruncate_json")
+    parser.add_argument("--local", action="store_true", help="search a local index of the code instead of uploading it")
+    args = parser.parse_args()
     # Python 3.7+
-    asyncio.run(review_code("E:/github/untruncate_json"))
+    asyncio.run(review_code_locally(args.path) if args.local else review_code(args.path))
     print("Done!")
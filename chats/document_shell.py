@@ -5,31 +5,113 @@ Need separate document for abstractions over a raw document
 """
 
 import asyncio
-from typing import Optional
+import contextlib
+import functools
+from typing import Callable, Literal, Optional
 
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
 
+from chats.response_cache import ResponseCache, response_cache
+from chats.stream_sink import MarkdownStreamSink
+from chats.telemetry import TELEMETRY
+from chats.token_utils import count_tokens
+from chats.transcript import Transcript
+
 load_dotenv()
 
 
 class Document:
-    def __init__(self, seed: Optional[int] = None):
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        output_folder: Optional[str] = None,
+        namer: Optional[Callable[[str], str]] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+        context_tokens: int = 4097,
+        trim: Literal["window", "summary"] = "window",
+    ):
         self.exchange_template = "user: {{USER}}\n\nbot:"
-        self.document = ""
         self.seed = seed
-        self.client = AsyncOpenAI()
+        self.model = "text-davinci-003"
+        self.max_tokens = 1000
+        # prompt plus reply have to fit in the model's context, old turns make room
+        self.context_tokens = context_tokens
+        self.trim = trim
+        self.transcript = Transcript(token_counter or functools.partial(count_tokens, model=self.model))
+        self.client = AsyncOpenAI(http_client=TELEMETRY.http_client())
+        self.cache = cache
+        # each reply streams to its own markdown file, named by `namer` from its start when done
+        self.output_folder = output_folder
+        self.namer = namer
+        self.replies = 0
+        self.last_path: Optional[str] = None
 
-    async def prompt(self, text: str):
-        self.document = self.document + self.exchange_template.replace("{{USER}}", text)
-        stream = await self.client.completions.create(
-            model="text-davinci-003", prompt=self.document, stream=True, seed=self.seed, max_tokens=1000
+    @property
+    def document(self) -> str:
+        return self.transcript.render()
+
+    @document.setter
+    def document(self, text: str) -> None:
+        self.transcript.replace_segments([])
+        if text:
+            self.transcript.add(text, new_turn=True)
+
+    def completion_args(self) -> dict:
+        return {"model": self.model, "prompt": self.document, "seed": self.seed, "max_tokens": self.max_tokens}
+
+    async def summarize(self, text: str) -> str:
+        response = await self.client.completions.create(
+            model=self.model, prompt=f"Summarize this conversation:\n\n{text}\n\nSummary:", max_tokens=200
         )
-        parts = []
-        async for completion in stream:
-            parts.append(completion.choices[0].text)
-            print(completion.choices[0].text, end="")
-        self.document += "\n" + "".join(parts) + "\n"
+        return f"Earlier in this conversation: {response.choices[0].text.strip()}\n\n"
+
+    async def make_room(self) -> None:
+        budget = self.context_tokens - self.max_tokens
+        if self.transcript.total_tokens <= budget:
+            return
+        if self.trim == "summary":
+            await self.transcript.summarize_oldest(budget, self.summarize)
+        else:
+            self.transcript.trim(budget)
+
+    def name_for(self, head: str) -> str:
+        return self.namer(head) if self.namer else f"document_{str(self.replies).zfill(4)}"
+
+    async def prompt(self, text: str):
+        self.transcript.add(self.exchange_template.replace("{{USER}}", text), new_turn=True)
+        await self.make_room()
+        # without a seed the same prompt is meant to get a fresh reply
+        cache = (self.cache or response_cache()) if self.seed is not None else None
+        args = self.completion_args()
+        cached = cache.get("completions", args) if cache else None
+        self.replies += 1
+        with MarkdownStreamSink(self.output_folder, text) if self.output_folder else contextlib.nullcontext() as sink:
+            if cached is not None:
+                reply = cached["text"]
+                self.transcript.add(f"\n{reply}\n")
+                print(reply, end="")
+                if sink:
+                    sink.write(reply)
+            else:
+                with TELEMETRY.track("completion", bot="document", model=self.model) as record:
+                    stream = await self.client.completions.create(stream=True, **args)
+                    parts = []
+                    async for completion in stream:
+                        part = completion.choices[0].text
+                        parts.append(part)
+                        print(part, end="")
+                        if sink:
+                            sink.write(part)
+                    reply = "".join(parts)
+                    # streamed completions don't report usage, the transcript has the counts
+                    record.prompt_tokens = self.transcript.total_tokens
+                    record.completion_tokens = self.transcript.add(f"\n{reply}\n").tokens
+                if cache:
+                    cache.put("completions", args, {"text": reply})
+            if sink:
+                self.last_path = sink.finish(self.name_for(sink.head))
         return self.document
 
 
@@ -0,0 +1,143 @@
+"""
+Keep the files uploaded for the Assistants in step with a local folder.
+
+Every local file is hashed and compared with a manifest of what was uploaded
+before: its hash and the remote file id. Only new and changed files go up, a few
+at a time, and the copies they replace are deleted. Files deleted locally are
+deleted remotely. Only ids this folder's manifest recorded are ever deleted, files
+of other folders or projects with the same short names are left alone.
+
+A file whose remote copy disappeared, e.g. deleted in the web UI, is uploaded again.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from chats.ai_filesystem import AIFileSystem
+from chats.utils import user_cache_dir
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class SyncManifest:
+    """Remote file id and content hash for each synced file, by its short path."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.entries = json.load(file)
+
+    @classmethod
+    def for_folder(cls, root: str) -> "SyncManifest":
+        digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(user_cache_dir(), f"file_sync_{digest}.json"))
+
+    def record(self, name: str, file_id: str, digest: str, size: int) -> None:
+        self.entries[name] = {"file_id": file_id, "digest": digest, "bytes": size}
+
+    def save(self) -> None:
+        """Write to a temp file and rename, a crash mid write doesn't lose the manifest."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, indent=2)
+        os.replace(temp_path, self.path)
+
+
+@dataclass
+class SyncReport:
+    uploaded: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    bytes_uploaded: int = 0
+    bytes_saved: int = 0
+    requests: int = 0
+
+    @property
+    def requests_saved(self) -> int:
+        """Compared to uploading every file again, as upload_all_files used to."""
+        return len(self.unchanged)
+
+    def __str__(self) -> str:
+        return (
+            f"uploaded {len(self.uploaded)} ({self.bytes_uploaded:,} bytes), unchanged {len(self.unchanged)} "
+            f"({self.bytes_saved:,} bytes and {self.requests_saved} requests saved), deleted {len(self.deleted)}, "
+            f"{self.requests} requests"
+        )
+
+
+class FileSync:
+    def __init__(
+        self,
+        file_system: AIFileSystem,
+        manifest: SyncManifest,
+        concurrency: int = 4,
+        content_type: str = "py",
+    ):
+        self.file_system = file_system
+        self.manifest = manifest
+        self.concurrency = concurrency
+        self.content_type = content_type
+
+    async def sync(self, files: dict[str, str]) -> SyncReport:
+        """Sync `files`, full path to the name it gets remotely, as from get_python_files."""
+        report = SyncReport()
+        requests_before = self.file_system.requests
+        remote = {file.id: file async for file in self.file_system.list_all(purpose="assistants")}
+
+        local: dict[str, bytes] = {}
+        for path, name in files.items():
+            with open(path, "rb") as contents:
+                data = contents.read()
+            # the files endpoint refuses empty files
+            if data:
+                local[name] = data
+
+        to_upload = []
+        for name, data in local.items():
+            entry = self.manifest.entries.get(name)
+            if entry and entry["digest"] == file_digest(data) and entry["file_id"] in remote:
+                report.unchanged.append(name)
+                report.bytes_saved += len(data)
+            else:
+                to_upload.append(name)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def upload(name: str) -> None:
+            data = local[name]
+            async with semaphore:
+                file = await self.file_system.create(name, data, self.content_type)
+            self.manifest.record(name, file.id, file_digest(data), len(data))
+            report.uploaded.append(name)
+            report.bytes_uploaded += len(data)
+
+        async def delete(file_id: str) -> None:
+            async with semaphore:
+                await self.file_system.delete(file_id)
+            report.deleted.append(file_id)
+
+        recorded = {name: entry["file_id"] for name, entry in self.manifest.entries.items()}
+        try:
+            await asyncio.gather(*(upload(name) for name in to_upload))
+        finally:
+            # uploads that made it are recorded even if one failed
+            self.manifest.save()
+
+        for name in [name for name in self.manifest.entries if name not in local]:
+            del self.manifest.entries[name]
+        current = {entry["file_id"] for entry in self.manifest.entries.values()}
+        # copies this manifest uploaded that were replaced, or whose file was deleted locally
+        stale = [file_id for file_id in recorded.values() if file_id not in current and file_id in remote]
+        await asyncio.gather(*(delete(file_id) for file_id in stale))
+
+        self.manifest.save()
+        report.requests = self.file_system.requests - requests_before
+        return report
@@ -1,33 +1,215 @@
 """
-Get lists of what bots are available.
+Get lists of what bots are available, and clean up the ones left behind.
+
+Assistants and files are listed page by page until the API runs out. Threads
+can't be listed, the API has no endpoint for it, so threads are the ones pickled
+locally by `get_persistent_bot_convo`.
+
+Deletes run a few at a time. A 429 is retried after a jittered backoff, or after
+the Retry-After the API sent, so hundreds of deletes take seconds and back off
+together instead of failing together.
 """
 import asyncio
+import glob
+import os
+import pickle
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal, Optional
 
+import openai
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
 from openai.pagination import AsyncCursorPage
-from openai.types.beta import Assistant
+from openai.types import FileObject
+from openai.types.beta import Assistant, Thread
 
+from chats.ai_filesystem import AIFileSystem
 from chats.utils import show_json
 
 load_dotenv()
 
+Kind = Literal["assistants", "threads", "files"]
+
+# where get_persistent_bot_convo pickles threads, one folder per bot
+THREADS_FOLDER = os.path.dirname(__file__)
+
+
+@dataclass
+class LocalThread:
+    thread: Thread
+    bot_name: str
+    path: str
+
+    @property
+    def id(self) -> str:
+        return self.thread.id
+
+    @property
+    def created_at(self) -> int:
+        return self.thread.created_at
+
+
+def item_name(item: Any) -> str:
+    """What a name pattern is matched against: assistant name, file name, or a thread's bot."""
+    if isinstance(item, LocalThread):
+        return item.bot_name
+    if isinstance(item, FileObject):
+        return item.filename
+    return getattr(item, "name", None) or ""
+
+
+def selected(
+    item: Any, name_pattern: Optional[str] = None, older_than: Optional[float] = None, now: Optional[float] = None
+) -> bool:
+    """Name matches the regex `name_pattern` and it was created more than `older_than` seconds ago."""
+    if name_pattern is not None and not re.search(name_pattern, item_name(item)):
+        return False
+    if older_than is not None and item.created_at > (now or time.time()) - older_than:
+        return False
+    return True
+
+
+@dataclass
+class CleanupReport:
+    kind: str
+    dry_run: bool
+    matched: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+    retries: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        if self.dry_run:
+            return f"{self.kind}: {len(self.matched)} would be deleted (dry run)"
+        return (
+            f"{self.kind}: deleted {len(self.deleted)} of {len(self.matched)}, {len(self.failed)} failed, "
+            f"{self.retries} retries, {self.seconds:.1f}s"
+        )
+
 
 class InventoryClient:
-    def __init__(self):
-        self.client = AsyncOpenAI()
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        threads_folder: str = THREADS_FOLDER,
+        concurrency: int = 8,
+        max_attempts: int = 6,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.client = client or AsyncOpenAI()
+        # deletes do their own backing off, the client's retries would stack on top
+        self.deleting_client = self.client.with_options(max_retries=0)
         self.model = "gpt-3.5-turbo"
+        self.threads_folder = threads_folder
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
 
     async def list_assistants(self) -> AsyncCursorPage[Assistant]:
+        """First page only, see iter_assistants"""
         current_assistants = await self.client.beta.assistants.list()
         return current_assistants
 
+    async def iter_assistants(self, page_size: int = 100) -> AsyncIterator[Assistant]:
+        async for assistant in self.client.beta.assistants.list(limit=page_size):
+            yield assistant
+
+    async def iter_files(self, purpose: Optional[str] = None) -> AsyncIterator[FileObject]:
+        async for file in AIFileSystem(client=self.client).list_all(purpose=purpose):
+            yield file
+
+    async def iter_threads(self) -> AsyncIterator[LocalThread]:
+        for path in sorted(glob.glob(os.path.join(self.threads_folder, "*", "*.pkl"))):
+            with open(path, "rb") as thread_file:
+                thread = pickle.load(thread_file)
+            if isinstance(thread, Thread):
+                yield LocalThread(thread, os.path.basename(os.path.dirname(path)), path)
+
+    def iterate(self, kind: Kind) -> AsyncIterator[Any]:
+        return {"assistants": self.iter_assistants, "threads": self.iter_threads, "files": self.iter_files}[kind]()
+
     async def delete_assistant(self, assistant: Assistant) -> None:
         if isinstance(assistant, str):
             raise Exception("uh oh")
         result = await self.client.beta.assistants.delete(assistant_id=assistant.id)
         return result
 
+    def backoff(self, attempt: int, error: openai.RateLimitError) -> float:
+        """Retry-After if the API sent one, otherwise full jitter on an exponential backoff."""
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.max_delay)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def with_retry(self, call: Callable[[], Awaitable[Any]], report: CleanupReport) -> Any:
+        for attempt in range(self.max_attempts):
+            try:
+                return await call()
+            except openai.RateLimitError as error:
+                if attempt == self.max_attempts - 1:
+                    raise
+                report.retries += 1
+                await self.sleep(self.backoff(attempt, error))
+
+    async def delete_one(self, kind: Kind, item: Any) -> None:
+        if kind == "assistants":
+            await self.deleting_client.beta.assistants.delete(assistant_id=item.id)
+        elif kind == "files":
+            await self.deleting_client.files.delete(file_id=item.id)
+        else:
+            try:
+                await self.deleting_client.beta.threads.delete(thread_id=item.id)
+            except openai.NotFoundError:
+                # already gone remotely, the pickle is all that is left
+                pass
+            os.remove(item.path)
+
+    async def cleanup(
+        self,
+        kind: Kind,
+        name_pattern: Optional[str] = None,
+        older_than: Optional[float] = None,
+        dry_run: bool = False,
+    ) -> CleanupReport:
+        """Delete every assistant, thread or file that the filters select. A dry run only lists them."""
+        start = time.perf_counter()
+        report = CleanupReport(kind, dry_run)
+        now = time.time()
+        # collect first, deleting while paging would move the cursor under our feet
+        items = [item async for item in self.iterate(kind) if selected(item, name_pattern, older_than, now)]
+        report.matched = [item.id for item in items]
+        if dry_run:
+            for item in items:
+                print(f"would delete {item.id} {item_name(item)}")
+            return report
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def delete(item: Any) -> None:
+            async with semaphore:
+                try:
+                    await self.with_retry(lambda: self.delete_one(kind, item), report)
+                except (openai.APIError, OSError) as error:
+                    # OSError: a thread's local pickle couldn't be removed
+                    report.failed[item.id] = str(error)
+                    return
+            report.deleted.append(item.id)
+
+        await asyncio.gather(*(delete(item) for item in items))
+        report.seconds = time.perf_counter() - start
+        return report
+
     async def list_models(self):
         """Doesn't return anything usable?"""
         return self.client.models.list()
@@ -39,9 +221,9 @@ async def run():
     # print("List models")
     # show_json(models)
     print()
-    assistants = await client.list_assistants()
     print("List active assistants")
-    show_json(assistants)
+    async for assistant in client.iter_assistants():
+        show_json(assistant)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+"""
+Background writer for the json logs.
+
+Callers turn the object into plain json data and put it on a queue with its
+sequence number and kind, a writer thread does the file IO, so logging doesn't
+stall the bots' event loop. The data is taken when write is called, so changing
+the object afterwards doesn't change what is logged.
+
+The sequence number comes from an in memory counter. The log folder is listed
+once, at startup, instead of on every write.
+
+Two layouts:
+- one file per event, `0001_run.json`, like before
+- JSON Lines appended to `events.jsonl`, rotated to `events.jsonl.1` etc. when it gets big
+
+Markdown twins are only written if asked for, or rendered later with `render_markdown`.
+"""
+import atexit
+import copy
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Optional
+
+_STOP = object()
+
+
+def to_jsonable(obj: Any, encoder: type[json.JSONEncoder]) -> Any:
+    """Plain json data with empty values dropped from the top level."""
+    if hasattr(obj, "model_dump"):
+        dictified = obj.model_dump(mode="json")
+    else:
+        dictified = json.loads(json.dumps(obj, cls=encoder))
+    if isinstance(dictified, dict):
+        dictified = {k: v for k, v in dictified.items() if v}
+    return dictified
+
+
+class LogSink:
+    def __init__(
+        self,
+        folder: str,
+        jsonl: bool = False,
+        markdown: bool = False,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+    ):
+        from chats.utils import SetEncoder
+
+        self.folder = folder
+        self.jsonl = jsonl
+        self.markdown = markdown
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.encoder = SetEncoder
+        os.makedirs(folder, exist_ok=True)
+        # only time the folder is listed
+        self.counter = itertools.count(len(os.listdir(folder)))
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    @property
+    def jsonl_path(self) -> str:
+        return os.path.join(self.folder, "events.jsonl")
+
+    def write(self, obj: Any, kind: str) -> int:
+        """Queue an object for writing, returns its sequence number."""
+        data = to_jsonable(obj, self.encoder)
+        twin = None
+        if self.markdown:
+            twin = obj.model_copy(deep=True) if hasattr(obj, "model_copy") else copy.deepcopy(obj)
+        sequence = next(self.counter)
+        if self.thread is None:
+            self.start()
+        self.queue.put((sequence, kind, time.time(), data, twin))
+        return sequence
+
+    def start(self) -> None:
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.drain, name="log-sink", daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+
+    def drain(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self.write_now(*item)
+            except Exception as ex:  # never take the bot down over a log line
+                print(f"Failed to write log: {ex}")
+            finally:
+                self.queue.task_done()
+
+    def write_now(self, sequence: int, kind: str, timestamp: float, data: Any, twin: Any = None) -> None:
+        if self.jsonl:
+            line = json.dumps({"seq": sequence, "kind": kind, "time": timestamp, "data": data}, cls=self.encoder)
+            self.rotate_if_needed(len(line) + 1)
+            with open(self.jsonl_path, "a", encoding="utf-8", errors="backslashreplace") as f:
+                f.write(line + "\n")
+        else:
+            file_name = os.path.join(self.folder, f"{str(sequence).zfill(4)}_{kind}.json")
+            with open(file_name, "w", encoding="utf-8", errors="backslashreplace") as f:
+                f.write(json.dumps(data, indent=2, cls=self.encoder))
+        if twin is not None:
+            render_markdown(twin, os.path.join(self.folder, f"{str(sequence).zfill(4)}_{kind}.md"))
+
+    def rotate_if_needed(self, incoming: int) -> None:
+        path = self.jsonl_path
+        if not os.path.exists(path) or os.path.getsize(path) + incoming <= self.max_bytes:
+            return
+        for number in range(self.backup_count - 1, 0, -1):
+            older = f"{path}.{number}"
+            if os.path.exists(older):
+                os.replace(older, f"{path}.{number + 1}")
+        os.replace(path, f"{path}.1")
+
+    def flush(self) -> None:
+        """Block until everything queued so far is on disk."""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self) -> None:
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self.thread = None
+
+
+def render_markdown(obj: Any, file_name: str) -> None:
+    """Markdown version of a logged object, on demand."""
+    import markpickle
+    from pydantic import BaseModel
+
+    from chats.utils import pydantic_model_to_pretty_md
+
+    if isinstance(obj, BaseModel):
+        pydantic_model_to_pretty_md(obj, file_name)
+    else:
+        with open(file_name, "w", encoding="utf-8", errors="backslashreplace") as md_file:
+            markpickle.dump(obj, md_file)
@@ -1,4 +1,11 @@
+"""
+Delete leftover assistants, threads or files, every page of them.
+
+python -m chats.nuke_bots --pattern "bot 3$" --older-than-days 7 --dry-run
+"""
+import argparse
 import asyncio
+from typing import Optional
 
 import dotenv
 
@@ -6,18 +13,27 @@ from chats.inventory import InventoryClient
 
 dotenv.load_dotenv()
 
-if __name__ == "__main__":
+
+def run(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m chats.nuke_bots")
+    parser.add_argument("kind", nargs="?", choices=["assistants", "threads", "files"], default="assistants")
+    parser.add_argument("--pattern", help="regex the name must match, a thread goes by its bot's name")
+    parser.add_argument("--older-than-days", type=float, help="only what was created before this many days ago")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be deleted")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
 
     async def main():
-        client = InventoryClient()
-        # only handles first page.
-        for key, assistants in await client.list_assistants():
-            if key == "data":
-                for assistant in assistants:
-                    result = await client.delete_assistant(assistant)
-                    print(result)
-            else:
-                print(key, assistants)
+        client = InventoryClient(concurrency=args.concurrency)
+        older_than = args.older_than_days * 86400 if args.older_than_days is not None else None
+        report = await client.cleanup(args.kind, args.pattern, older_than, dry_run=args.dry_run)
+        for item_id, error in report.failed.items():
+            print(f"failed {item_id}: {error}")
+        print(report)
 
     # Python 3.7+
     asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,159 @@
+"""
+Local cache of completion responses.
+
+Rerunning the same prompt, e.g. while working on output formatting, shouldn't
+cost another API call. Responses are stored zlib compressed in one SQLite file,
+keyed on the normalized request: the same payload in any key order, with unset
+values and `stream` dropped, is the same request.
+
+Sampling makes a reply one of many possible ones. By default it is cached anyway,
+because the point is not paying twice. `ignore_temperature` lets a prompt tried
+at different temperatures share one entry, `seeded_only` caches only requests
+that pin the output with a `seed` or temperature 0.
+
+The file is kept under `max_bytes` by dropping the least recently used entries.
+"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+from chats.utils import user_cache_dir
+
+# changes how the response is streamed or retried, not what it says
+IGNORED_FIELDS = ("stream", "timeout", "request_timeout", "api_key")
+
+
+def normalize_request(endpoint: str, payload: dict[str, Any], ignore_temperature: bool = False) -> str:
+    request = {key: value for key, value in payload.items() if value is not None and key not in IGNORED_FIELDS}
+    if ignore_temperature:
+        request.pop("temperature", None)
+    return json.dumps({"endpoint": endpoint, "request": request}, sort_keys=True, ensure_ascii=False)
+
+
+def to_jsonable(response: Any) -> Any:
+    if hasattr(response, "model_dump"):
+        return response.model_dump(mode="json")
+    # openai 0.x objects are dicts
+    return json.loads(json.dumps(response))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        ignore_temperature: bool = False,
+        seeded_only: bool = False,
+    ):
+        self.path = path or os.path.join(user_cache_dir(), "responses.sqlite3")
+        self.max_bytes = max_bytes
+        self.ignore_temperature = ignore_temperature
+        self.seeded_only = seeded_only
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body BLOB, size INTEGER, last_used REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evicted = 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def key_for(self, endpoint: str, payload: dict[str, Any], ignore_temperature: Optional[bool] = None) -> str:
+        if ignore_temperature is None:
+            ignore_temperature = self.ignore_temperature
+        normalized = normalize_request(endpoint, payload, ignore_temperature)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def cacheable(self, payload: dict[str, Any]) -> bool:
+        if not self.seeded_only:
+            return True
+        return payload.get("seed") is not None or payload.get("temperature") == 0
+
+    def get(self, endpoint: str, payload: dict[str, Any], ignore_temperature: Optional[bool] = None) -> Optional[Any]:
+        """Cached response as plain json data, None on a miss."""
+        if not self.cacheable(payload):
+            self.skipped += 1
+            return None
+        key = self.key_for(endpoint, payload, ignore_temperature)
+        row = self.connection.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(
+        self, endpoint: str, payload: dict[str, Any], response: Any, ignore_temperature: Optional[bool] = None
+    ) -> None:
+        if not self.cacheable(payload):
+            return
+        key = self.key_for(endpoint, payload, ignore_temperature)
+        body = zlib.compress(json.dumps(to_jsonable(response)).encode("utf-8"))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, body, len(body), time.time())
+        )
+        self.connection.commit()
+        self.evict_if_needed()
+
+    def cached(
+        self, endpoint: str, payload: dict[str, Any], call: Callable[[], Any], ignore_temperature: Optional[bool] = None
+    ) -> Any:
+        """Response from the cache, or from `call()`, which is then cached."""
+        response = self.get(endpoint, payload, ignore_temperature)
+        if response is None:
+            response = call()
+            self.put(endpoint, payload, response, ignore_temperature)
+        return response
+
+    def size(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def evict_if_needed(self) -> None:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        rows = self.connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.connection.commit()
+        self.evicted += len(doomed)
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM responses")
+        self.connection.commit()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "bytes": self.size(),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def response_cache() -> ResponseCache:
+    """Cache shared by every entry point, opened on first use."""
+    return ResponseCache()
@@ -0,0 +1,88 @@
+"""
+Wait for assistant runs without blocking the event loop.
+
+Polling uses asyncio.sleep with adaptive backoff: the first checks come quickly
+because short runs are common, then the gaps grow up to a ceiling. A deadline
+stops a stuck run from polling forever.
+
+Streaming follows a run's server sent events instead, so there is no polling.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from openai.types.beta.threads import Run
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "expired")
+
+
+class RunTimeout(TimeoutError):
+    """Run did not finish before the deadline"""
+
+
+class RunWaiter:
+    def __init__(
+        self,
+        first_delay: float = 0.1,
+        max_delay: float = 2.0,
+        multiplier: float = 1.6,
+        deadline: Optional[float] = 600.0,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.deadline = deadline
+        self.sleep = sleep
+
+        self.started = time.monotonic()
+        self.next_delay = first_delay
+        self.retrieve_calls = 0
+        self.pauses = 0
+        self.slept = 0.0
+        self.events = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def check_deadline(self) -> None:
+        if self.deadline is not None and self.elapsed > self.deadline:
+            raise RunTimeout(f"Run still not done after {self.elapsed:.1f}s (deadline {self.deadline}s)")
+
+    async def pause(self) -> None:
+        """Sleep before the next poll, without blocking other coroutines."""
+        self.check_deadline()
+        delay = self.next_delay
+        if self.deadline is not None:
+            delay = max(0.0, min(delay, self.deadline - self.elapsed))
+        await self.sleep(delay)
+        self.pauses += 1
+        self.slept += delay
+        self.next_delay = min(self.next_delay * self.multiplier, self.max_delay)
+
+    async def follow(self, stream: AsyncIterator[Any]) -> Optional[Run]:
+        """Consume run events until the run needs action or stops.
+
+        Events look like `thread.run.in_progress` with the Run as `data`.
+        """
+        run = None
+        async for event in stream:
+            self.events += 1
+            self.check_deadline()
+            name = getattr(event, "event", "")
+            if not name.startswith("thread.run.") or name.startswith("thread.run.step"):
+                continue
+            run = event.data
+            if run.status in TERMINAL_STATUSES or run.status == "requires_action":
+                break
+        return run
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "elapsed": round(self.elapsed, 3),
+            "retrieve_calls": self.retrieve_calls,
+            "pauses": self.pauses,
+            "slept": round(self.slept, 3),
+            "events": self.events,
+        }
@@ -0,0 +1,223 @@
+"""
+Semantic cache for bot answers.
+
+Exact match caching misses prompts that say the same thing in other words, like
+a package description rephrased for the tenth time. Here prompts are embedded,
+kept as rows of a NumPy matrix, and a new prompt whose cosine similarity to a
+cached one is above `threshold` gets the cached answer.
+
+Embeddings come from a hashed TF-IDF by default: words weighted by inverse
+document frequency over the cached prompts, hashed into a fixed number of
+buckets. No model download, and fast enough to embed 100k prompts in seconds.
+A small local transformer model can be plugged in instead, see `TransformerEmbedder`.
+
+The index is flat, one matrix-vector product per lookup, and the best few rows
+are then reranked with the exact TF-IDF cosine. At 100k prompts that is a few
+milliseconds, so there is no need for an approximate index.
+
+Needs numpy, the `semantic` extra.
+"""
+import json
+import math
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional, Protocol
+
+import numpy as np
+
+WORDS = re.compile(r"[a-z0-9]+")
+# say nothing about what is asked for, in a small cache idf can't tell yet
+STOPWORDS = frozenset(
+    "a an and any are as at be by can could do for from how i in is it me my of on or please "
+    "should so that the there this to use want what which will with would you".split()
+)
+
+
+class Embedder(Protocol):
+    dimensions: int
+
+    def observe(self, text: str) -> None:
+        """See a prompt that is going into the cache"""
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit length vector"""
+
+
+class HashingEmbedder:
+    """TF-IDF over words, hashed down to `dimensions` for the matrix.
+
+    Hashing makes unrelated prompts collide a little, which adds up over 100k rows,
+    so `exact_similarity` gives the collision free cosine to rerank the best rows with.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.document_frequency: Counter = Counter()
+        self.documents = 0
+
+    def features(self, text: str) -> list[str]:
+        return [word for word in WORDS.findall(text.lower()) if word not in STOPWORDS]
+
+    def observe(self, text: str) -> None:
+        self.document_frequency.update(set(self.features(text)))
+        self.documents += 1
+
+    def weights(self, text: str) -> dict[str, float]:
+        """Sublinear term frequency times inverse document frequency"""
+        weights = {}
+        for feature, count in Counter(self.features(text)).items():
+            idf = math.log((1 + self.documents) / (1 + self.document_frequency[feature])) + 1
+            weights[feature] = (1 + math.log(count)) * idf
+        return weights
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self.weights(text).items():
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            # the sign keeps collisions from only ever adding up
+            vector[hashed % self.dimensions] += weight if (hashed // self.dimensions) & 1 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def exact_similarity(self, first: str, second: str) -> float:
+        first_weights, second_weights = self.weights(first), self.weights(second)
+        dot = sum(weight * second_weights.get(feature, 0.0) for feature, weight in first_weights.items())
+        norms = math.sqrt(sum(w * w for w in first_weights.values()) * sum(w * w for w in second_weights.values()))
+        return dot / norms if norms else 0.0
+
+
+class TransformerEmbedder:
+    """Mean pooled sentence embeddings from a small model run on the CPU, needs transformers and torch."""
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.dimensions = self.model.config.hidden_size
+
+    def observe(self, text: str) -> None:
+        pass
+
+    def embed(self, text: str) -> np.ndarray:
+        import torch
+
+        inputs = self.tokenizer(text, return_tensors="pt", truncation=True)
+        with torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state[0]
+        vector = hidden.mean(dim=0).numpy().astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+class FlatIndex:
+    """Rows of a matrix, grown by doubling so adding stays cheap."""
+
+    def __init__(self, dimensions: int, capacity: int = 1024):
+        self.vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, vector: np.ndarray) -> int:
+        if self.count == len(self.vectors):
+            grown = np.zeros((len(self.vectors) * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[: self.count] = self.vectors
+            self.vectors = grown
+        self.vectors[self.count] = vector
+        self.count += 1
+        return self.count - 1
+
+    def nearest(self, vector: np.ndarray, k: int = 1) -> list[tuple[int, float]]:
+        """Up to k rows with the highest cosine similarity, best first"""
+        if not self.count:
+            return []
+        scores = self.vectors[: self.count] @ vector
+        k = min(k, self.count)
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows])]
+        return [(int(row), float(scores[row])) for row in rows]
+
+
+@dataclass
+class SemanticHit:
+    prompt: str
+    answer: Any
+    similarity: float
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.7, embedder: Optional[Embedder] = None, rerank: int = 16):
+        self.threshold = threshold
+        self.rerank = rerank
+        self.embedder = embedder or HashingEmbedder()
+        self.index = FlatIndex(self.embedder.dimensions)
+        self.prompts: list[str] = []
+        self.answers: list[Any] = []
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.prompts)
+
+    def lookup(self, prompt: str) -> Optional[SemanticHit]:
+        start = time.perf_counter()
+        exact_similarity = getattr(self.embedder, "exact_similarity", None)
+        candidates = self.index.nearest(self.embedder.embed(prompt), self.rerank if exact_similarity else 1)
+        if exact_similarity:
+            candidates = [(row, exact_similarity(prompt, self.prompts[row])) for row, _ in candidates]
+        row, similarity = max(candidates, key=lambda candidate: candidate[1], default=(-1, 0.0))
+        self.lookup_seconds += time.perf_counter() - start
+        if row < 0 or similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return SemanticHit(self.prompts[row], self.answers[row], similarity)
+
+    def add(self, prompt: str, answer: Any) -> None:
+        """Answer must be json data if the cache is going to be saved."""
+        self.embedder.observe(prompt)
+        self.index.add(self.embedder.embed(prompt))
+        self.prompts.append(prompt)
+        self.answers.append(answer)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "mean_lookup_ms": round(self.lookup_seconds / lookups * 1000, 3) if lookups else 0.0,
+        }
+
+    def save(self, path: str) -> None:
+        """Prompts and answers only, vectors are rebuilt on load."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"threshold": self.threshold, "prompts": self.prompts, "answers": self.answers}, file)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None, embedder: Optional[Embedder] = None) -> "SemanticCache":
+        """Open a saved cache, or start an empty one if there is none yet."""
+        if not os.path.exists(path):
+            return cls(threshold if threshold is not None else 0.7, embedder)
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        cache = cls(threshold if threshold is not None else data["threshold"], embedder)
+        for prompt in data["prompts"]:
+            cache.embedder.observe(prompt)
+        # embed after every prompt is observed, so all rows share the final idf weights
+        for prompt, answer in zip(data["prompts"], data["answers"]):
+            cache.index.add(cache.embedder.embed(prompt))
+            cache.prompts.append(prompt)
+            cache.answers.append(answer)
+        return cache
@@ -0,0 +1,88 @@
+"""
+Write a completion to its markdown file while it streams.
+
+Tokens are appended to a temporary file as they arrive, in chunks, so progress is
+visible right away and a long generation doesn't pile up in memory. The file gets
+its real name, e.g. a title from `create_name`, by an atomic rename at the end.
+Only the first `head_size` characters are kept in memory, enough to name it.
+"""
+import os
+import tempfile
+import time
+from typing import Optional
+
+
+def clean_file_name(file_name: str) -> str:
+    return (
+        file_name.strip()
+        .replace(" ", "_")
+        .replace("\n", "")
+        .replace("\t", "")
+        .replace("\r", "")
+        .replace("'", "")
+        .replace('"', "")
+        .replace(":", "_")
+    )
+
+
+class MarkdownStreamSink:
+    def __init__(self, folder: str, prompt: Optional[str] = None, flush_chars: int = 512, head_size: int = 4000):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.flush_chars = flush_chars
+        self.head_size = head_size
+        handle, self.temp_path = tempfile.mkstemp(prefix="writing_", suffix=".md", dir=folder)
+        self.file = os.fdopen(handle, "w", encoding="utf-8")
+        self.buffer: list[str] = []
+        self.buffered = 0
+        self.head = ""
+        self.written = 0
+        self.started = time.monotonic()
+        self.first_token_seconds: Optional[float] = None
+        self.path: Optional[str] = None
+        if prompt:
+            self.file.write(prompt)
+            self.file.write("\n\n")
+            self.file.flush()
+
+    def __enter__(self) -> "MarkdownStreamSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # a failed generation keeps its partial file under the temporary name
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        if len(self.head) < self.head_size:
+            self.head += text[: self.head_size - len(self.head)]
+        self.buffer.append(text)
+        self.buffered += len(text)
+        self.written += len(text)
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.monotonic() - self.started
+            self.flush()
+        elif self.buffered >= self.flush_chars:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer.clear()
+            self.buffered = 0
+        self.file.flush()
+
+    def finish(self, file_name: str, add_number_to_filename: bool = False) -> str:
+        """Close and rename to the final name, returns the path."""
+        self.flush()
+        self.file.close()
+        name = clean_file_name(file_name)
+        if add_number_to_filename:
+            count = len([f for f in os.listdir(self.folder) if os.path.isfile(os.path.join(self.folder, f))])
+            name = f"{name}_{str(count).zfill(4)}"
+        self.path = os.path.join(self.folder, f"{name}.md")
+        os.replace(self.temp_path, self.path)
+        return self.path
@@ -0,0 +1,274 @@
+"""
+Latency and token usage for every OpenAI call.
+
+Each call gets a record: wall time, time spent polling or queued, prompt and
+completion tokens, HTTP retries and a cost estimate, tagged with the bot name and
+thread. Records are appended to a JSON Lines file.
+
+    python -m chats.telemetry summary
+    python -m chats.telemetry summary chats/logs/telemetry.jsonl --by thread
+
+shows p50/p95 latency, tokens and cost per bot and operation, which is the quick
+way to find the slow, expensive steps in a multi-bot chat room.
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "logs", "telemetry.jsonl")
+
+# USD per 1k tokens, (prompt, completion)
+PRICES = {
+    "gpt-3.5-turbo": (0.001, 0.002),
+    "gpt-3.5-turbo-1106": (0.001, 0.002),
+    "gpt-3.5-turbo-0301": (0.0015, 0.002),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "text-davinci-003": (0.02, 0.02),
+    "text-davinci-edit-001": (0.02, 0.02),
+}
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = PRICES.get(model or "", (0.0, 0.0))
+    return round(prompt_tokens / 1000 * prompt_price + completion_tokens / 1000 * completion_price, 6)
+
+
+def usage_of(response: Any) -> tuple[int, int]:
+    """Prompt and completion tokens from a response, run or old style dict, (0, 0) if it has none."""
+    usage = response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None)
+    if not usage:
+        return 0, 0
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+    return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+
+
+@dataclasses.dataclass
+class CallRecord:
+    operation: str
+    bot: Optional[str] = None
+    thread_id: Optional[str] = None
+    model: Optional[str] = None
+    started: float = 0.0
+    wall_seconds: float = 0.0
+    poll_seconds: float = 0.0
+    queue_seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    http_requests: int = 0
+    cost: float = 0.0
+    ok: bool = True
+    error: Optional[str] = None
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.http_requests - 1)
+
+    def add_usage(self, response: Any) -> None:
+        prompt_tokens, completion_tokens = usage_of(response)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def as_dict(self) -> dict[str, Any]:
+        data = dataclasses.asdict(self)
+        data["retries"] = self.retries
+        return data
+
+
+_CURRENT: contextvars.ContextVar[Optional[CallRecord]] = contextvars.ContextVar("telemetry_record", default=None)
+
+
+def current_record() -> Optional[CallRecord]:
+    """The record of the call in progress, if any, e.g. to add poll time to it."""
+    return _CURRENT.get()
+
+
+class Telemetry:
+    def __init__(self, path: str = DEFAULT_PATH, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        # one http client per event loop, None for clients asked for outside a loop
+        self.http_clients: dict[asyncio.AbstractEventLoop, "httpx.AsyncClient"] = {}
+
+    def write(self, record: CallRecord) -> None:
+        if not self.enabled:
+            return
+        line = json.dumps(record.as_dict())
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def finish(self, record: CallRecord, error: Optional[BaseException]) -> None:
+        record.wall_seconds = round(time.monotonic() - record.started, 4)
+        record.started = round(time.time() - record.wall_seconds, 3)
+        record.cost = estimate_cost(record.model, record.prompt_tokens, record.completion_tokens)
+        if error is not None:
+            record.ok = False
+            record.error = f"{type(error).__name__}: {error}"
+        self.write(record)
+
+    @contextlib.contextmanager
+    def track(
+        self, operation: str, bot: Optional[str] = None, thread_id: Optional[str] = None, model: Optional[str] = None
+    ):
+        """Time a call, works around sync and async code alike."""
+        record = CallRecord(operation, bot, thread_id, model, started=time.monotonic())
+        token = _CURRENT.set(record)
+        error = None
+        try:
+            yield record
+        except BaseException as ex:
+            error = ex
+            raise
+        finally:
+            _CURRENT.reset(token)
+            self.finish(record, error)
+
+    async def count_request(self, request: "httpx.Request") -> None:
+        """httpx request hook, every request including retries is counted against the current call."""
+        record = current_record()
+        if record is not None:
+            record.http_requests += 1
+
+    def http_client(self) -> "httpx.AsyncClient":
+        """Shared http client for AsyncOpenAI(http_client=...) that counts requests and retries.
+
+        Every Bot and BotConversation on the same event loop gets the same client, so they share one
+        connection pool and no client is left open per conversation. Clients of closed loops are dropped.
+        Outside a running loop there is nothing to share with, the caller gets a client of its own.
+        """
+        import httpx
+
+        def new_client() -> httpx.AsyncClient:
+            return httpx.AsyncClient(event_hooks={"request": [self.count_request]}, timeout=httpx.Timeout(600.0))
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return new_client()
+        with self.lock:
+            for other in [other for other in self.http_clients if other.is_closed()]:
+                del self.http_clients[other]
+            client = self.http_clients.get(loop)
+            if client is None or client.is_closed:
+                client = new_client()
+                self.http_clients[loop] = client
+            return client
+
+    async def aclose(self) -> None:
+        """Close the shared http client of the running event loop."""
+        client = self.http_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+TELEMETRY = Telemetry()
+
+
+def tracked(operation: str) -> Callable:
+    """Track an async method of Bot or BotConversation, tagged with its bot name, thread and model.
+
+    A call nested in a call of the same operation, e.g. polling again after tool output, counts toward the outer one.
+    """
+
+    def decorate(method: Callable) -> Callable:
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            outer = current_record()
+            if outer is not None and outer.operation == operation:
+                return await method(self, *args, **kwargs)
+            assistant = getattr(self, "assistant", None)
+            with TELEMETRY.track(
+                operation,
+                bot=getattr(assistant, "name", None),
+                thread_id=getattr(self, "thread_id", None),
+                model=getattr(assistant, "model", None) or getattr(self, "model", None),
+            ) as record:
+                result = await method(self, *args, **kwargs)
+                record.add_usage(result)
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def read_records(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(records: Iterable[dict[str, Any]], by: str = "bot") -> list[dict[str, Any]]:
+    """One row per group, slowest p95 first."""
+    groups: dict[tuple, list[dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        key = (record.get("thread_id") or "-",) if by == "thread" else (record.get("bot") or "-", record["operation"])
+        groups[key].append(record)
+    rows = []
+    for key, group in groups.items():
+        wall = [record["wall_seconds"] for record in group]
+        rows.append(
+            {
+                "group": " / ".join(key),
+                "calls": len(group),
+                "errors": sum(1 for record in group if not record["ok"]),
+                "p50": percentile(wall, 0.5),
+                "p95": percentile(wall, 0.95),
+                "poll": round(sum(record["poll_seconds"] for record in group), 3),
+                "prompt_tokens": sum(record["prompt_tokens"] for record in group),
+                "completion_tokens": sum(record["completion_tokens"] for record in group),
+                "retries": sum(record["retries"] for record in group),
+                "cost": round(sum(record["cost"] for record in group), 4),
+            }
+        )
+    return sorted(rows, key=lambda row: row["p95"], reverse=True)
+
+
+def run(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m chats.telemetry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="latency and token summary")
+    summary.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    summary.add_argument("--by", choices=["bot", "thread"], default="bot")
+    args = parser.parse_args(argv)
+
+    rows = summarize(read_records(args.path), by=args.by)
+    print(
+        f"{'group':50} {'calls':>6} {'errors':>6} {'p50 s':>8} {'p95 s':>8} {'poll s':>8} "
+        f"{'prompt':>8} {'complete':>8} {'retries':>7} {'cost $':>8}"
+    )
+    for row in rows:
+        print(
+            f"{row['group'][:50]:50} {row['calls']:>6} {row['errors']:>6} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+            f"{row['poll']:>8.2f} {row['prompt_tokens']:>8} {row['completion_tokens']:>8} "
+            f"{row['retries']:>7} {row['cost']:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    run()
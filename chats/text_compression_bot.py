@@ -6,12 +6,11 @@ import asyncio
 import traceback
 
 import dotenv
-from openai.types import FunctionDefinition
-from openai.types.beta.threads.run import ToolAssistantToolsFunction
 
 from chats.bots import get_persistent_bot, get_persistent_bot_convo
 from chats.chatroom import ChatroomLog
 from chats.tool_code.text_shorteners import LOTS_OF_TEXT, count_tokens, readability_scores
+from chats.tool_code.tools import TOOLS
 
 dotenv.load_dotenv()
 
@@ -41,59 +40,7 @@ async def shorten_this_text(text: str, target_model: str, goal_tokens: int, kind
         )
         chatroom.add_starting_user_message(start_message)
 
-        tools = [
-            ToolAssistantToolsFunction(
-                function=FunctionDefinition(
-                    name="count_tokens",
-                    description="Count tokens",
-                    parameters={
-                        "type": "object",
-                        "properties": {
-                            "text": {
-                                "type": "string",
-                                "description": "Text to count tokens in",
-                            },
-                        },
-                        "required": ["text"],
-                    },
-                ),
-                type="function",
-            ),
-            ToolAssistantToolsFunction(
-                function=FunctionDefinition(
-                    name="readability_scores",
-                    description="Get some readability scores",
-                    parameters={
-                        "type": "object",
-                        "properties": {
-                            "text": {
-                                "type": "string",
-                                "description": "Text to calculate readability scores for",
-                            },
-                        },
-                        "required": ["text"],
-                    },
-                ),
-                type="function",
-            ),
-            ToolAssistantToolsFunction(
-                function=FunctionDefinition(
-                    name="word_count",
-                    description="Count words ignoring whitespace and punctuation",
-                    parameters={
-                        "type": "object",
-                        "properties": {
-                            "text": {
-                                "type": "string",
-                                "description": "Text to calculate word count for",
-                            },
-                        },
-                        "required": ["text"],
-                    },
-                ),
-                type="function",
-            ),
-        ]
+        tools = TOOLS.assistant_tools("count_tokens", "readability_scores", "word_count")
         # Submit user req to agent. Run may involve bot asking to use `functions`
         run = await short_convo.create_run(tools=tools)
 
@@ -0,0 +1,195 @@
+"""
+Keep an Assistant thread under a token budget.
+
+Every run sends the whole thread to the model, so a long code review gets slower
+and more expensive with each turn. This keeps a local mirror of the thread's
+messages, each counted once, so the size of the thread is known without asking.
+
+Threads only grow, messages can't be taken out of one. When the mirror goes over
+budget the conversation moves to a new thread, seeded by the policy:
+
+- drop_oldest: the last `keep_turns` turns, word for word
+- summarize: a summary of the older turns, by a cheap model, plus the last turns
+- new_thread: a summary of everything so far, plus the message waiting for a reply
+
+The latest turn is always carried over word for word, whatever the policy.
+
+The old thread is deleted, since threads can't be listed and cleaned up later, and
+a conversation pickled by get_persistent_bot_convo is re-pickled with the new one.
+
+Each run's report says how many tokens the thread held and how many were saved
+compared to never trimming.
+"""
+import functools
+from dataclasses import dataclass
+from typing import Any, Callable, Literal, Optional
+
+from openai.types.beta.threads import ThreadMessage
+
+from chats.bot_shell import BotConversation
+from chats.bots import replace_thread_file
+from chats.telemetry import TELEMETRY
+from chats.token_utils import count_tokens
+
+Policy = Literal["drop_oldest", "summarize", "new_thread"]
+
+# role and separators the API wraps every message in
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this conversation so it can be continued in a new thread. "
+    "Keep file names, decisions and open questions, drop pleasantries."
+)
+
+
+def message_text(message: Any) -> str:
+    parts = []
+    for content in message.content:
+        text = getattr(content, "text", None)
+        if text is not None:
+            parts.append(text.value)
+    return "\n".join(parts)
+
+
+@dataclass
+class MirroredMessage:
+    id: Optional[str]
+    role: str
+    text: str
+    tokens: int
+
+
+@dataclass
+class RunReport:
+    thread_id: Optional[str]
+    thread_tokens: int
+    untrimmed_tokens: int
+    rebuilt: bool
+
+    @property
+    def saved(self) -> int:
+        return self.untrimmed_tokens - self.thread_tokens
+
+
+class ThreadBudget:
+    def __init__(
+        self,
+        convo: BotConversation,
+        max_tokens: int = 6000,
+        policy: Policy = "summarize",
+        keep_turns: int = 2,
+        summary_model: str = "gpt-3.5-turbo",
+        counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.convo = convo
+        self.max_tokens = max_tokens
+        self.policy = policy
+        self.keep_turns = keep_turns
+        self.summary_model = summary_model
+        self.counter = counter or functools.partial(count_tokens, model="gpt-3.5-turbo")
+        self.mirror: list[MirroredMessage] = []
+        # everything ever said, what the thread would hold without a budget
+        self.untrimmed_tokens = 0
+        self.reports: list[RunReport] = []
+
+    @property
+    def thread_tokens(self) -> int:
+        return sum(message.tokens for message in self.mirror)
+
+    @property
+    def tokens_saved(self) -> int:
+        return sum(report.saved for report in self.reports)
+
+    def record(self, role: str, text: str, message_id: Optional[str] = None) -> MirroredMessage:
+        if message_id and any(message.id == message_id for message in self.mirror):
+            return next(message for message in self.mirror if message.id == message_id)
+        mirrored = MirroredMessage(message_id, role, text, self.counter(text) + MESSAGE_OVERHEAD)
+        self.mirror.append(mirrored)
+        self.untrimmed_tokens += mirrored.tokens
+        return mirrored
+
+    def record_message(self, message: ThreadMessage) -> MirroredMessage:
+        return self.record(message.role, message_text(message), message.id)
+
+    async def sync(self) -> None:
+        """Mirror a thread that already has messages, e.g. one resumed from a pickle."""
+        messages = await self.convo.client.beta.threads.messages.list(thread_id=self.convo.thread_id, order="asc")
+        async for message in messages:
+            self.record_message(message)
+
+    async def add_user_message(self, content: str) -> ThreadMessage:
+        message = await self.convo.add_user_message(content)
+        self.record_message(message)
+        return message
+
+    async def latest_reply(self) -> Optional[ThreadMessage]:
+        message = await self.convo.display_most_recent_bot_message()
+        if message is not None:
+            self.record_message(message)
+        return message
+
+    def turns(self) -> list[list[MirroredMessage]]:
+        """Messages grouped into turns, a turn starts at each user message."""
+        turns: list[list[MirroredMessage]] = []
+        for message in self.mirror:
+            if message.role == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return turns
+
+    async def summarize(self, messages: list[MirroredMessage]) -> str:
+        transcript = "\n\n".join(f"{message.role}: {message.text}" for message in messages)
+        bot = getattr(self.convo.assistant, "name", None)
+        with TELEMETRY.track("summarize", bot=bot, thread_id=self.convo.thread_id, model=self.summary_model) as record:
+            response = await self.convo.client.chat.completions.create(
+                model=self.summary_model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": transcript},
+                ],
+            )
+            record.add_usage(response)
+        return response.choices[0].message.content or ""
+
+    async def seed(self) -> str:
+        """Text that starts the new thread, per the policy.
+
+        The latest turn holds the message the next run answers, it always goes over word for word.
+        """
+        turns = self.turns()
+        keep = 1 if self.policy == "new_thread" else max(self.keep_turns, 1)
+        recent = [message for turn in turns[-keep:] for message in turn]
+        older = [message for turn in turns[:-keep] for message in turn]
+        recent_text = "\n\n".join(f"{message.role}: {message.text}" for message in recent)
+        if self.policy == "drop_oldest":
+            return f"The conversation so far, most recent turns:\n\n{recent_text}"
+        summary = await self.summarize(older) if older else ""
+        if self.policy == "new_thread":
+            return f"Summary of the conversation so far:\n\n{summary}\n\nLatest message:\n\n{recent_text}"
+        return f"Summary of the earlier conversation:\n\n{summary}\n\nMost recent turns:\n\n{recent_text}"
+
+    async def rebuild(self) -> None:
+        seed = await self.seed()
+        old_thread_id = self.convo.thread_id
+        await self.convo.create_thread()
+        message = await self.convo.add_user_message(seed)
+        # only once the new thread has its seed, so a failure doesn't lose the conversation
+        await self.convo.delete_thread(old_thread_id)
+        bot_name = getattr(self.convo.assistant, "name", None)
+        if bot_name and replace_thread_file(bot_name, old_thread_id, self.convo.thread):
+            print(f"Conversation moved to thread {self.convo.thread_id}")
+        untrimmed = self.untrimmed_tokens
+        self.mirror = []
+        self.record_message(message)
+        # the seed stands in for what was there, it isn't new conversation
+        self.untrimmed_tokens = untrimmed
+
+    async def before_run(self) -> RunReport:
+        """Call before each create_run. Moves to a new thread if this one is over budget."""
+        rebuilt = False
+        if self.thread_tokens > self.max_tokens and len(self.turns()) > 1:
+            await self.rebuild()
+            rebuilt = True
+        report = RunReport(self.convo.thread_id, self.thread_tokens, self.untrimmed_tokens, rebuilt)
+        self.reports.append(report)
+        return report
@@ -0,0 +1,59 @@
+"""
+Process-wide registry of tiktoken encoders.
+
+Loading an encoder means reading and parsing a BPE file, so it is done once per
+model name, on first use, and shared by every caller after that. tiktoken itself
+is only imported then too.
+"""
+import threading
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    import tiktoken
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# gpt3 turbo - cl100k_base
+# gpt2 (or r50k_base) 	Most GPT-3 models
+# p50k_base 	Code models, text-davinci-002, text-davinci-003
+# cl100k_base 	text-embedding-ada-002
+_ENCODERS: dict[str, "tiktoken.Encoding"] = {}
+_LOCK = threading.Lock()
+
+
+def get_encoder(model: str = DEFAULT_MODEL) -> "tiktoken.Encoding":
+    """Get the encoder for a model name (or a raw encoding name like p50k_base), loading it on first use."""
+    encoder = _ENCODERS.get(model)
+    if encoder is not None:
+        return encoder
+    with _LOCK:
+        encoder = _ENCODERS.get(model)
+        if encoder is None:
+            import tiktoken
+
+            try:
+                encoder = tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Not a model name, maybe an encoding name.
+                encoder = tiktoken.get_encoding(model)
+            _ENCODERS[model] = encoder
+    return encoder
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """Count the number of tokens in a string."""
+    return len(get_encoder(model).encode(text))
+
+
+def count_tokens_many(texts: Iterable[str], model: str = DEFAULT_MODEL, num_threads: int = 8) -> list[int]:
+    """Count tokens for many strings at once, using tiktoken's multithreaded batch encoder."""
+    texts = list(texts)
+    if not texts:
+        return []
+    encoded = get_encoder(model).encode_batch(texts, num_threads=num_threads)
+    return [len(tokens) for tokens in encoded]
+
+
+def loaded_models() -> list[str]:
+    """Model names that have an encoder loaded already."""
+    return sorted(_ENCODERS)
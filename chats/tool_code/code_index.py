@@ -0,0 +1,290 @@
+"""
+Local code search for the review bot, instead of uploading files for retrieval.
+
+Python files are cut into chunks along the AST: one per function, one per method,
+a class's header, and the module level code that is left. Chunks go into a BM25
+index, identifiers are split on snake_case and camelCase so `read_config` matches
+"read config". An embedder (see chats.semantic_cache) can rerank the best BM25
+hits if installed.
+
+Indexing is incremental: a file is only chunked again when its mtime or size
+changed and then its content hash did too. The index is pickled under the user
+cache folder, one per source folder.
+"""
+import ast
+import hashlib
+import math
+import os
+import pickle
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+from chats.utils import user_cache_dir
+
+IDENTIFIERS = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+SKIP_FOLDERS = {".git", ".venv", "venv", "__pycache__", "node_modules", ".tox", ".mypy_cache", "build", "dist"}
+# a file that won't parse is cut into pieces this many lines long
+FALLBACK_LINES = 60
+
+
+def terms(text: str) -> list[str]:
+    """Lower case identifiers, plus their snake_case and camelCase parts."""
+    found = []
+    for identifier in IDENTIFIERS.findall(text):
+        lowered = identifier.lower()
+        found.append(lowered)
+        parts = [part.lower() for piece in identifier.split("_") for part in CAMEL.findall(piece)]
+        if len(parts) > 1:
+            found.extend(parts)
+    return found
+
+
+@dataclass
+class Chunk:
+    path: str
+    name: str
+    kind: str
+    start: int
+    end: int
+    text: str
+
+
+def chunk_python(source: str, path: str) -> list[Chunk]:
+    """Functions, methods, each class outside its methods and the rest of the module, each as a chunk."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return chunk_lines(source, path)
+    lines = source.splitlines()
+
+    def first_line(node: Any) -> int:
+        return min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+
+    def text_of(start: int, end: int) -> str:
+        return "\n".join(lines[start - 1 : end])
+
+    chunks = []
+    covered: set[int] = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            start, end = first_line(node), node.end_lineno or node.lineno
+            chunks.append(Chunk(path, node.name, "function", start, end, text_of(start, end)))
+            covered.update(range(start, end + 1))
+        elif isinstance(node, ast.ClassDef):
+            start, end = first_line(node), node.end_lineno or node.lineno
+            covered.update(range(start, end + 1))
+            methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            in_methods: set[int] = set()
+            for method in methods:
+                method_start, method_end = first_line(method), method.end_lineno or method.lineno
+                in_methods.update(range(method_start, method_end + 1))
+                name = f"{node.name}.{method.name}"
+                chunks.append(Chunk(path, name, "method", method_start, method_end, text_of(method_start, method_end)))
+            # header, class attributes, nested classes and comments between or after the methods
+            own = [number for number in range(start, end + 1) if number not in in_methods and lines[number - 1].strip()]
+            text = "\n".join(lines[number - 1] for number in own)
+            chunks.insert(len(chunks) - len(methods), Chunk(path, node.name, "class", start, own[-1], text))
+    rest = [number for number in range(1, len(lines) + 1) if number not in covered and lines[number - 1].strip()]
+    if rest:
+        text = "\n".join(lines[number - 1] for number in rest)
+        chunks.append(Chunk(path, "<module>", "module", rest[0], rest[-1], text))
+    return chunks
+
+
+def chunk_lines(source: str, path: str) -> list[Chunk]:
+    lines = source.splitlines()
+    chunks = []
+    for start in range(0, len(lines), FALLBACK_LINES):
+        end = min(start + FALLBACK_LINES, len(lines))
+        chunks.append(Chunk(path, f"<lines {start + 1}>", "lines", start + 1, end, "\n".join(lines[start:end])))
+    return chunks
+
+
+@dataclass
+class FileRecord:
+    mtime: float
+    size: int
+    digest: str
+    chunk_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class SearchHit:
+    path: str
+    name: str
+    kind: str
+    start: int
+    end: int
+    score: float
+    text: str
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "name": self.name,
+            "lines": f"{self.start}-{self.end}",
+            "score": round(self.score, 3),
+            "code": self.text,
+        }
+
+
+class CodeIndex:
+    def __init__(self, root: str, k1: float = 1.5, b: float = 0.75):
+        self.root = os.path.abspath(root)
+        self.k1 = k1
+        self.b = b
+        self.files: dict[str, FileRecord] = {}
+        self.chunks: dict[int, Chunk] = {}
+        self.lengths: dict[int, int] = {}
+        self.postings: dict[str, dict[int, int]] = {}
+        self.total_length = 0
+        self.next_id = 0
+        self.embedder: Any = None
+        self.vectors: dict[int, Any] = {}
+        self.last_update: dict[str, int] = {}
+
+    @staticmethod
+    def default_path(root: str) -> str:
+        digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(user_cache_dir(), f"code_index_{digest}.pickle")
+
+    @classmethod
+    def load(cls, root: str, path: Optional[str] = None) -> "CodeIndex":
+        """The saved index for a folder, or an empty one. Call update() to catch up with the files."""
+        path = path or cls.default_path(root)
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                index = pickle.load(file)
+            if isinstance(index, cls) and index.root == os.path.abspath(root):
+                return index
+        return cls(root)
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.default_path(self.root)
+        embedder, vectors = self.embedder, self.vectors
+        # embeddings are cheap to redo and the embedder may not pickle
+        self.embedder, self.vectors = None, {}
+        try:
+            with open(f"{path}.tmp", "wb") as file:
+                pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{path}.tmp", path)
+        finally:
+            self.embedder, self.vectors = embedder, vectors
+
+    def python_files(self) -> Iterable[str]:
+        for folder, folders, files in os.walk(self.root):
+            folders[:] = [name for name in folders if name not in SKIP_FOLDERS]
+            for name in files:
+                if name.endswith(".py"):
+                    yield os.path.join(folder, name)
+
+    def update(self) -> dict[str, int]:
+        """Index new and changed files, forget deleted ones."""
+        seen = set()
+        counts = {"unchanged": 0, "touched": 0, "indexed": 0, "removed": 0}
+        for full_path in self.python_files():
+            relative = os.path.relpath(full_path, self.root).replace("\\", "/")
+            seen.add(relative)
+            stat = os.stat(full_path)
+            record = self.files.get(relative)
+            if record and record.mtime == stat.st_mtime and record.size == stat.st_size:
+                counts["unchanged"] += 1
+                continue
+            with open(full_path, "rb") as file:
+                data = file.read()
+            digest = hashlib.sha1(data).hexdigest()
+            if record and record.digest == digest:
+                record.mtime, record.size = stat.st_mtime, stat.st_size
+                counts["touched"] += 1
+                continue
+            self.remove_file(relative)
+            record = FileRecord(stat.st_mtime, stat.st_size, digest)
+            self.add_file(relative, data.decode("utf-8", errors="replace"), record)
+            counts["indexed"] += 1
+        for relative in [relative for relative in self.files if relative not in seen]:
+            self.remove_file(relative)
+            counts["removed"] += 1
+        self.last_update = counts
+        return counts
+
+    def add_file(self, relative: str, source: str, record: FileRecord) -> None:
+        for chunk in chunk_python(source, relative):
+            chunk_id = self.next_id
+            self.next_id += 1
+            # names count twice, a hit on the function name says more than one in its body
+            frequencies = Counter(terms(chunk.text) + terms(chunk.name) + terms(relative))
+            for term, count in frequencies.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+            length = sum(frequencies.values())
+            self.chunks[chunk_id] = chunk
+            self.lengths[chunk_id] = length
+            self.total_length += length
+            record.chunk_ids.append(chunk_id)
+        self.files[relative] = record
+
+    def remove_file(self, relative: str) -> None:
+        record = self.files.pop(relative, None)
+        if record is None:
+            return
+        for chunk_id in record.chunk_ids:
+            chunk = self.chunks.pop(chunk_id)
+            for term in set(terms(chunk.text) + terms(chunk.name) + terms(relative)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+            self.total_length -= self.lengths.pop(chunk_id)
+            self.vectors.pop(chunk_id, None)
+
+    def bm25(self, query: str) -> Counter:
+        scores: Counter = Counter()
+        count = len(self.chunks)
+        if not count:
+            return scores
+        average = self.total_length / count
+        for term in set(terms(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / average)
+                scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, max_results: int = 5, candidates: int = 50) -> list[SearchHit]:
+        best = self.bm25(query).most_common(candidates if self.embedder else max_results)
+        if self.embedder and best:
+            best = self.rerank(query, best)
+        return [
+            SearchHit(chunk.path, chunk.name, chunk.kind, chunk.start, chunk.end, score, chunk.text)
+            for chunk_id, score in best[:max_results]
+            for chunk in [self.chunks[chunk_id]]
+        ]
+
+    def rerank(self, query: str, best: list[tuple[int, float]]) -> list[tuple[int, float]]:
+        """Mix the BM25 score, scaled to the best hit, with embedding similarity."""
+        query_vector = self.embedder.embed(query)
+        top = best[0][1] or 1.0
+        mixed = []
+        for chunk_id, score in best:
+            if chunk_id not in self.vectors:
+                self.vectors[chunk_id] = self.embedder.embed(self.chunks[chunk_id].text)
+            mixed.append((chunk_id, 0.5 * score / top + 0.5 * float(self.vectors[chunk_id] @ query_vector)))
+        return sorted(mixed, key=lambda pair: pair[1], reverse=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {"files": len(self.files), "chunks": len(self.chunks), "terms": len(self.postings), **self.last_update}
+
+
+def open_index(root: str) -> CodeIndex:
+    """Load, catch up with the files on disk and save. `index.stats()` says what the catch up did."""
+    index = CodeIndex.load(root)
+    index.update()
+    if index.last_update.get("indexed") or index.last_update.get("removed") or index.last_update.get("touched"):
+        index.save()
+    return index
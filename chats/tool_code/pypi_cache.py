@@ -0,0 +1,146 @@
+"""
+Persistent cache of PyPI project lookups.
+
+Naming sessions check the same candidate names again and again, so answers are
+kept in a single SQLite file. Names that exist and names that don't get separate
+TTLs. Once an entry is stale it is revalidated with ETag/Last-Modified, so an
+unchanged project costs a 304 instead of a full download. If PyPI can't be reached
+or answers with an error, the stale entry is used rather than failing the lookup.
+
+Entries are keyed by the PEP 503 normalized name, so foo_bar and Foo.Bar share one.
+The file is only opened on the first lookup.
+"""
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from chats.tool_code.pypi_index import normalize
+from chats.utils import user_cache_dir
+
+
+@dataclass
+class CacheEntry:
+    name: str
+    status: int
+    body: Optional[dict[str, Any]]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    @property
+    def exists(self) -> bool:
+        return self.status == 200
+
+
+class PyPICache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        positive_ttl: float = 7 * 24 * 60 * 60,
+        negative_ttl: float = 12 * 60 * 60,
+    ):
+        # Names get registered all the time, so "doesn't exist" goes stale sooner than "exists"
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._connection: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stale_served = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Opened on first use, a conversation that never checks PyPI never touches the file."""
+        if self._connection is None:
+            self.path = self.path or os.path.join(user_cache_dir(), "pypi_cache.sqlite3")
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "name TEXT PRIMARY KEY, status INTEGER, body TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get(self, name: str) -> Optional[CacheEntry]:
+        row = self.connection.execute(
+            "SELECT name, status, body, etag, last_modified, fetched_at FROM projects WHERE name = ?",
+            (normalize(name),),
+        ).fetchone()
+        if row is None:
+            return None
+        name, status, body, etag, last_modified, fetched_at = row
+        return CacheEntry(name, status, json.loads(body) if body else None, etag, last_modified, fetched_at)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        ttl = self.positive_ttl if entry.exists else self.negative_ttl
+        return time.time() - entry.fetched_at < ttl
+
+    def put(
+        self,
+        name: str,
+        status: int,
+        body: Optional[dict[str, Any]],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CacheEntry:
+        """Store a lookup. Only `info` is kept, the release list can be megabytes and nothing reads it."""
+        if body and "info" in body:
+            body = {"info": body["info"]}
+        entry = CacheEntry(normalize(name), status, body, etag, last_modified, time.time())
+        self.connection.execute(
+            "INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                entry.name,
+                entry.status,
+                json.dumps(body) if body else None,
+                etag,
+                last_modified,
+                entry.fetched_at,
+            ),
+        )
+        self.connection.commit()
+        return entry
+
+    def touch(self, entry: CacheEntry) -> CacheEntry:
+        """Server said not modified, start the TTL over."""
+        entry.fetched_at = time.time()
+        self.connection.execute("UPDATE projects SET fetched_at = ? WHERE name = ?", (entry.fetched_at, entry.name))
+        self.connection.commit()
+        return entry
+
+    def conditional_headers(self, entry: CacheEntry) -> dict[str, str]:
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM projects")
+        self.connection.commit()
+
+    def stats(self) -> dict[str, Any]:
+        """Hits never touched the network. Revalidations still made a request, but got a 304.
+
+        Stale served are entries answered from the cache because the refresh failed.
+        """
+        lookups = self.hits + self.misses + self.revalidated + self.stale_served
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "stale_served": self.stale_served,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "saved_requests": self.hits,
+        }
@@ -0,0 +1,207 @@
+"""
+Offline index of every PyPI project name.
+
+Answers "does this name exist" from memory instead of one HTTP request per name
+and variant. Names are PEP 503 normalized and stored sorted in one file:
+
+    magic (8 bytes) | serial (uint64) | count (uint32) | offsets (count + 1 uint32) | names (utf-8)
+
+The loader mmaps the file and binary searches it, so opening an index of ~500k
+names costs next to nothing and pages are only read when a lookup touches them.
+
+Build it once, then keep it fresh with `refresh`, which only asks PyPI for
+projects created or removed since the serial stored in the file:
+
+    python -m chats.tool_code.pypi_index build --simple
+    python -m chats.tool_code.pypi_index build --dump names.txt
+    python -m chats.tool_code.pypi_index refresh
+    python -m chats.tool_code.pypi_index check requests not-a-real-name
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import urllib.request
+import xmlrpc.client
+from typing import Iterable, Optional
+
+from chats.utils import user_cache_dir
+
+MAGIC = b"PYNAMES1"
+HEADER = struct.Struct("<8sQI")
+SIMPLE_INDEX_URL = "https://pypi.org/simple/"
+XMLRPC_URL = "https://pypi.org/pypi"
+
+
+def normalize(name: str) -> str:
+    """PEP 503 normalization, e.g. Foo_Bar.baz -> foo-bar-baz"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def default_path() -> str:
+    return os.path.join(user_cache_dir(), "pypi_names.idx")
+
+
+def write_index(path: str, names: Iterable[str], serial: int = 0) -> int:
+    """Write normalized, de-duplicated, sorted names. Returns how many were written."""
+    encoded = sorted({normalize(name).encode("utf-8") for name in names if name and name.strip()})
+    offsets = [0]
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+
+    folder = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("wb", dir=folder, delete=False) as file:
+        file.write(HEADER.pack(MAGIC, serial, len(encoded)))
+        file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        file.write(b"".join(encoded))
+    os.replace(file.name, path)
+    return len(encoded)
+
+
+class PyPINameIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.reopen()
+
+    def reopen(self) -> None:
+        """Map the file, again after it was rewritten."""
+        with open(self.path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.serial, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a PyPI name index")
+        self._offsets_at = HEADER.size
+        self._names_at = HEADER.size + (self.count + 1) * 4
+
+    @classmethod
+    def load_if_exists(cls, path: Optional[str] = None) -> Optional["PyPINameIndex"]:
+        path = path or default_path()
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _name_at(self, position: int) -> bytes:
+        start, end = struct.unpack_from("<2I", self._map, self._offsets_at + position * 4)
+        return self._map[self._names_at + start : self._names_at + end]
+
+    def __contains__(self, name: str) -> bool:
+        wanted = normalize(name).encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name_at(middle) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self._name_at(low) == wanted
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self._name_at(position).decode("utf-8")
+
+    def update(
+        self, added: Iterable[str], removed: Iterable[str] = (), serial: Optional[int] = None
+    ) -> tuple[int, int]:
+        """Merge names into the file, drop removed ones, and reopen it. Returns how many were added and removed."""
+        new_names = [name for name in {normalize(name) for name in added} if name not in self]
+        gone = {name for name in {normalize(name) for name in removed} if name in self}
+        if not new_names and not gone and serial in (None, self.serial):
+            return 0, 0
+        everything = [name for name in self if name not in gone] + new_names
+        self.close()
+        write_index(self.path, everything, self.serial if serial is None else serial)
+        self.reopen()
+        return len(new_names), len(gone)
+
+    def add(self, names: Iterable[str], serial: Optional[int] = None) -> int:
+        """Merge new names into the file and reopen it. Returns how many were new."""
+        return self.update(names, serial=serial)[0]
+
+    def refresh(self) -> tuple[int, int]:
+        """Apply projects created and removed on PyPI since the serial this index was built at."""
+        client = xmlrpc.client.ServerProxy(XMLRPC_URL)
+        changes = client.changelog_since_serial(self.serial)
+        if not changes:
+            return 0, 0
+        created, removed = project_changes(changes)
+        return self.update(created, removed, serial=max(change[4] for change in changes))
+
+
+def project_changes(changes: Iterable[tuple]) -> tuple[set[str], set[str]]:
+    """Names created and names removed, from changelog entries in serial order. The last change to a name wins."""
+    created: set[str] = set()
+    removed: set[str] = set()
+    for name, version, _timestamp, action, _serial in changes:
+        name = normalize(name)
+        if action == "create":
+            created.add(name)
+            removed.discard(name)
+        elif action == "remove project" or (action == "remove" and not version):
+            # older entries say "remove" with no version for a whole project
+            removed.add(name)
+            created.discard(name)
+    return created, removed
+
+
+def fetch_simple_index(url: str = SIMPLE_INDEX_URL) -> tuple[list[str], int]:
+    """All project names and the serial they are current as of, from the JSON simple API (PEP 691)."""
+    request = urllib.request.Request(url, headers={"Accept": "application/vnd.pypi.simple.v1+json"})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        data = json.load(response)
+    return [project["name"] for project in data["projects"]], int(data["meta"].get("_last-serial", 0))
+
+
+def read_dump(path: str) -> list[str]:
+    """One name per line, e.g. from a BigQuery export."""
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def run(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m chats.tool_code.pypi_index", description=__doc__.split("\n")[1])
+    parser.add_argument("--index", default=None, help="index file, defaults to the user cache folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a new index")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--simple", action="store_true", help="download names from the PyPI simple index")
+    source.add_argument("--dump", help="file with one project name per line")
+    commands.add_parser("refresh", help="add and drop projects created or removed since the index was built")
+    add = commands.add_parser("add", help="add names by hand")
+    add.add_argument("names", nargs="+")
+    check = commands.add_parser("check", help="look up names")
+    check.add_argument("names", nargs="+")
+    args = parser.parse_args(argv)
+
+    path = args.index or default_path()
+    if args.command == "build":
+        if args.simple:
+            names, serial = fetch_simple_index()
+        else:
+            names, serial = read_dump(args.dump), 0
+        count = write_index(path, names, serial)
+        print(f"Wrote {count} names to {path}")
+        return
+
+    index = PyPINameIndex(path)
+    if args.command == "refresh":
+        added, removed = index.refresh()
+        print(f"Added {added} and removed {removed} names, now at serial {index.serial}")
+    elif args.command == "add":
+        print(f"Added {index.add(args.names)} names")
+    else:
+        for name in args.names:
+            print(f"{name}: {'taken' if name in index else 'available'}")
+    index.close()
+
+
+if __name__ == "__main__":
+    run()
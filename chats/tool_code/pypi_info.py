@@ -1,77 +1,190 @@
 import asyncio
+import functools
+import importlib.util
 import string
 from copy import copy
+from typing import Any, Optional
 
 import httpx
-import inflect
-from stdlib_list import stdlib_list
 
+from chats.tool_code.pypi_cache import PyPICache
+from chats.tool_code.pypi_index import PyPINameIndex
 from chats.tool_code.text_shorteners import convert_md_to_text
 
+STDLIB_VERSIONS = ["2.6", "2.7", "3.2", "3.3", "3.4", "3.5", "3.6", "3.7", "3.8", "3.9", "3.10", "3.11", "3.12"]
+
+
+@functools.lru_cache(maxsize=None)
+def all_stdlib_names() -> frozenset[str]:
+    """Every stdlib module name in any python version we care about, built once per process."""
+    from stdlib_list import stdlib_list
+
+    names: set[str] = set()
+    for version in STDLIB_VERSIONS:
+        names.update(stdlib_list(version))
+    return frozenset(names)
+
+
+@functools.lru_cache(maxsize=None)
+def inflect_engine() -> Any:
+    """Imported and built on first use, inflect is slow to import."""
+    import inflect
+
+    return inflect.engine()
+
 
 class PyPIChecker:
-    def __init__(self):
-        self.base_url = "https://pypi.org/pypi"
+    """Checks names against PyPI over one shared, keep-alive connection pool.
+
+    Use as `async with PyPIChecker() as checker:` so the pool is closed afterwards.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        base_url: str = "https://pypi.org/pypi",
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[PyPICache] = None,
+        name_index: Optional[PyPINameIndex] = None,
+    ):
+        self.base_url = base_url
+        self.cache = cache
+        # Offline list of every project name, answers existence checks without the network
+        self.name_index = name_index
+        self.max_concurrency = max_concurrency
+        self._client = client
+        self._owns_client = client is None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "PyPIChecker":
+        _ = self.client
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Long-lived client, created on first use. HTTP/2 if the h2 package is installed."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency
+                ),
+                timeout=httpx.Timeout(10.0),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+        self._client = None
+
+    async def get(self, url: str, headers: Optional[dict[str, str]] = None) -> httpx.Response:
+        """GET with at most max_concurrency requests in flight."""
+        async with self._semaphore:
+            return await self.client.get(url, headers=headers)
+
+    async def get_project(self, package_name: str) -> tuple[int, Optional[dict[str, Any]]]:
+        """Status code and JSON for a project, from the cache if there is a fresh enough answer.
+
+        A stale answer is still used when PyPI can't be reached or answers with an error.
+        """
+        entry = self.cache.get(package_name) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return entry.status, entry.body
+
+        headers = self.cache.conditional_headers(entry) if entry else None
+        try:
+            response = await self.get(f"{self.base_url}/{package_name}/json", headers=headers)
+        except httpx.HTTPError:
+            if not entry:
+                raise
+            self.cache.stale_served += 1
+            return entry.status, entry.body
+        if entry and response.status_code == 304:
+            self.cache.revalidated += 1
+            self.cache.touch(entry)
+            return entry.status, entry.body
+        if entry and response.status_code not in (200, 404):
+            # a 5xx or 429 says nothing about the project, the old answer is better than none
+            self.cache.stale_served += 1
+            return entry.status, entry.body
+
+        body = response.json() if response.status_code == 200 else None
+        if self.cache is not None and response.status_code in (200, 404):
+            self.cache.misses += 1
+            self.cache.put(
+                package_name,
+                response.status_code,
+                body,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return response.status_code, body
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Hit rate and requests saved by the cache, empty if there is no cache."""
+        return self.cache.stats() if self.cache else {}
 
     async def package_exists(self, package_name: str) -> bool:
         """Asynchronously check if a single package exists on PyPI."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.base_url}/{package_name}/json")
-            return response.status_code == 200
+        if self.name_index is not None:
+            return package_name in self.name_index
+        status, _ = await self.get_project(package_name)
+        return status == 200
 
     async def find_readme_from_github_for_package(self, package_name: str) -> str:
         """Find README.md from github for a package as found on pypi."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.base_url}/{package_name}/json")
-            if response.status_code == 200:
-                package_info = response.json()
-                if "info" in package_info:
-                    if "project_urls" in package_info["info"]:
-                        if "Source" in package_info["info"]["project_urls"]:
-                            source_url = package_info["info"]["project_urls"]["Source"]
-                            if source_url.startswith("https://github.com"):
-                                async with httpx.AsyncClient() as client:
-                                    response = await client.get(f"{source_url}/blob/master/README.md")
-                                    if response.status_code == 200:
-                                        return response.text
-                                    response = await client.get(f"{source_url}/blob/main/README.md")
-                                    if response.status_code == 200:
-                                        return response.text
-                                    response = await client.get(f"{source_url}/blob/main/README")
-                                    if response.status_code == 200:
-                                        return response.text
-            return ""
+        status, package_info = await self.get_project(package_name)
+        if status == 200:
+            if "info" in package_info:
+                if "project_urls" in package_info["info"]:
+                    if "Source" in package_info["info"]["project_urls"]:
+                        source_url = package_info["info"]["project_urls"]["Source"]
+                        if source_url.startswith("https://github.com"):
+                            response = await self.get(f"{source_url}/blob/master/README.md")
+                            if response.status_code == 200:
+                                return response.text
+                            response = await self.get(f"{source_url}/blob/main/README.md")
+                            if response.status_code == 200:
+                                return response.text
+                            response = await self.get(f"{source_url}/blob/main/README")
+                            if response.status_code == 200:
+                                return response.text
+        return ""
 
     async def describe_packages(
         self, package_list: list[str], truncate_description_at: int = 1000
     ) -> dict[str, dict[str, str]]:
         """Asynchronously get some descriptive info about packages."""
-        async with httpx.AsyncClient() as client:
-            tasks = [client.get(f"{self.base_url}/{package_name}/json") for package_name in package_list]
-            responses = await asyncio.gather(*tasks)
-
-            package_infos = dict(zip(package_list, [response.json() for response in responses]))
-            for name, package_info in package_infos.items():
-                if "message" in package_info and package_info["message"] == "Not Found":
-                    continue
-                if package_info["info"].get("description", "UNKNOWN") == "UNKNOWN":
-                    # try to get readme from github
-                    readme = await self.find_readme_from_github_for_package(name)
-                    if readme:
-                        package_info["info"]["description"] = readme
-
-                description = convert_md_to_text(package_info["info"]["description"])[:truncate_description_at]
-                info = {
-                    "summary": package_info["info"]["summary"],
-                    "description": description,
-                    "keywords": package_info["info"]["keywords"],
-                    "requires_python": package_info["info"]["requires_python"],
-                }
-                for key, value in copy(info).items():
-                    if not value:
-                        del info[key]
-                package_infos[name] = info
-            return package_infos
+        tasks = [self.get_project(package_name) for package_name in package_list]
+        responses = await asyncio.gather(*tasks)
+
+        package_infos = dict(zip(package_list, [body or {"message": "Not Found"} for _, body in responses]))
+        for name, package_info in package_infos.items():
+            if "message" in package_info and package_info["message"] == "Not Found":
+                continue
+            if package_info["info"].get("description", "UNKNOWN") == "UNKNOWN":
+                # try to get readme from github
+                readme = await self.find_readme_from_github_for_package(name)
+                if readme:
+                    package_info["info"]["description"] = readme
+
+            description = convert_md_to_text(package_info["info"]["description"], truncate_description_at)
+            info = {
+                "summary": package_info["info"]["summary"],
+                "description": description,
+                "keywords": package_info["info"]["keywords"],
+                "requires_python": package_info["info"]["requires_python"],
+            }
+            for key, value in copy(info).items():
+                if not value:
+                    del info[key]
+            package_infos[name] = info
+        return package_infos
 
     async def packages_exist(self, package_list: list[str]):
         """Concurrently check if a list of packages exist on PyPI."""
@@ -90,7 +203,7 @@ class PyPIChecker:
         # need to track variants
         package_info = {name: {"variants": set(), "available": False} for name in package_list}
 
-        engine = inflect.engine()
+        engine = inflect_engine()
 
         depuctuated = set()
         plurals = set()
@@ -149,18 +262,13 @@ class PyPIChecker:
         return package_info
 
     def check_if_in_any(self, package_name: str) -> bool:
-        """Check if a package name is in a list of package names."""
-        for version in ["2.6", "2.7", "3.2", "3.3", "3.4", "3.5", "3.6", "3.7", "3.8", "3.9", "3.10", "3.11", "3.12"]:
-            if package_name in stdlib_list(version):
-                return True
-        return False
+        """Check if a package name is a stdlib module in any version of python."""
+        return package_name in all_stdlib_names()
 
     def package_is_stdlib(self, package_list: list[str]) -> dict[str, bool]:
-        """Check if a package is a standard library module."""
-        results = {}
-        for package in package_list:
-            results[package] = self.check_if_in_any(package)
-        return results
+        """Check if packages are standard library modules, one set lookup each."""
+        stdlib = all_stdlib_names()
+        return {package: package in stdlib for package in package_list}
 
     def is_valid_string(self, package_name: str):
         """Check if a package name is a valid string."""
@@ -180,12 +288,11 @@ if __name__ == "__main__":
     # Asynchronous function to use the PyPIChecker
 
     async def main():
-        checker = PyPIChecker()
-        results = await checker.describe_packages(["faker", "names", "pandas"])
+        async with PyPIChecker() as checker:
+            results = await checker.describe_packages(["faker", "names", "pandas"])
         print(results)
 
     async def check_exists():
-        checker = PyPIChecker()
         to_check = [
             "mistune",
             "markdown2",
@@ -198,13 +305,13 @@ if __name__ == "__main__":
             "markdownify",
             "mistep",
         ]
-        results = await checker.packages_exist(to_check)
+        async with PyPIChecker() as checker:
+            results = await checker.packages_exist(to_check)
         print(results)
 
         # package_list = ['numpy', 'friends', 'oxen', 'pandas', "goose", 'nonexistentpackage']
 
     async def variants():
-        checker = PyPIChecker()
         package_list = [
             # "spellcheckbot",
             # "chatbot_spellcheck",
@@ -217,7 +324,8 @@ if __name__ == "__main__":
             # "linguisticorrect",
             # "promptspell",
         ]
-        results = await checker.packages_exist(package_list)
+        async with PyPIChecker() as checker:
+            results = await checker.packages_exist(package_list)
         print(results)
         for package, exists in results.items():
             print(f"Does {package} exist? {exists}")
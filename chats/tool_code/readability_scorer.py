@@ -0,0 +1,122 @@
+"""
+Readability scores from one pass over the text.
+
+The readability package analyzes the whole text once per `Readability(text)`
+and its scorers each go through the statistics again. Here sentences and words
+are tokenized once per paragraph into counts (words, sentences, syllables,
+letters, complex words), and Flesch-Kincaid, Gunning Fog and Coleman-Liau are
+computed from the summed counts. The tokenizers, syllable rules and formulas
+match the readability package.
+
+Counts are cached per paragraph, so scoring a text again after an edit, as the
+text compression bot does every round, only recounts the paragraphs that changed.
+A paragraph always ends a sentence. The readability package runs one sentence
+split over the whole text, so scores can differ for a paragraph that doesn't end
+in a full stop, like a heading.
+"""
+import functools
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+# same rules as readability.text.syllables
+SILENT_ENDING = re.compile(r"(?:[^laeiouy]es|[^laeiouy]e)$")
+LEADING_Y = re.compile(r"^y")
+VOWEL_GROUPS = re.compile(r"[aeiouy]{1,2}")
+PUNCTUATION = re.compile(r"^[.,\/#!$%\'\^&\*;:{}=\-_`~()]$")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# the readability package refuses to score shorter texts
+MIN_WORDS = 100
+LOW_WORD_COUNT = "N/A - low word count"
+
+
+@functools.lru_cache(maxsize=65536)
+def count_syllables(word: str) -> int:
+    word = word.lower()
+    if len(word) <= 3:
+        return 1
+    word = SILENT_ENDING.sub("", word)
+    word = LEADING_Y.sub("", word)
+    return len(VOWEL_GROUPS.findall(word))
+
+
+@dataclass(frozen=True)
+class TextCounts:
+    words: int = 0
+    sentences: int = 0
+    syllables: int = 0
+    letters: int = 0
+    # three or more syllables, not capitalized and not hyphenated
+    complex_words: int = 0
+
+    def __add__(self, other: "TextCounts") -> "TextCounts":
+        return TextCounts(
+            self.words + other.words,
+            self.sentences + other.sentences,
+            self.syllables + other.syllables,
+            self.letters + other.letters,
+            self.complex_words + other.complex_words,
+        )
+
+    def flesch_kincaid(self) -> float:
+        return 0.38 * self.words / self.sentences + 11.8 * self.syllables / self.words - 15.59
+
+    def gunning_fog(self) -> float:
+        return 0.4 * (self.words / self.sentences + 100 * self.complex_words / self.words)
+
+    def coleman_liau(self) -> float:
+        per_100_words = self.words / 100
+        return 0.0588 * self.letters / per_100_words - 0.296 * self.sentences / per_100_words - 15.8
+
+
+def split_paragraphs(text: str) -> list[str]:
+    return [paragraph for paragraph in PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+
+
+class ReadabilityScorer:
+    def __init__(self, cache_size: int = 4096, sentence_splitter: Optional[Callable[[str], list[str]]] = None):
+        from nltk.tokenize import TweetTokenizer
+
+        self.word_tokenizer = TweetTokenizer()
+        if sentence_splitter is None:
+            from nltk.tokenize import sent_tokenize
+
+            sentence_splitter = sent_tokenize
+        self.sentence_splitter = sentence_splitter
+        self.paragraph_counts = functools.lru_cache(maxsize=cache_size)(self.count_paragraph)
+
+    def count_paragraph(self, paragraph: str) -> TextCounts:
+        words = syllables = letters = complex_words = 0
+        for token in self.word_tokenizer.tokenize(paragraph):
+            if PUNCTUATION.match(token):
+                continue
+            word_syllables = count_syllables(token)
+            words += 1
+            syllables += word_syllables
+            letters += len(token)
+            if word_syllables >= 3 and not token[0].isupper() and "-" not in token:
+                complex_words += 1
+        return TextCounts(words, len(self.sentence_splitter(paragraph)), syllables, letters, complex_words)
+
+    def counts(self, text: str) -> TextCounts:
+        return sum((self.paragraph_counts(paragraph) for paragraph in split_paragraphs(text)), TextCounts())
+
+    def scores(self, text: str) -> dict[str, Any]:
+        """Same keys and rounding as text_shorteners.readability_scores always had."""
+        counts = self.counts(text)
+        if counts.words < MIN_WORDS or not counts.sentences:
+            return {"flesch_kincaid": LOW_WORD_COUNT, "gunning_fog": LOW_WORD_COUNT, "coleman_liau": LOW_WORD_COUNT}
+        return {
+            "flesch_kincaid": round(counts.flesch_kincaid(), 1),
+            "gunning_fog": round(counts.gunning_fog(), 1),
+            "coleman_liau": round(counts.coleman_liau(), 1),
+        }
+
+    def scores_many(self, texts: Iterable[str]) -> list[dict[str, Any]]:
+        """Scores for each text. Paragraphs the texts share, e.g. drafts of one document, are counted once."""
+        return [self.scores(text) for text in texts]
+
+
+@functools.lru_cache(maxsize=None)
+def default_scorer() -> ReadabilityScorer:
+    return ReadabilityScorer()
@@ -1,66 +1,111 @@
-import tiktoken
-from markdown_it import MarkdownIt
-from mdit_plain.renderer import RendererPlain
-from nltk.tokenize import RegexpTokenizer
-from readability import Readability
-from readability.exceptions import ReadabilityException
-
+"""
+Text measures for the bots: tokens, words, readability, markdown to plain text.
 
-def convert_md_to_text(md_data: str) -> str:
-    parser = MarkdownIt(renderer_cls=RendererPlain)
-    return parser.render(md_data)
+markdown_it, nltk and tiktoken are imported by the function that needs
+them, on first call, so importing this module (and every bot that imports it) stays cheap.
+The markdown parser and word tokenizer are built once and reused.
+Readability is scored by chats.tool_code.readability_scorer.
+"""
+import functools
+from typing import Any, Iterator, Optional
+
+from chats import token_utils
+from chats.tool_code.readability_scorer import default_scorer
+
+# lines of markdown parsed at a time when only the start of the text is wanted
+MARKDOWN_WINDOW_LINES = 64
+
+
+@functools.lru_cache(maxsize=None)
+def markdown_parser() -> Any:
+    """A MarkdownIt with the plain text renderer, built on first use."""
+    from markdown_it import MarkdownIt
+    from mdit_plain.renderer import RendererPlain
+
+    return MarkdownIt(renderer_cls=RendererPlain)
+
+
+@functools.lru_cache(maxsize=None)
+def word_tokenizer() -> Any:
+    from nltk.tokenize import RegexpTokenizer
+
+    return RegexpTokenizer(r"\w+")
+
+
+def md_text_pieces(md_data: str, window_lines: int = MARKDOWN_WINDOW_LINES) -> Iterator[str]:
+    """
+    Plain text of the markdown, one top level block at a time, unstripped.
+
+    The markdown is parsed a window of lines at a time. The last block in a window
+    may go on past it, so it is parsed again at the start of the next window, which
+    doubles until it holds a whole block. A link whose reference is defined further
+    down than the window can come out as written.
+    """
+    parser = markdown_parser()
+    renderer = parser.renderer
+    lines = md_data.splitlines(keepends=True)
+    env: dict[str, Any] = {}
+    start = 0
+    while start < len(lines):
+        end = min(len(lines), start + window_lines)
+        tokens = parser.parse("".join(lines[start:end]), env)
+        blocks = [index for index, token in enumerate(tokens) if token.level == 0 and token.nesting >= 0]
+        if end < len(lines):
+            if len(blocks) < 2 or not tokens[blocks[-1]].map[0]:
+                window_lines *= 2
+                continue
+            stop = blocks[-1]
+            next_start = start + tokens[stop].map[0]
+        else:
+            stop = len(tokens)
+            next_start = end
+        for index in range(stop):
+            token = tokens[index]
+            piece = renderer.rules.get(token.type, renderer.render_default)(tokens, index, parser.options, env)
+            if token.children is not None:
+                piece += renderer.render(token.children, parser.options, env)
+            yield piece
+        start = next_start
+
+
+def convert_md_to_text(md_data: str, max_chars: Optional[int] = None) -> str:
+    """
+    Markdown to plain text. With max_chars, the first max_chars characters of it,
+    parsing only as much of the markdown as that takes.
+    """
+    if max_chars is None:
+        return markdown_parser().render(md_data)
+    text = ""
+    for piece in md_text_pieces(md_data):
+        text = (text + piece).lstrip()
+        if len(text.rstrip()) >= max_chars:
+            break
+    return text.strip()[:max_chars]
 
 
 def count_tokens(text: str) -> int:
     """Count the number of tokens in a string."""
-    # gpt3 turbo - cl100k_base
-    # gpt2 (or r50k_base) 	Most GPT-3 models
-    # p50k_base 	Code models, text-davinci-002, text-davinci-003
-    # cl100k_base 	text-embedding-ada-002
-    # enc = tiktoken.get_encoding("cl100k_base")
-    encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    tokens = encoding.encode(text)
-    token_count = len(tokens)
-    return token_count
+    return token_utils.count_tokens(text, "gpt-3.5-turbo")
+
+
+def count_tokens_many(texts: list[str]) -> list[int]:
+    """Count the number of tokens in many strings."""
+    return token_utils.count_tokens_many(texts, "gpt-3.5-turbo")
 
 
 def word_count(text: str) -> int:
     """Count the number of tokens in a string."""
-    tokenizer = RegexpTokenizer(r"\w+")
-    tokens = tokenizer.tokenize(text)
-    return len(tokens)
+    return len(word_tokenizer().tokenize(text))
 
 
 def readability_scores(text: str) -> dict[str, float]:
-    """Calculate readability scores for a string."""
-    r = Readability(text)
-    try:
-        flesch_kincaid = round(r.flesch_kincaid().score, 1)
-    except ReadabilityException:
-        flesch_kincaid = "N/A - low word count"
-
-    try:
-        gunning_fog = round(r.gunning_fog().score, 1)
-    except ReadabilityException:
-        gunning_fog = "N/A - low word count"
-
-    try:
-        coleman_liau = round(r.coleman_liau().score, 1)
-    except ReadabilityException:
-        coleman_liau = "N/A - low word count"
-
-    return {
-        "flesch_kincaid": flesch_kincaid,
-        # "flesch": r.flesch(),
-        "gunning_fog": gunning_fog,
-        "coleman_liau": coleman_liau,
-    }
-    # r.coleman_liau()
-    # r.dale_chall()
-    # r.ari()
-    # r.linsear_write()
-    # r.smog()
-    # r.spache()
+    """Calculate readability scores for a string. Paragraphs scored before aren't counted again."""
+    return default_scorer().scores(text)
+
+
+def readability_scores_many(texts: list[str]) -> list[dict[str, float]]:
+    """Calculate readability scores for many strings."""
+    return default_scorer().scores_many(texts)
 
 
 LOTS_OF_TEXT = """
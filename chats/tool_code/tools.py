@@ -0,0 +1,100 @@
+"""
+Functions the bots can call. Importing this module registers them with TOOLS.
+"""
+from chats.tool_code.code_index import CodeIndex
+from chats.tool_code.pypi_info import PyPIChecker
+from chats.tool_code.text_shorteners import count_tokens as _count_tokens
+from chats.tool_code.text_shorteners import readability_scores as _readability_scores
+from chats.tool_code.text_shorteners import word_count as _word_count
+from chats.tool_registry import TOOLS
+
+
+@TOOLS.tool(kind="async")
+async def package_exists(package_name: str, *, checker: PyPIChecker) -> bool:
+    """Check if a package exists on pypi
+
+    Args:
+        package_name(str): Name of the package we want to check for existence
+    """
+    return await checker.package_exists(package_name)
+
+
+@TOOLS.tool(name="packages_exists", kind="async")
+async def packages_exist(package_names: list[str], *, checker: PyPIChecker) -> dict[str, bool]:
+    """Check if a package exists on pypi
+
+    Args:
+        package_names(list[str]): Names of packages we want to check for existence
+    """
+    return await checker.packages_exist(package_names)
+
+
+@TOOLS.tool(kind="async")
+async def packages_or_variant_exist(package_names: list[str], *, checker: PyPIChecker) -> dict:
+    """Check if a package (or close variants) exists on pypi
+
+    Args:
+        package_names(list[str]): Names of packages we want to check for existence
+    """
+    return await checker.packages_or_variant_exist(package_names)
+
+
+@TOOLS.tool(kind="sync")
+def package_is_stdlib(package_names: list[str], *, checker: PyPIChecker) -> dict[str, bool]:
+    """Check if packages names conflict with stdlib for any version of python
+
+    Args:
+        package_names(list[str]): Names of packages we want to check for conflict with stdlib
+    """
+    return checker.package_is_stdlib(package_names)
+
+
+@TOOLS.tool(kind="async")
+async def describe_packages(package_names: list[str], *, checker: PyPIChecker) -> dict:
+    """Get some descriptive info about packages
+
+    Args:
+        package_names(list[str]): Names of packages we want descriptive info about
+    """
+    return await checker.describe_packages(package_names)
+
+
+@TOOLS.tool(kind="sync")
+def count_tokens(text: str) -> int:
+    """Count tokens
+
+    Args:
+        text(str): Text to count tokens in
+    """
+    return _count_tokens(text)
+
+
+@TOOLS.tool(kind="cpu")
+def readability_scores(text: str) -> dict:
+    """Get some readability scores
+
+    Args:
+        text(str): Text to calculate readability scores for
+    """
+    return _readability_scores(text)
+
+
+@TOOLS.tool(kind="sync")
+def word_count(text: str) -> int:
+    """Count words ignoring whitespace and punctuation
+
+    Args:
+        text(str): Text to calculate word count for
+    """
+    return _word_count(text)
+
+
+@TOOLS.tool(kind="sync")
+def search_code(query: str, max_results: int = 5, *, code_index: CodeIndex) -> list[dict]:
+    """Search the code under review for functions, methods and classes relevant to a question
+
+    Args:
+        query(str): What to look for, e.g. names of functions or what the code does
+        max_results(int): How many code chunks to return
+    """
+    return [hit.as_dict() for hit in code_index.search(query, max_results)]
@@ -0,0 +1,159 @@
+"""
+Registry of python functions the assistants can call as tools.
+
+Decorating a function registers it under its name and builds its FunctionDefinition
+once, from the signature and the google style docstring, so the JSON schema never
+has to be copied into each chat room by hand.
+
+Keyword-only arguments aren't part of the schema. The executor fills them in from
+context, e.g. a shared PyPIChecker, so handler objects are reused across calls.
+
+Each tool says how it should run:
+- "async": awaited on the event loop
+- "sync": in the default thread pool
+- "cpu": in a process pool, for pure python that would hold the GIL
+"""
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import re
+import typing
+from dataclasses import dataclass
+from typing import Any, Callable, Literal, Optional
+
+from openai.types import FunctionDefinition
+from openai.types.beta.threads.run import ToolAssistantToolsFunction
+
+ToolKind = Literal["async", "sync", "cpu"]
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", dict: "object"}
+
+_PROCESS_POOL: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+def cpu_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """Process pool for CPU heavy tools, started on first use."""
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        _PROCESS_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+    return _PROCESS_POOL
+
+
+def json_schema_for(annotation: Any) -> dict[str, Any]:
+    """JSON schema for a simple type annotation, e.g. list[str]"""
+    origin = typing.get_origin(annotation)
+    if origin in (list, tuple, set):
+        item_types = typing.get_args(annotation)
+        schema: dict[str, Any] = {"type": "array"}
+        if item_types:
+            schema["items"] = json_schema_for(item_types[0])
+        return schema
+    if origin is dict:
+        return {"type": "object"}
+    if annotation in JSON_TYPES:
+        return {"type": JSON_TYPES[annotation]}
+    raise TypeError(f"Don't know the JSON schema for {annotation}")
+
+
+def docstring_parts(function: Callable) -> tuple[str, dict[str, str]]:
+    """Summary and argument descriptions from a google style docstring."""
+    doc = inspect.getdoc(function) or ""
+    summary = doc.split("\n\n")[0].replace("\n", " ").strip()
+    arguments = {}
+    in_args = False
+    for line in doc.splitlines():
+        if line.strip() in ("Args:", "Arguments:"):
+            in_args = True
+            continue
+        if in_args:
+            match = re.match(r"^\s+(\w+)\s*(\(.*?\))?\s*:\s*(.+)$", line)
+            if match:
+                arguments[match.group(1)] = match.group(3).strip()
+            elif line.strip() and not line.startswith(" "):
+                in_args = False
+    return summary, arguments
+
+
+@dataclass
+class Tool:
+    name: str
+    function: Callable[..., Any]
+    kind: ToolKind
+    definition: FunctionDefinition
+    parameters: list[str]
+    context: list[str]
+
+    def assistant_tool(self) -> ToolAssistantToolsFunction:
+        return ToolAssistantToolsFunction(function=self.definition, type="function")
+
+
+class ToolRegistry:
+    def __init__(self):
+        self.tools: dict[str, Tool] = {}
+
+    def tool(
+        self, name: Optional[str] = None, description: Optional[str] = None, kind: ToolKind = "sync"
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Register a function as a tool. The function is returned unchanged."""
+
+        def register(function: Callable[..., Any]) -> Callable[..., Any]:
+            if kind == "async" and not inspect.iscoroutinefunction(function):
+                raise TypeError(f"{function.__name__} is registered as async but isn't a coroutine function")
+            summary, argument_docs = docstring_parts(function)
+            hints = typing.get_type_hints(function)
+            properties = {}
+            required = []
+            parameters = []
+            context = []
+            for parameter in inspect.signature(function).parameters.values():
+                if parameter.kind == inspect.Parameter.KEYWORD_ONLY:
+                    context.append(parameter.name)
+                    continue
+                parameters.append(parameter.name)
+                schema = json_schema_for(hints[parameter.name])
+                if parameter.name in argument_docs:
+                    schema["description"] = argument_docs[parameter.name]
+                properties[parameter.name] = schema
+                if parameter.default is inspect.Parameter.empty:
+                    required.append(parameter.name)
+            tool_name = name or function.__name__
+            self.tools[tool_name] = Tool(
+                name=tool_name,
+                function=function,
+                kind=kind,
+                definition=FunctionDefinition(
+                    name=tool_name,
+                    description=description or summary,
+                    parameters={"type": "object", "properties": properties, "required": required},
+                ),
+                parameters=parameters,
+                context=context,
+            )
+            return function
+
+        return register
+
+    def get(self, name: str) -> Tool:
+        if name not in self.tools:
+            raise Exception(f"Unknown function name {name}")
+        return self.tools[name]
+
+    def assistant_tools(self, *names: str) -> list[ToolAssistantToolsFunction]:
+        """Tool definitions to pass to create_run"""
+        return [self.get(name).assistant_tool() for name in names]
+
+    async def call(self, name: str, arguments: dict[str, Any], **context: Any) -> Any:
+        """Run a tool on the pool its kind asks for."""
+        tool = self.get(name)
+        kwargs = {key: value for key, value in arguments.items() if key in tool.parameters}
+        kwargs.update({key: context[key] for key in tool.context})
+        if tool.kind == "async":
+            return await tool.function(**kwargs)
+        loop = asyncio.get_running_loop()
+        executor = cpu_pool() if tool.kind == "cpu" else None
+        # partial, not a lambda, so it pickles for the process pool
+        return await loop.run_in_executor(executor, functools.partial(tool.function, **kwargs))
+
+
+TOOLS = ToolRegistry()
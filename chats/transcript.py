@@ -0,0 +1,107 @@
+"""
+A growing conversation, kept as segments with their token counts.
+
+Each segment is counted once, when it is added, so the size of the whole
+transcript is a running sum instead of re-tokenizing everything every turn.
+The prompt string is extended with the new segments only.
+
+To stay under a token budget, old turns can be dropped (a sliding window) or
+folded into a summary. Counts are per segment, so they can be off by a token
+where two segments meet, the budget should leave a little room.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+
+@dataclass
+class Segment:
+    text: str
+    tokens: int
+    turn: int
+    kind: str = "turn"
+
+
+class Transcript:
+    def __init__(self, counter: Callable[[str], int]):
+        self.counter = counter
+        self.segments: list[Segment] = []
+        self.total_tokens = 0
+        self.turns = 0
+        self.dropped_tokens = 0
+        self._rendered = ""
+        self._rendered_segments = 0
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def add(self, text: str, new_turn: bool = False, kind: str = "turn") -> Segment:
+        if new_turn or not self.turns:
+            self.turns += 1
+        segment = Segment(text, self.counter(text), self.turns, kind)
+        self.segments.append(segment)
+        self.total_tokens += segment.tokens
+        return segment
+
+    def render(self) -> str:
+        """The whole transcript as one string, only new segments are joined on."""
+        if self._rendered_segments < len(self.segments):
+            self._rendered += "".join(segment.text for segment in self.segments[self._rendered_segments :])
+            self._rendered_segments = len(self.segments)
+        return self._rendered
+
+    def replace_segments(self, segments: list[Segment]) -> None:
+        self.segments = segments
+        self.total_tokens = sum(segment.tokens for segment in segments)
+        self._rendered = ""
+        self._rendered_segments = 0
+
+    def oldest_turns(self, keep_turns: int) -> list[int]:
+        """Turns that may go, oldest first, the last `keep_turns` stay."""
+        turns = sorted({segment.turn for segment in self.segments if segment.kind == "turn"})
+        return turns[: max(0, len(turns) - keep_turns)]
+
+    def trim(self, budget: int, keep_turns: int = 1) -> int:
+        """Sliding window: drop whole turns, oldest first, until the transcript fits. Returns tokens dropped."""
+        before = self.total_tokens
+        removable = self.oldest_turns(keep_turns)
+        drop: set[int] = set()
+        remaining = self.total_tokens
+        for turn in removable:
+            if remaining <= budget:
+                break
+            drop.add(turn)
+            remaining -= sum(segment.tokens for segment in self.segments if segment.turn == turn)
+        if drop:
+            self.replace_segments([segment for segment in self.segments if segment.turn not in drop])
+        self.dropped_tokens += before - self.total_tokens
+        return before - self.total_tokens
+
+    async def summarize_oldest(
+        self, budget: int, summarize: Callable[[str], Awaitable[str]], keep_turns: int = 1
+    ) -> int:
+        """Fold old turns, and any earlier summary, into one summary segment until the transcript fits.
+
+        Falls back to the sliding window if the summary doesn't make enough room. Returns tokens dropped.
+        """
+        if self.total_tokens <= budget:
+            return 0
+        before = self.total_tokens
+        fold: set[int] = set()
+        remaining = self.total_tokens
+        for turn in self.oldest_turns(keep_turns):
+            if remaining <= budget:
+                break
+            fold.add(turn)
+            remaining -= sum(segment.tokens for segment in self.segments if segment.turn == turn)
+        folded = [segment for segment in self.segments if segment.kind == "summary" or segment.turn in fold]
+        if fold:
+            summary_text = await summarize("".join(segment.text for segment in folded))
+            summary = Segment(summary_text, self.counter(summary_text), 0, "summary")
+            kept = [segment for segment in self.segments if segment.kind != "summary" and segment.turn not in fold]
+            self.replace_segments([summary] + kept)
+            self.dropped_tokens += max(0, before - self.total_tokens)
+        self.trim(budget, keep_turns)
+        return before - self.total_tokens
+
+    def summary(self) -> Optional[str]:
+        return next((segment.text for segment in self.segments if segment.kind == "summary"), None)
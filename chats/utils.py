@@ -3,34 +3,45 @@ One off functions
 """
 import json
 import os
-from typing import Any
-
-import markpickle
-from pydantic import BaseModel
-
-
-def write_json_to_logs(obj, kind: str):
-    """Write json to logs folder, with a prefix of 0001 for first run, 0002 for second run, etc."""
-    base_file_name = f"logs/{str(len(os.listdir('logs'))).zfill(4)}_{kind}.json"
-    file_name = os.path.join(os.path.dirname(__file__), base_file_name)
-    with open(file_name, "w", encoding="utf-8", errors="backslashreplace") as f:
-        if hasattr(obj, "model_dump_json"):
-            dictified = json.loads(obj.model_dump_json())
-            dictified = {k: v for k, v in dictified.items() if v}
-            f.write(json.dumps(dictified, indent=2, cls=SetEncoder))
-        else:
-            dictified = json.loads(json.dumps(obj, cls=SetEncoder))
-            if isinstance(dictified, dict):
-                dictified = {k: v for k, v in dictified.items() if v}
-            f.write(json.dumps(dictified, indent=2, cls=SetEncoder))
-    if isinstance(obj, BaseModel):
-        pydantic_model_to_pretty_md(obj, base_file_name.replace(".json", ".md"))
-    else:
-        with open(base_file_name.replace(".json", ".md"), "w", encoding="utf-8", errors="backslashreplace") as md_file:
-            markpickle.dump(obj, md_file)
+from typing import TYPE_CHECKING, Any, Optional
+
+from chats.log_sink import LogSink
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+LOG_FOLDER = os.path.join(os.path.dirname(__file__), "logs")
+_LOG_SINK: Optional[LogSink] = None
+
+
+def user_cache_dir() -> str:
+    """Folder for caches that should outlive a session, e.g. ~/.cache/cheaper_openai"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    folder = os.path.join(base, "cheaper_openai")
+    os.makedirs(folder, exist_ok=True)
+    return folder
 
 
-def show_json(obj: BaseModel):
+def configure_logs(jsonl: bool = False, markdown: bool = False, folder: str = LOG_FOLDER) -> LogSink:
+    """Pick the log layout. jsonl appends to a rotating events.jsonl, markdown also writes .md twins."""
+    global _LOG_SINK
+    if _LOG_SINK is not None:
+        _LOG_SINK.close()
+    _LOG_SINK = LogSink(folder, jsonl=jsonl, markdown=markdown)
+    return _LOG_SINK
+
+
+def write_json_to_logs(obj, kind: str) -> int:
+    """Write json to logs folder, with a prefix of 0001 for first event, 0002 for second, etc.
+
+    Only queues the object, a background thread writes it.
+    """
+    if _LOG_SINK is None:
+        configure_logs()
+    return _LOG_SINK.write(obj, kind)
+
+
+def show_json(obj: "BaseModel"):
     """Dump a pydantic model"""
     dictified = obj.model_dump()
     map_of_dict = obj.model_dump()
@@ -40,7 +51,7 @@ def show_json(obj: BaseModel):
     print(json.dumps(dictified, indent=2, cls=SetEncoder))
 
 
-def format_pydantic_value(model_instance: BaseModel) -> str:
+def format_pydantic_value(model_instance: "BaseModel") -> str:
     """MessageContentText"""
     md_content = f"# {model_instance.__class__.__name__} Instance\n\n"
     dictified = model_instance.model_dump()
@@ -54,6 +65,8 @@ def format_pydantic_value(model_instance: BaseModel) -> str:
 
 
 def format_value(value: Any) -> str:
+    from pydantic import BaseModel
+
     if isinstance(value, (list, tuple)):
         return ", ".join(format_value(item) for item in value)
     elif isinstance(value, dict):
@@ -64,7 +77,7 @@ def format_value(value: Any) -> str:
         return str(value)
 
 
-def pydantic_model_to_pretty_md(model_instance: BaseModel, file_name: str):
+def pydantic_model_to_pretty_md(model_instance: "BaseModel", file_name: str):
     md_content = f"# {model_instance.__class__.__name__} Instance\n\n"
 
     for field_name, value in model_instance.dict().items():
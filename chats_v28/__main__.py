@@ -1,4 +1,4 @@
-from chats.create import run
+from chats_v28.create import run
 
 if __name__ == "__main__":
     run()
@@ -1,10 +1,13 @@
+import functools
 import os
 
-import openai
-from dotenv import load_dotenv
 
-load_dotenv()
+@functools.lru_cache(maxsize=None)
+def create_client():
+    """Set the key on the openai module. Called before the first request, not at import, once is enough."""
+    import openai
+    from dotenv import load_dotenv
 
+    load_dotenv()
 
-def create_client():
     openai.api_key = os.environ["OPENAI_API_KEY"]
@@ -1,11 +1,10 @@
 import openai
 
-from chats.ai_utils.client_utils import create_client
-
-create_client()
+from chats_v28.ai_utils.client_utils import create_client
 
 
 def list_engines():
+    create_client()
     # list engines
     engines = openai.Engine.list()
 
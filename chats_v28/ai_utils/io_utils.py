@@ -1,8 +1,8 @@
 import os
 import tomllib
-from typing import Any
+from typing import Any, Callable, Iterable, Union
 
-import yaml
+from chats.stream_sink import MarkdownStreamSink, clean_file_name
 
 
 def read_config() -> dict[str, Any]:
@@ -22,29 +22,22 @@ def read_yaml_toc_prompt(output_folder: str) -> Any:
     """Read the prompt from the file"""
     file_path = os.path.join(output_folder, "toc.yml")
     with open(file_path, encoding="utf-8") as file:
+        import yaml
+
         return yaml.safe_load(file.read())
 
 
 def dump_response(
     prompt: str, choices: list[str], file_name: str, folder_path: str, add_number_to_filename: bool = True
-):
-    """Dump the response to a file"""
+) -> str:
+    """Dump the response to a file, returns the path written"""
     folder_path = os.path.join(folder_path, "output")
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
     file_count = len([f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))])
     # Create the new file name
     count = str(file_count + 1).zfill(4)
-    file_name = (
-        file_name.strip()
-        .replace(" ", "_")
-        .replace("\n", "")
-        .replace("\t", "")
-        .replace("\r", "")
-        .replace("'", "")
-        .replace('"', "")
-        .replace(":", "_")
-    )
+    file_name = clean_file_name(file_name)
     if add_number_to_filename:
         new_file_name = f"{file_name}_{count}.md"
     else:
@@ -58,3 +51,31 @@ def dump_response(
         for choice in choices:
             file.write(choice)
             # print(choice)
+    return full_name
+
+
+def stream_response(
+    prompt: str,
+    chunks: Iterable[str],
+    file_name: Union[str, Callable[[str], str]],
+    folder_path: str,
+    add_number_to_filename: bool = True,
+) -> str:
+    """Like dump_response, but the file fills up while the completion streams.
+
+    file_name can be a function of the start of the text, e.g. create_name, it is
+    applied once the completion is done. Returns the path written.
+    """
+    with MarkdownStreamSink(os.path.join(folder_path, "output"), prompt) as sink:
+        for chunk in chunks:
+            sink.write(chunk)
+        name = file_name(sink.head) if callable(file_name) else file_name
+        return sink.finish(name, add_number_to_filename)
+
+
+def read_streamed_completion(path: str, prompt: str) -> str:
+    """The completion part of a file written by stream_response, after the prompt and its blank line."""
+    with open(path, encoding="utf-8") as file:
+        if prompt:
+            file.read(len(prompt) + 2)
+        return file.read()
@@ -0,0 +1,57 @@
+"""
+Checkpoints for long book runs.
+
+Each finished section is recorded under a hash of everything that decides its
+text: system prompt, user prompt, model and temperature. A rerun skips sections
+whose hash is recorded and whose file is still there, so a crash halfway through
+a book only costs the sections that weren't done. Changing a prompt changes its
+hash, so only that section is written again.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Optional
+
+
+def section_key(system: str, prompt: str, model: str, temperature: float) -> str:
+    payload = json.dumps([system, prompt, model, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class BookManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.skipped = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.entries = json.load(file)
+
+    @classmethod
+    def for_folder(cls, output_folder: str) -> "BookManifest":
+        return cls(os.path.join(output_folder, "manifest.json"))
+
+    def is_done(self, key: str) -> bool:
+        """Finished before and the output file wasn't deleted since."""
+        entry = self.entries.get(key)
+        return entry is not None and os.path.exists(entry["file"])
+
+    def file_for(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        return entry["file"] if entry else None
+
+    def record(self, key: str, file: str, title: str) -> None:
+        # a changed prompt rewrites the same file, the old key no longer describes it
+        for old_key in [old for old, entry in self.entries.items() if entry["file"] == file and old != key]:
+            del self.entries[old_key]
+        self.entries[key] = {"file": file, "title": title, "finished": time.time()}
+        self.save()
+
+    def save(self) -> None:
+        """Write to a temp file and rename, a crash mid write doesn't lose the manifest."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file, indent=2)
+        os.replace(temp_path, self.path)
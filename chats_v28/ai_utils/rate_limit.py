@@ -0,0 +1,67 @@
+"""
+Token bucket rate limiting for requests per minute and tokens per minute.
+
+OpenAI limits both at once, so a request has to wait until both buckets have room.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self) -> None:
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available, 0 if it is now."""
+        self.refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.available = min(self.capacity, self.available + amount)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: float = 3500,
+        tokens_per_minute: float = 90_000,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.sleep = sleep
+        # first come, first served, a big request isn't starved by small ones
+        self.lock = asyncio.Lock()
+        self.waited = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one more request of `tokens` tokens fits under both limits."""
+        async with self.lock:
+            while True:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                self.waited += wait
+                await self.sleep(wait)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Return tokens that were reserved (e.g. max_tokens) but not used."""
+        if used < reserved:
+            self.tokens.give_back(reserved - used)
@@ -1,12 +1,14 @@
-import tiktoken
+from chats import token_utils
+
+# gpt2 (or r50k_base) 	Most GPT-3 models
+# p50k_base 	Code models, text-davinci-002, text-davinci-003
+# cl100k_base 	text-embedding-ada-002
+ENCODING = "p50k_base"
 
 
 def count_tokens(prompt):
-    # gpt2 (or r50k_base) 	Most GPT-3 models
-    # p50k_base 	Code models, text-davinci-002, text-davinci-003
-    # cl100k_base 	text-embedding-ada-002
-    enc = tiktoken.get_encoding("p50k_base")
-    tokens = enc.encode(prompt)
-    # print(len(tokens))
-    prompt_tokens = len(tokens)
-    return prompt_tokens
+    return token_utils.count_tokens(prompt, ENCODING)
+
+
+def count_tokens_many(prompts):
+    return token_utils.count_tokens_many(prompts, ENCODING)
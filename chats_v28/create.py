@@ -1,26 +1,31 @@
 import os
 import sys
+from typing import Iterator
 
-from chats.ai_utils.client_utils import create_client
-from chats.ai_utils.io_utils import dump_response, read_config, read_prompt
-from chats.ai_utils.token_utils import count_tokens
-from chats.md_utils.markdown_utils import cleanup_markdown
-from chats.preprompt.spelling_utils import check_document
-from chats.workflow.name_this_cheap import create_name
+from chats.response_cache import response_cache
+from chats.telemetry import TELEMETRY
+from chats_v28.ai_utils.client_utils import create_client
+from chats_v28.ai_utils.io_utils import (
+    dump_response,
+    read_config,
+    read_prompt,
+    read_streamed_completion,
+    stream_response,
+)
+from chats_v28.ai_utils.token_utils import count_tokens
+from chats_v28.md_utils.markdown_utils import cleanup_markdown
+from chats_v28.preprompt.spelling_utils import check_document
+from chats_v28.workflow.name_this_cheap import create_name
 
 os.environ["OPENAI_API_BASE"] = "https://api.openai.com/v1/chat"
 
-import openai
-
-config = read_config()
-create_client()
 
 TOC_PROMPT = """Create a table of contents for a book named 'Powershell for Linux Users' The output should be in yaml"""
 
 
 def run() -> None:
     # get output folder from config file
-    output_folder = config["output"]["output_folder"]
+    output_folder = read_config()["output"]["output_folder"]
 
     prompt = read_prompt(output_folder)
 
@@ -61,14 +66,42 @@ def run() -> None:
                 args["model"] = "code-davinci-002"
                 args["max_tokens"] = 4000 - prompt_tokens
 
-            response = openai.Completion.create(**args)
-            if model_name == "gpt-3.5-turbo-0301":
-                choices = list(x["message"]["content"] for x in response["choices"])
+            cache = response_cache()
+            response = cache.get("completions", args)
+            if response is not None:
+                choices = list(choice_text(x) for x in response["choices"])
                 file_name = create_name(choices[0], model_name)
-            else:
-                choices = list(x["text"] for x in response["choices"])
-                file_name = create_name(response["choices"][0]["text"], model_name)
-            dump_response(prompt, choices, file_name, output_folder)
+                dump_response(prompt, choices, file_name, output_folder)
+                continue
+
+            # written to disk as it streams, named once the whole text is there
+            chunks = stream_completion(args, prompt_tokens)
+            path = stream_response(prompt, chunks, lambda head: create_name(head, model_name), output_folder)
+            # the text is only held in memory again for the cache, read back from the file
+            cache.put("completions", args, {"choices": [{"text": read_streamed_completion(path, prompt)}]})
+
+
+def choice_text(choice) -> str:
+    """Text of a chat message, a streamed delta or a plain completion"""
+    if "message" in choice:
+        return choice["message"]["content"]
+    if "delta" in choice:
+        return choice["delta"].get("content") or ""
+    return choice.get("text") or ""
+
+
+def stream_completion(args: dict, prompt_tokens: int) -> Iterator[str]:
+    import openai
+
+    create_client()
+    with TELEMETRY.track("completion", bot="create", model=args["model"]) as record:
+        # streamed completions don't report usage, count it as the chunks arrive
+        record.prompt_tokens = prompt_tokens
+        for chunk in openai.Completion.create(stream=True, **args):
+            text = choice_text(chunk["choices"][0])
+            if text:
+                record.completion_tokens += count_tokens(text)
+            yield text
 
 
 if __name__ == "__main__":
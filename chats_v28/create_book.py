@@ -1,16 +1,17 @@
 import time
 
 import marko
-import openai
 import yaml
 
-from chats.ai_utils.client_utils import create_client
-from chats.ai_utils.io_utils import read_config, read_prompt, dump_response, read_yaml_toc_prompt
-from chats.ai_utils.token_utils import count_tokens
-
-config = read_config()
-create_client()
+from chats.response_cache import response_cache
+from chats.telemetry import TELEMETRY
+from chats_v28.ai_utils.client_utils import create_client
+from chats_v28.ai_utils.io_utils import dump_response, read_config, read_prompt, read_yaml_toc_prompt
+from chats_v28.ai_utils.manifest import BookManifest, section_key
+from chats_v28.ai_utils.token_utils import count_tokens
+from chats_v28.workflow.book_pipeline import EXAMPLES, EXPOSITION, plan_jobs
 
+MODEL = "text-davinci-003"
 TITLE = "Powershell for Linux Users"
 TEMPLATE = f"""Create a table of contents for a book named '{TITLE}' The output must be in yaml. 
 e.g.
@@ -64,7 +65,7 @@ def fulfill_the_promise():
 
 def make_the_toc() -> None:
     # get output folder from config file
-    output_folder = config["output"]["output_folder"]
+    output_folder = read_config()["output"]["output_folder"]
 
     prompt = read_prompt(output_folder)
 
@@ -93,37 +94,31 @@ def run_the_toc():
         " You have a lot of ideas for how to run powershell on linux. You are writing a book. "
     )
     # get output folder from config file
-    output_folder = config["output"]["output_folder"]
+    output_folder = read_config()["output"]["output_folder"]
     toc = read_yaml_toc_prompt(output_folder)
-    section_count = 0
-
-    for inner in toc:
-        for section, chapters in inner.items():
-            section_count += 1
-            chapter_count = 0
-            for chapter in chapters:
-                chapter_count += 1
-
-                prompt = f"{who_are_you} Please write the exposition for '{section} : {chapter}'. Use markdown."
-                response = basic_request(max_tokens, prompt, temperature, sleep=5)
-                choices = list(x["text"] for x in response["choices"])
-                dump_response(f"{section} : {chapter}", choices, f"{section}_{chapter_count}", output_folder)
-
-                prompt = (
-                    f"{who_are_you} Please write code samples for '{section} : {chapter}'. "
-                    f"Use markdown and code blocks for code."
-                )
-                response = basic_request(max_tokens, prompt, temperature, sleep=5)
-                choices = list(x["text"] for x in response["choices"])
-                dump_response(f"{section} : {chapter}", choices, f"{section}_{chapter_count}", output_folder)
+    manifest = BookManifest.for_folder(output_folder)
+    prompts = {"exposition": f"{who_are_you} {EXPOSITION}", "examples": f"{who_are_you} {EXAMPLES}"}
+
+    for job in plan_jobs(toc, prompts):
+        # completions have no system prompt, who_are_you is part of the prompt
+        key = section_key("", job.prompt, MODEL, temperature)
+        if manifest.is_done(key):
+            print(f"Already written {job.file_name}")
+            continue
+        response = basic_request(max_tokens, job.prompt, temperature, sleep=5)
+        choices = list(x["text"] for x in response["choices"])
+        title = f"{job.section} : {job.chapter}"
+        path = dump_response(title, choices, job.file_name, output_folder, False)
+        manifest.record(key, path, title)
 
 
 def basic_request(max_tokens, prompt, temperature, sleep=0):
+    import openai
+
     prompt_tokens = count_tokens(prompt)
     print(prompt)
-    time.sleep(sleep)
     args = {
-        "model": "text-davinci-003",
+        "model": MODEL,
         "prompt": prompt,
         "temperature": temperature,
         "max_tokens": max_tokens - prompt_tokens,
@@ -131,7 +126,15 @@ def basic_request(max_tokens, prompt, temperature, sleep=0):
         "frequency_penalty": 0,
         "presence_penalty": 0,
     }
-    response = openai.Completion.create(**args)
+    cache = response_cache()
+    response = cache.get("completions", args)
+    if response is None:
+        time.sleep(sleep)
+        with TELEMETRY.track("completion", bot="create_book", model=args["model"]) as record:
+            create_client()
+            response = openai.Completion.create(**args)
+            record.add_usage(response)
+        cache.put("completions", args, response)
     return response
 
 
@@ -1,15 +1,17 @@
+import asyncio
 import time
 
 import marko
-import openai
 import yaml
 
-from chats.ai_utils.client_utils import create_client
-from chats.ai_utils.io_utils import dump_response, read_config, read_prompt, read_yaml_toc_prompt
-from chats.ai_utils.token_utils import count_tokens
-
-config = read_config()
-create_client()
+from chats.response_cache import response_cache
+from chats.telemetry import TELEMETRY
+from chats_v28.ai_utils.client_utils import create_client
+from chats_v28.ai_utils.io_utils import dump_response, read_config, read_prompt, read_yaml_toc_prompt
+from chats_v28.ai_utils.manifest import BookManifest
+from chats_v28.ai_utils.rate_limit import RateLimiter
+from chats_v28.ai_utils.token_utils import count_tokens
+from chats_v28.workflow.book_pipeline import EXPOSITION, BookPipeline, plan_jobs
 
 WHO_ARE_YOU = """
 You are the author of python scripting tutorial books.
@@ -79,7 +81,7 @@ def fulfill_the_promise():
 
 def make_the_toc() -> None:
     # get output folder from config file
-    output_folder = config["output"]["output_folder"]
+    output_folder = read_config()["output"]["output_folder"]
 
     prompt = read_prompt(output_folder)
 
@@ -98,40 +100,40 @@ def choices_from_response(response):
     return list(x["message"]["content"] for x in response["choices"])
 
 
-def run_the_toc():
-    temperature = 0.9
-    max_tokens = 4000
+EXAMPLES_PROMPT = (
+    "Please write code samples for '{section} : {chapter}'. "
+    "Use markdown and code blocks for code. All examples *must* use characters, scenes, quotes from the Doctor "
+    "Dolittle series by Hugh Lofting as example material. Be creative and playful."
+)
 
-    # get output folder from config file
-    output_folder = config["output"]["output_folder"]
-    toc = read_yaml_toc_prompt(output_folder)
-    section_count = 0
 
-    for inner in toc:
-        for section, chapters in inner.items():
-            section_count += 1
-            chapter_count = 0
-            for chapter in chapters:
-                chapter_count += 1
+def run_the_toc(concurrency: int = 4, requests_per_minute: int = 3500, tokens_per_minute: int = 90_000):
+    from openai import AsyncOpenAI
 
-                prompt = f"Please write the exposition for '{section} : {chapter}'. Use markdown."
-                response = basic_request(max_tokens, prompt, WHO_ARE_YOU, temperature, sleep=5)
-                choices = choices_from_response(response)
-                dump_response(f"{section} : {chapter}", choices, f"{section}_{chapter_count}", output_folder)
-
-                prompt = (
-                    f"Please write code samples for '{section} : {chapter}'. "
-                    f"Use markdown and code blocks for code. All examples *must* use characters, scenes, quotes from the Doctor Dolittle series by Hugh Lofting as example material. Be creative and playful."
-                )
-                response = basic_request(max_tokens, WHO_ARE_YOU, prompt, temperature, sleep=5)
-                choices = choices_from_response(response)
-                dump_response(f"{section} : {chapter}", choices, f"{section}_{chapter_count}_examples", output_folder)
+    # loads .env, the client below reads the key from the environment
+    create_client()
+    # get output folder from config file
+    output_folder = read_config()["output"]["output_folder"]
+    toc = read_yaml_toc_prompt(output_folder)
+    jobs = plan_jobs(toc, {"exposition": EXPOSITION, "examples": EXAMPLES_PROMPT})
+    pipeline = BookPipeline(
+        AsyncOpenAI(http_client=TELEMETRY.http_client()),
+        WHO_ARE_YOU,
+        output_folder,
+        temperature=0.9,
+        max_tokens=4000,
+        concurrency=concurrency,
+        limiter=RateLimiter(requests_per_minute, tokens_per_minute),
+        manifest=BookManifest.for_folder(output_folder),
+    )
+    asyncio.run(pipeline.run(jobs))
 
 
 def basic_request(max_tokens, prompt, who_are_you, temperature, sleep=0):
+    import openai
+
     prompt_tokens = count_tokens(prompt)
     print(prompt)
-    time.sleep(sleep)
     messages = [
         {"role": "system", "content": who_are_you},
         {"role": "user", "content": prompt},
@@ -148,7 +150,15 @@ def basic_request(max_tokens, prompt, who_are_you, temperature, sleep=0):
         "presence_penalty": 0,
     }
 
-    response = openai.ChatCompletion.create(**args)
+    cache = response_cache()
+    response = cache.get("chat.completions", args)
+    if response is None:
+        time.sleep(sleep)
+        with TELEMETRY.track("chat_completion", bot="create_book_chatgpt", model=args["model"]) as record:
+            create_client()
+            response = openai.ChatCompletion.create(**args)
+            record.add_usage(response)
+        cache.put("chat.completions", args, response)
     return response
 
 
@@ -1,7 +1,6 @@
-import mdformat
-
-
 def cleanup_markdown(text):
+    import mdformat
+
     return mdformat.text(md=text)
 
 
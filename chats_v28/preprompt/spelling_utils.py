@@ -1,51 +1,165 @@
+"""
+Spell check a prompt before it is sent.
+
+check_document tokenizes the document once, skips fenced and indented code blocks
+and inline code, and looks each distinct word up once. Lookups are remembered in a
+bounded LRU across calls, so a chapter that repeats "the" a thousand times costs
+one lookup, and checking the next draft mostly costs none. Very large documents
+spread their new words over a process pool.
+
+The dictionary is only loaded on the first check, from a prebuilt index in the
+user cache folder, see symspell_index.
+"""
+import bisect
+import functools
+import importlib.util
+import os
 import re
+from collections import OrderedDict
+from typing import Any, Optional
+
+AVAIL = importlib.util.find_spec("symspellpy") is not None
+
+WORD = re.compile(r"\S+")
+NOT_LETTERS = re.compile(r"[^a-zA-Z]+")
+INLINE_CODE = re.compile(r"(`+)[^`]+?\1")
+CODE_BLOCKS = {"fence", "code_block"}
+
+# unique new words before a lookup is spread over processes, below this starting them costs more
+PARALLEL_WORDS = 20_000
+
+
+class LRU:
+    """Bounded memo, least recently used goes first."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self.items: OrderedDict[str, Optional[tuple[str, ...]]] = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.items
+
+    def get(self, key: str) -> Optional[tuple[str, ...]]:
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key: str, value: Optional[tuple[str, ...]]) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+
+LOOKUPS = LRU()
+
+
+@functools.lru_cache(maxsize=None)
+def get_sym_spell() -> Any:
+    """The dictionary, loaded on first use."""
+    import importlib.resources
+
+    from chats_v28.preprompt.symspell_index import load_sym_spell
+
+    dictionary = importlib.resources.files("symspellpy") / "frequency_dictionary_en_82_765.txt"
+    return load_sym_spell(str(dictionary), max_edit_distance=2, prefix_length=7)
+
+
+def lookup(term: str) -> Optional[tuple[str, ...]]:
+    """None if the word is right, otherwise up to three suggestions (maybe none)."""
+    # lookup suggestions for single-word input strings
+    # max edit distance per lookup
+    # (max_edit_distance_lookup <= max_dictionary_edit_distance)
+    from symspellpy import Verbosity
+
+    suggestions = get_sym_spell().lookup(term, Verbosity.CLOSEST, max_edit_distance=2)
+    if len(suggestions) == 1:
+        return None
+    return tuple(suggestion.term for suggestion in suggestions[0:3])
+
+
+def lookup_many(terms: list[str]) -> list[Optional[tuple[str, ...]]]:
+    return [lookup(term) for term in terms]
+
+
+def normalize(word: str) -> str:
+    return NOT_LETTERS.sub("", word).lower()
+
 
-import pkg_resources
+def annotate(word: str, result: Optional[tuple[str, ...]]) -> str:
+    if result is None:
+        return word
+    if not result:
+        return f"{word} !!!(no suggestion)"
+    return f"{word} !!!({','.join(result)})"
 
-try:
-    from symspellpy import SymSpell, Verbosity
 
-    AVAIL = True
-except ModuleNotFoundError:
-    AVAIL = False
+def code_spans(document: str) -> list[tuple[int, int]]:
+    """Character ranges of code blocks and inline code, sorted."""
+    from markdown_it import MarkdownIt
 
-if AVAIL:
-    sym_spell = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
-    dictionary_path = pkg_resources.resource_filename("symspellpy", "frequency_dictionary_en_82_765.txt")
-    # term_index is the column of the term and count_index is the
-    # column of the term frequency
-    sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1)
+    line_starts = [0] + [match.end() for match in re.finditer("\n", document)]
+    line_starts.append(len(document))
+    spans = []
+    for token in MarkdownIt().parse(document):
+        if not token.map:
+            continue
+        start, end = line_starts[token.map[0]], line_starts[min(token.map[1], len(line_starts) - 1)]
+        if token.type in CODE_BLOCKS:
+            spans.append((start, end))
+        elif token.type == "inline" and any(child.type == "code_inline" for child in token.children or []):
+            spans.extend(match.span() for match in INLINE_CODE.finditer(document, start, end))
+    return sorted(spans)
+
+
+def in_spans(position: int, spans: list[tuple[int, int]], starts: list[int]) -> bool:
+    index = bisect.bisect_right(starts, position) - 1
+    return index >= 0 and position < spans[index][1]
+
+
+def check_words(terms: set[str], workers: Optional[int] = None) -> dict[str, Optional[tuple[str, ...]]]:
+    """Look up each term once, from the LRU where possible."""
+    results = {term: LOOKUPS.get(term) for term in terms if term in LOOKUPS}
+    new = sorted(terms - results.keys())
+    if len(new) >= PARALLEL_WORDS:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = workers or os.cpu_count() or 1
+        size = max(1, len(new) // (workers * 4))
+        batches = [new[start : start + size] for start in range(0, len(new), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            found = [result for batch in pool.map(lookup_many, batches) for result in batch]
+    else:
+        found = lookup_many(new)
+    for term, result in zip(new, found):
+        LOOKUPS.put(term, result)
+        results[term] = result
+    return results
 
 
 def check_document(document: str) -> tuple[bool, str]:
     if not AVAIL:
         return True, document
-    results = []
+    spans = code_spans(document)
+    starts = [start for start, _ in spans]
+    words = [
+        (match.group(), None if in_spans(match.start(), spans, starts) else normalize(match.group()))
+        for match in WORD.finditer(document)
+    ]
+    results = check_words({term for _, term in words if term is not None})
+    output = []
     all_right = True
-    for word in document.split():
-        suggestion = check_spelling(word)
+    for word, term in words:
+        # code keeps its words as they are
+        suggestion = word if term is None else annotate(word, results[term])
         if suggestion != word:
             all_right = False
-        results.append(suggestion)
-    return all_right, " ".join(results)
+        output.append(suggestion)
+    return all_right, " ".join(output)
 
 
 def check_spelling(input_term: str):
-    # lookup suggestions for single-word input strings
-    # max edit distance per lookup
-    # (max_edit_distance_lookup <= max_dictionary_edit_distance)
-    stripped_term = "".join(re.split("[^a-zA-Z]*", input_term)).lower()
-    suggestions = sym_spell.lookup(stripped_term, Verbosity.CLOSEST, max_edit_distance=2)
-    # display suggestion term, edit distance, and term frequency
-    if len(suggestions) == 1:
-        return input_term
-
-    results = []
-    for suggestion in suggestions[0:3]:
-        results.append(suggestion.term)
-    if len(suggestions) == 0:
-        return f"{input_term} !!!(no suggestion)"
-    return f"{input_term} !!!({','.join(results)})"
+    stripped_term = normalize(input_term)
+    return annotate(input_term, check_words({stripped_term})[stripped_term])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+"""
+SymSpell's dictionary, prebuilt once and memory mapped after that.
+
+Building the index from the frequency dictionary takes seconds: every word's
+deletes up to edit distance 2, about 680k keys. Unpickling it isn't much faster,
+it is millions of small objects. So the deletes go into a file laid out as a hash
+table, which is opened with mmap and read per lookup; only the word counts are
+unpickled. Opening it takes milliseconds and pages are only read as lookups touch them.
+
+The file lives in the user cache folder under a hash of the dictionary and the
+settings, a changed dictionary gets its own file.
+"""
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+from symspellpy import SymSpell
+
+from chats.utils import user_cache_dir
+
+MAGIC = b"SYMIDX01"
+# magic, slot count, keys, offset and length of the pickled words
+HEADER = struct.Struct("<8sIIQQ")
+# crc32 of the key, offset of the entry in the data section plus one, 0 is an empty slot
+SLOT = struct.Struct("<II")
+LENGTH = struct.Struct("<I")
+
+
+def index_path(dictionary_path: str, max_edit_distance: int, prefix_length: int) -> str:
+    digest = hashlib.sha256()
+    with open(dictionary_path, "rb") as file:
+        digest.update(file.read())
+    digest.update(f"{max_edit_distance}:{prefix_length}:{SymSpell.data_version}:{MAGIC!r}".encode())
+    return os.path.join(user_cache_dir(), f"symspell_{digest.hexdigest()[:16]}.idx")
+
+
+class MappedDeletes(Mapping):
+    """Read only stand-in for SymSpell's deletes dict, backed by the mapped file."""
+
+    def __init__(self, mapped: mmap.mmap, slots: int, count: int):
+        self.mapped = mapped
+        self.slots = slots
+        self.count = count
+        self.data_start = HEADER.size + slots * SLOT.size
+
+    def entry(self, offset: int) -> tuple[bytes, bytes]:
+        start = self.data_start + offset - 1
+        (length,) = LENGTH.unpack_from(self.mapped, start)
+        key, _, values = self.mapped[start + LENGTH.size : start + LENGTH.size + length].partition(b"\0")
+        return key, values
+
+    def find(self, key: str) -> Optional[list[str]]:
+        encoded = key.encode("utf-8")
+        hashed = zlib.crc32(encoded)
+        slot = hashed % self.slots
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self.mapped, HEADER.size + slot * SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == hashed:
+                found, values = self.entry(offset)
+                if found == encoded:
+                    return values.decode("utf-8").split("\0")
+            slot = (slot + 1) % self.slots
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.find(key) is not None
+
+    def __getitem__(self, key: str) -> list[str]:
+        values = self.find(key)
+        if values is None:
+            raise KeyError(key)
+        return values
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        for slot in range(self.slots):
+            _, offset = SLOT.unpack_from(self.mapped, HEADER.size + slot * SLOT.size)
+            if offset:
+                yield self.entry(offset)[0].decode("utf-8")
+
+
+def write_index(sym_spell: SymSpell, path: str) -> None:
+    """Lay out a loaded SymSpell's deletes as an open addressing hash table, half full."""
+    deletes = sym_spell._deletes
+    slots = len(deletes) * 2 + 1
+    table = bytearray(SLOT.size * slots)
+    data = bytearray()
+    for key, values in deletes.items():
+        encoded = key.encode("utf-8")
+        hashed = zlib.crc32(encoded)
+        slot = hashed % slots
+        while SLOT.unpack_from(table, slot * SLOT.size)[1]:
+            slot = (slot + 1) % slots
+        body = encoded + b"\0" + "\0".join(values).encode("utf-8")
+        SLOT.pack_into(table, slot * SLOT.size, hashed, len(data) + 1)
+        data += LENGTH.pack(len(body)) + body
+    words = pickle.dumps(
+        {
+            "words": sym_spell._words,
+            "max_length": sym_spell._max_length,
+            "below_threshold_words": sym_spell._below_threshold_words,
+            "bigrams": sym_spell._bigrams,
+        },
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+    words_offset = HEADER.size + len(table) + len(data)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, slots, len(deletes), words_offset, len(words)))
+        file.write(table)
+        file.write(data)
+        file.write(words)
+    os.replace(temp_path, path)
+
+
+def open_index(path: str, max_edit_distance: int, prefix_length: int) -> Optional[SymSpell]:
+    """A SymSpell reading from the mapped file, None if there is no usable file."""
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+        return None
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if HEADER.unpack_from(mapped, 0)[0] != MAGIC:
+        mapped.close()
+        return None
+    _, slots, count, words_offset, words_length = HEADER.unpack_from(mapped, 0)
+    if words_offset + words_length != len(mapped):
+        # cut short, build it again
+        mapped.close()
+        return None
+    saved = pickle.loads(mapped[words_offset : words_offset + words_length])
+    sym_spell = SymSpell(max_dictionary_edit_distance=max_edit_distance, prefix_length=prefix_length)
+    sym_spell._deletes = MappedDeletes(mapped, slots, count)
+    sym_spell._words = saved["words"]
+    sym_spell._max_length = saved["max_length"]
+    sym_spell._below_threshold_words = saved["below_threshold_words"]
+    sym_spell._bigrams = saved["bigrams"]
+    return sym_spell
+
+
+def load_sym_spell(
+    dictionary_path: str, max_edit_distance: int = 2, prefix_length: int = 7, cache_path: Optional[str] = None
+) -> SymSpell:
+    """Open the prebuilt index, building and saving it first if there isn't one for this dictionary."""
+    path = cache_path or index_path(dictionary_path, max_edit_distance, prefix_length)
+    sym_spell = open_index(path, max_edit_distance, prefix_length)
+    if sym_spell is not None:
+        return sym_spell
+    built = SymSpell(max_dictionary_edit_distance=max_edit_distance, prefix_length=prefix_length)
+    # term_index is the column of the term and count_index is the
+    # column of the term frequency
+    built.load_dictionary(dictionary_path, term_index=0, count_index=1)
+    write_index(built, path)
+    return open_index(path, max_edit_distance, prefix_length) or built
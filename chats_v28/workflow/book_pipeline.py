@@ -0,0 +1,152 @@
+"""
+Write every section of a book table of contents in parallel.
+
+Each TOC entry becomes two jobs, the exposition and the code samples. Jobs run on
+a bounded number of workers under a requests/tokens per minute limit. Files are
+named by the job's position in the book, not by when it finished, so the output
+is the same no matter the concurrency.
+
+With a BookManifest, sections finished by an earlier run with the same prompts
+are skipped, so a crashed run picks up where it stopped.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from chats.telemetry import TELEMETRY
+from chats_v28.ai_utils.client_utils import create_client
+from chats_v28.ai_utils.io_utils import dump_response
+from chats_v28.ai_utils.manifest import BookManifest, section_key
+from chats_v28.ai_utils.rate_limit import RateLimiter
+from chats_v28.ai_utils.token_utils import count_tokens
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+EXPOSITION = "Please write the exposition for '{section} : {chapter}'. Use markdown."
+EXAMPLES = "Please write code samples for '{section} : {chapter}'. Use markdown and code blocks for code."
+
+
+@dataclass(frozen=True)
+class SectionJob:
+    number: int
+    section: str
+    chapter: str
+    chapter_count: int
+    kind: str
+    prompt: str
+
+    @property
+    def file_name(self) -> str:
+        suffix = "_examples" if self.kind == "examples" else ""
+        return f"{str(self.number).zfill(3)}_{self.section}_{self.chapter_count}{suffix}"
+
+
+def plan_jobs(toc: list[dict[str, list[str]]], prompts: Optional[dict[str, str]] = None) -> list[SectionJob]:
+    """Jobs in book order, from a toc like [{"Chapter": ["Section", "Another Section"]}]"""
+    prompts = prompts or {"exposition": EXPOSITION, "examples": EXAMPLES}
+    jobs = []
+    for inner in toc:
+        for section, chapters in inner.items():
+            for chapter_count, chapter in enumerate(chapters, start=1):
+                for kind, template in prompts.items():
+                    prompt = template.format(section=section, chapter=chapter)
+                    jobs.append(SectionJob(len(jobs) + 1, section, chapter, chapter_count, kind, prompt))
+    return jobs
+
+
+class BookPipeline:
+    def __init__(
+        self,
+        client: "AsyncOpenAI",
+        who_are_you: str,
+        output_folder: str,
+        model: str = "gpt-3.5-turbo",
+        temperature: float = 0.9,
+        max_tokens: int = 4000,
+        concurrency: int = 4,
+        limiter: Optional[RateLimiter] = None,
+        token_counter: Callable[[str], int] = count_tokens,
+        manifest: Optional[BookManifest] = None,
+    ):
+        self.client = client
+        self.who_are_you = who_are_you
+        self.output_folder = output_folder
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency
+        self.limiter = limiter or RateLimiter()
+        self.token_counter = token_counter
+        self.manifest = manifest
+
+    async def complete(self, job: SectionJob) -> list[str]:
+        prompt_tokens = self.token_counter(job.prompt) + self.token_counter(self.who_are_you)
+        completion_tokens = max(1, self.max_tokens - prompt_tokens)
+        # the limit counts max_tokens up front, hand back what wasn't used afterwards
+        await self.limiter.acquire(prompt_tokens + completion_tokens)
+        with TELEMETRY.track("chat_completion", bot="book_pipeline", model=self.model) as record:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.who_are_you},
+                    {"role": "user", "content": job.prompt},
+                ],
+                temperature=self.temperature,
+                max_tokens=completion_tokens,
+                top_p=1,
+                frequency_penalty=0,
+                presence_penalty=0,
+            )
+            record.add_usage(response)
+        if response.usage:
+            self.limiter.settle(prompt_tokens + completion_tokens, response.usage.total_tokens)
+        return [choice.message.content or "" for choice in response.choices]
+
+    def key(self, job: SectionJob) -> str:
+        return section_key(self.who_are_you, job.prompt, self.model, self.temperature)
+
+    async def write(self, job: SectionJob) -> str:
+        key = self.key(job)
+        if self.manifest and self.manifest.is_done(key):
+            print(f"Already written {job.file_name}")
+            self.manifest.skipped += 1
+            return job.file_name
+        print(f"Writing {job.file_name}")
+        choices = await self.complete(job)
+        title = f"{job.section} : {job.chapter}"
+        path = dump_response(title, choices, job.file_name, self.output_folder, False)
+        if self.manifest:
+            self.manifest.record(key, path, title)
+        return job.file_name
+
+    async def run(self, jobs: list[SectionJob]) -> list[str]:
+        """Run all jobs, at most `concurrency` at a time. File names come back in book order."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        results: dict[int, str] = {}
+
+        async def worker() -> None:
+            while not queue.empty():
+                job = queue.get_nowait()
+                results[job.number] = await self.write(job)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(jobs)))]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return [results[job.number] for job in jobs]
+
+
+async def write_book(toc: Any, who_are_you: str, output_folder: str, **options: Any) -> list[str]:
+    from openai import AsyncOpenAI
+
+    # loads .env, the client below reads the key from the environment
+    create_client()
+    options.setdefault("manifest", BookManifest.for_folder(output_folder))
+    pipeline = BookPipeline(AsyncOpenAI(http_client=TELEMETRY.http_client()), who_are_you, output_folder, **options)
+    return await pipeline.run(plan_jobs(toc))
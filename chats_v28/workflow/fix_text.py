@@ -1,17 +1,13 @@
-import openai
-
-from chats.client_utils import create_client
-
-create_client()
+from chats.response_cache import response_cache
+from chats_v28.ai_utils.client_utils import create_client
 
 
 def fix(
     prompt: str,
     instruction: str = "Please clean up the text, fix spelling, make it sound educated.",
 ):
-    response = openai.Edit.create(
-        model="text-davinci-edit-001",
-        input=prompt,
-        instruction=instruction,
-    )
-    return response
+    import openai
+
+    create_client()
+    args = {"model": "text-davinci-edit-001", "input": prompt, "instruction": instruction}
+    return response_cache().cached("edits", args, lambda: openai.Edit.create(**args))
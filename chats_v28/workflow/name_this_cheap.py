@@ -1,13 +1,12 @@
 import re
 
-import openai
-
-from chats.client_utils import create_client
-
-create_client()
+from chats.response_cache import response_cache
+from chats_v28.ai_utils.client_utils import create_client
 
 
 def create_name(full_text: str, model_name: str):
+    import openai
+
     prompt = f"""Please give a short title to this document 
     ```
     {full_text}
@@ -28,7 +27,9 @@ def create_name(full_text: str, model_name: str):
         args["messages"] = [{"role": "user", "content": prompt}]
     else:
         args["prompt"] = prompt
-    response = openai.Completion.create(**args)
+
+    create_client()
+    response = response_cache().cached("completions", args, lambda: openai.Completion.create(**args))
 
     print(response)
     if model_name == "gpt-3.5-turbo-0301":
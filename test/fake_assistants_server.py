@@ -0,0 +1,61 @@
+"""
+Local stand-in for the Assistants runs endpoints, for latency tests.
+
+Runs finish `run_seconds` after they are created. Every retrieve is counted, and
+the moment a run is first reported completed is recorded.
+"""
+import re
+import time
+from typing import Any
+
+from test.fake_server import NOT_FOUND, FakeServer, Request, Route
+
+RUNS = re.compile(r"^/v1/threads/(?P<thread_id>[^/]+)/runs$")
+RUN = re.compile(r"^/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)$")
+
+
+class FakeAssistantsServer(FakeServer):
+    def __init__(self, run_seconds: float = 0.5):
+        self.run_seconds = run_seconds
+        self.runs: dict[str, dict[str, Any]] = {}
+        self.retrieve_calls: dict[str, int] = {}
+        self.started: dict[str, float] = {}
+        self.finished: dict[str, float] = {}
+        super().__init__()
+
+    def routes(self) -> list[Route]:
+        return [("POST", RUNS, self.create_run), ("GET", RUN, self.retrieve_run)]
+
+    def run_json(self, run_id: str) -> dict[str, Any]:
+        run = dict(self.runs[run_id])
+        done = time.monotonic() - run.pop("_started") >= self.run_seconds
+        run["status"] = "completed" if done else "in_progress"
+        return run
+
+    def create_run(self, request: Request) -> tuple:
+        with self.lock:
+            run_id = f"run_{len(self.runs) + 1}"
+            self.runs[run_id] = {
+                "id": run_id,
+                "object": "thread.run",
+                "thread_id": request.match["thread_id"],
+                "assistant_id": request.json().get("assistant_id"),
+                "created_at": int(time.time()),
+                "_started": time.monotonic(),
+            }
+            self.retrieve_calls[run_id] = 0
+            self.started[run_id] = time.monotonic()
+            run = self.run_json(run_id)
+        run["status"] = "queued"
+        return 200, run
+
+    def retrieve_run(self, request: Request) -> tuple:
+        run_id = request.match["run_id"]
+        with self.lock:
+            if run_id not in self.runs:
+                return NOT_FOUND
+            self.retrieve_calls[run_id] += 1
+            run = self.run_json(run_id)
+            if run["status"] == "completed":
+                self.finished.setdefault(run_id, time.monotonic())
+        return 200, run
@@ -0,0 +1,48 @@
+"""
+Local stand-in for the chat completions endpoint, for concurrency tests.
+
+Every completion takes `latency` seconds and echoes the prompt. The highest number
+of requests in flight at once is recorded.
+"""
+import re
+import time
+from typing import Any
+
+from test.fake_server import FakeServer, Request, Route
+
+COMPLETIONS = re.compile(r"^/v1/chat/completions$")
+
+
+class FakeCompletionServer(FakeServer):
+    def __init__(self, latency: float = 0.1):
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        super().__init__()
+
+    def routes(self) -> list[Route]:
+        return [("POST", COMPLETIONS, self.create_completion)]
+
+    def completion(self, request: dict[str, Any]) -> dict[str, Any]:
+        prompt = request["messages"][-1]["content"]
+        return {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": f"# {prompt}"}}
+            ],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+        }
+
+    def create_completion(self, request: Request) -> tuple:
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+            return 200, self.completion(request.json())
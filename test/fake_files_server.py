@@ -0,0 +1,88 @@
+"""
+Local stand-in for the files endpoints, for sync tests.
+
+Uploads are kept in memory. Listing is paged `page_size` at a time with an
+`after` cursor and `has_more`. Requests are counted by method, along with the
+bytes uploaded and the most uploads in flight at once.
+"""
+import email.parser
+import email.policy
+import re
+import time
+from typing import Any
+
+from test.fake_server import NOT_FOUND, FakeServer, Request, Route
+
+FILES = re.compile(r"^/v1/files$")
+FILE = re.compile(r"^/v1/files/(?P<file_id>[^/]+)$")
+
+
+class FakeFilesServer(FakeServer):
+    def __init__(self, page_size: int = 3, latency: float = 0.0):
+        self.page_size = page_size
+        self.latency = latency
+        self.files: dict[str, dict[str, Any]] = {}
+        self.contents: dict[str, bytes] = {}
+        self.calls = {"GET": 0, "POST": 0, "DELETE": 0}
+        self.bytes_received = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.next_id = 1
+        super().__init__()
+
+    def routes(self) -> list[Route]:
+        return [("GET", FILES, self.list_files), ("POST", FILES, self.upload), ("DELETE", FILE, self.delete_file)]
+
+    def add(self, filename: str, data: bytes, purpose: str = "assistants") -> dict[str, Any]:
+        with self.lock:
+            file_id = f"file-{self.next_id:04}"
+            self.next_id += 1
+            self.files[file_id] = {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(data),
+                "created_at": int(time.time()),
+                "filename": filename,
+                "purpose": purpose,
+                "status": "processed",
+            }
+            self.contents[file_id] = data
+            return self.files[file_id]
+
+    def list_files(self, request: Request) -> tuple:
+        query = request.query
+        with self.lock:
+            self.calls["GET"] += 1
+            files = sorted(self.files.values(), key=lambda file: file["id"])
+        if "purpose" in query:
+            files = [file for file in files if file["purpose"] == query["purpose"][0]]
+        if "after" in query:
+            files = [file for file in files if file["id"] > query["after"][0]]
+        limit = min(int(query.get("limit", ["10000"])[0]), self.page_size)
+        return 200, {"object": "list", "data": files[:limit], "has_more": len(files) > limit}
+
+    def upload(self, request: Request) -> tuple:
+        with self.lock:
+            self.calls["POST"] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        header = f"Content-Type: {request.headers['Content-Type']}\r\n\r\n".encode()
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + request.body)
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        data = fields["file"].get_payload(decode=True)
+        purpose = fields["purpose"].get_content().strip()
+        file = self.add(fields["file"].get_filename(), data, purpose)
+        with self.lock:
+            self.bytes_received += len(data)
+            self.in_flight -= 1
+        return 200, file
+
+    def delete_file(self, request: Request) -> tuple:
+        file_id = request.match["file_id"]
+        with self.lock:
+            self.calls["DELETE"] += 1
+            if self.files.pop(file_id, None) is None:
+                return NOT_FOUND
+            self.contents.pop(file_id, None)
+        return 200, {"id": file_id, "object": "file", "deleted": True}
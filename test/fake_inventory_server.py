@@ -0,0 +1,88 @@
+"""
+Local stand-in for listing and deleting assistants, and deleting threads, for cleanup tests.
+
+Assistants are listed `page_size` at a time with an `after` cursor. Each delete
+takes `latency` seconds, the first delete of every `rate_limit_every`-th id is
+answered with a 429. Deletes in flight and 429s sent are counted.
+"""
+import re
+import time
+from typing import Any, Optional
+
+from test.fake_server import NOT_FOUND, FakeServer, Request, Route
+
+ASSISTANTS = re.compile(r"^/v1/assistants$")
+ITEM = re.compile(r"^/v1/(?P<kind>assistants|threads)/(?P<item_id>[^/]+)$")
+
+
+class FakeInventoryServer(FakeServer):
+    def __init__(self, page_size: int = 20, latency: float = 0.0, rate_limit_every: Optional[int] = None):
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.assistants: dict[str, dict[str, Any]] = {}
+        self.threads: set[str] = set()
+        self.list_calls = 0
+        self.rate_limited = 0
+        self.refused: set[str] = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        super().__init__()
+
+    def routes(self) -> list[Route]:
+        return [("GET", ASSISTANTS, self.list_assistants), ("DELETE", ITEM, self.delete_item)]
+
+    def add_assistant(self, name: str, created_at: Optional[int] = None) -> dict[str, Any]:
+        assistant_id = f"asst_{len(self.assistants) + 1:05}"
+        self.assistants[assistant_id] = {
+            "id": assistant_id,
+            "object": "assistant",
+            "created_at": created_at or int(time.time()),
+            "name": name,
+            "description": None,
+            "model": "gpt-3.5-turbo",
+            "instructions": "",
+            "tools": [],
+            "file_ids": [],
+            "metadata": {},
+        }
+        return self.assistants[assistant_id]
+
+    def list_assistants(self, request: Request) -> tuple:
+        with self.lock:
+            self.list_calls += 1
+            assistants = sorted(self.assistants.values(), key=lambda assistant: assistant["id"])
+        if "after" in request.query:
+            assistants = [assistant for assistant in assistants if assistant["id"] > request.query["after"][0]]
+        limit = min(int(request.query.get("limit", ["20"])[0]), self.page_size)
+        page = assistants[:limit]
+        return 200, {
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(assistants) > limit,
+        }
+
+    def delete_item(self, request: Request) -> tuple:
+        kind, item_id = request.match["kind"], request.match["item_id"]
+        with self.lock:
+            number = int(re.sub(r"\D", "", item_id) or 0)
+            limited = self.rate_limit_every and number % self.rate_limit_every == 0
+            if limited and item_id not in self.refused:
+                self.refused.add(item_id)
+                self.rate_limited += 1
+                return 429, {"error": {"message": "Rate limit reached", "type": "requests"}}
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+            if kind == "assistants":
+                found = self.assistants.pop(item_id, None) is not None
+            else:
+                found = item_id in self.threads
+                self.threads.discard(item_id)
+        if not found:
+            return NOT_FOUND
+        return 200, {"id": item_id, "object": f"{kind[:-1]}.deleted", "deleted": True}
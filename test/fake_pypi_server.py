@@ -0,0 +1,69 @@
+"""
+Local stand-in for the PyPI JSON API, for benchmarks.
+
+Counts connections and requests so tests can see how much pooling saves. Set
+`failing` to a status code to answer every request with that error.
+"""
+import re
+import time
+from http.server import ThreadingHTTPServer
+from typing import Iterable, Optional
+
+from test.fake_server import FakeServer, Request, Route
+
+PROJECT = re.compile(r"^/pypi/(?P<name>[^/]+)/json$")
+
+
+class BusyHTTPServer(ThreadingHTTPServer):
+    # unpooled clients open hundreds of connections at once
+    request_queue_size = 1024
+
+
+class FakePyPIServer(FakeServer):
+    prefix = "/pypi"
+    server_class = BusyHTTPServer
+    keep_alive = True
+
+    def __init__(self, existing: Iterable[str] = (), latency: float = 0.005):
+        self.existing = {name.lower() for name in existing}
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.failing: Optional[int] = None
+        super().__init__()
+
+    def routes(self) -> list[Route]:
+        return [("GET", PROJECT, self.get_project)]
+
+    def connected(self) -> None:
+        with self.lock:
+            self.connections += 1
+
+    def project_json(self, name: str) -> Optional[dict]:
+        if name.lower() not in self.existing:
+            return None
+        return {
+            "info": {
+                "name": name,
+                "summary": f"The {name} package",
+                "description": f"# {name}\n\nDoes *{name}* things.",
+                "keywords": name,
+                "requires_python": ">=3.8",
+            },
+            "releases": {},
+        }
+
+    def get_project(self, request: Request) -> tuple:
+        with self.lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        if self.failing:
+            return self.failing, {"message": "Service Unavailable"}
+        name = request.match["name"]
+        body = self.project_json(name)
+        if body is None:
+            return 404, {"message": "Not Found"}
+        etag = f'"{name.lower()}-1"'
+        if request.headers.get("If-None-Match") == etag:
+            return 304, None, {"ETag": etag}
+        return 200, body, {"ETag": etag}
@@ -0,0 +1,101 @@
+"""
+Scaffolding shared by the local API stand-ins.
+
+A fake lists its routes as (method, path regex, handler) and each handler turns a
+`Request` into `(status, body)` or `(status, body, headers)`. Bodies go out as JSON,
+anything without a route is answered with a 404.
+"""
+import json
+import re
+import threading
+from dataclasses import dataclass
+from email.message import Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class Request:
+    match: re.Match
+    query: dict[str, list[str]]
+    headers: Message
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body or b"{}")
+
+
+Route = tuple[str, re.Pattern, Callable[[Request], tuple]]
+
+NOT_FOUND = (404, {"error": {"message": "not found"}})
+
+
+class FakeServer:
+    prefix = "/v1"
+    server_class = ThreadingHTTPServer
+    keep_alive = False
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.httpd = self.server_class(("127.0.0.1", 0), self.handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{self.prefix}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def routes(self) -> list[Route]:
+        return []
+
+    def connected(self) -> None:
+        pass
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" if server.keep_alive else "HTTP/1.0"
+            # headers and body go out in separate writes, don't wait on delayed ACKs
+            disable_nagle_algorithm = server.keep_alive
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                server.connected()
+
+            def reply(self, status: int, body: Optional[Any], headers: Optional[dict[str, str]] = None) -> None:
+                data = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def dispatch(self) -> None:
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                for method, pattern, route in server.routes():
+                    match = pattern.match(url.path)
+                    if method == self.command and match:
+                        self.reply(*route(Request(match, parse_qs(url.query), self.headers, body)))
+                        return
+                self.reply(*NOT_FOUND)
+
+            do_GET = do_POST = do_DELETE = dispatch
+
+        return Handler
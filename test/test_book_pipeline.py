@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+
+import pytest
+from openai import AsyncOpenAI
+
+from chats.telemetry import TELEMETRY
+from chats_v28.ai_utils.manifest import BookManifest, section_key
+from chats_v28.ai_utils.rate_limit import RateLimiter
+from chats_v28.workflow.book_pipeline import EXAMPLES, EXPOSITION, BookPipeline, plan_jobs
+from test.fake_completion_server import FakeCompletionServer
+
+TOC = [
+    {"Reading from the file system": ["What is a file system", "Relevant APIs", "Common tasks"]},
+    {"Writing to the file system": ["Relevant APIs", "Common tasks", "Permissions"]},
+]
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+
+
+def write_book(server: FakeCompletionServer, folder: str, concurrency: int, manifest=None, prompts=None) -> list[str]:
+    pipeline = BookPipeline(
+        AsyncOpenAI(base_url=server.base_url, max_retries=0),
+        "You are an author.",
+        folder,
+        concurrency=concurrency,
+        token_counter=lambda text: len(text) // 4,
+        manifest=manifest,
+    )
+    return asyncio.run(pipeline.run(plan_jobs(TOC, prompts)))
+
+
+def test_plan_is_in_book_order():
+    jobs = plan_jobs(TOC)
+    assert len(jobs) == 12
+    assert [job.number for job in jobs] == list(range(1, 13))
+    assert jobs[0].file_name == "001_Reading from the file system_1"
+    assert jobs[1].file_name == "002_Reading from the file system_1_examples"
+    assert jobs[-1].chapter == "Permissions"
+
+
+def test_concurrency_overlaps_requests_and_keeps_file_names(tmp_path):
+    with FakeCompletionServer(latency=0.1) as server:
+        serial_names = write_book(server, str(tmp_path / "serial"), concurrency=1)
+        assert server.max_in_flight == 1
+        parallel_names = write_book(server, str(tmp_path / "parallel"), concurrency=4)
+        assert server.max_in_flight == 4
+
+    assert serial_names == parallel_names
+    assert sorted(os.listdir(tmp_path / "serial" / "output")) == sorted(os.listdir(tmp_path / "parallel" / "output"))
+    with open(tmp_path / "parallel" / "output" / "001_Reading_from_the_file_system_1.md", encoding="utf-8") as f:
+        assert "exposition for 'Reading from the file system : What is a file system'" in f.read()
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_concurrency_cuts_wall_time(tmp_path):
+    with FakeCompletionServer(latency=0.1) as server:
+        start = time.perf_counter()
+        write_book(server, str(tmp_path / "serial"), concurrency=1)
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        write_book(server, str(tmp_path / "parallel"), concurrency=4)
+        parallel = time.perf_counter() - start
+
+    print(f"\n12 sections, 0.1s each: 1 worker {serial:.2f}s, 4 workers {parallel:.2f}s")
+    assert parallel < serial / 2
+
+
+def test_rate_limiter_waits_for_tokens():
+    now = [0.0]
+    slept = []
+
+    async def fake_sleep(seconds: float) -> None:
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=lambda: now[0], sleep=fake_sleep)
+
+    async def main():
+        await limiter.acquire(500)
+        await limiter.acquire(500)
+
+    asyncio.run(main())
+    # 100 left, 400 more at 10 tokens a second
+    assert slept == [pytest.approx(40.0)]
+
+
+def test_rate_limiter_settle_returns_unused_tokens():
+    now = [0.0]
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=lambda: now[0])
+
+    async def main():
+        await limiter.acquire(500)
+        limiter.settle(reserved=500, used=50)
+        await limiter.acquire(500)
+
+    asyncio.run(main())
+    assert limiter.waited == 0.0
+
+
+def test_rerun_only_writes_unfinished_or_changed_sections(tmp_path):
+    folder = str(tmp_path)
+    with FakeCompletionServer(latency=0.0) as server:
+        write_book(server, folder, concurrency=4, manifest=BookManifest.for_folder(folder))
+        assert server.requests == 12
+
+        # a crash lost one file, the rest is skipped
+        os.remove(tmp_path / "output" / "003_Reading_from_the_file_system_2.md")
+        manifest = BookManifest.for_folder(folder)
+        write_book(server, folder, concurrency=4, manifest=manifest)
+        assert server.requests == 13
+        assert manifest.skipped == 11
+
+        # a new examples prompt only redoes the examples
+        prompts = {"exposition": EXPOSITION, "examples": EXAMPLES + " Keep it short."}
+        manifest = BookManifest.for_folder(folder)
+        write_book(server, folder, concurrency=4, manifest=manifest, prompts=prompts)
+        assert server.requests == 19
+        assert len(manifest.entries) == 12
+    assert len(os.listdir(tmp_path / "output")) == 12
+
+
+def test_section_key_changes_with_any_input():
+    base = section_key("system", "prompt", "gpt-3.5-turbo", 0.9)
+    assert base == section_key("system", "prompt", "gpt-3.5-turbo", 0.9)
+    assert base != section_key("system!", "prompt", "gpt-3.5-turbo", 0.9)
+    assert base != section_key("system", "prompt!", "gpt-3.5-turbo", 0.9)
+    assert base != section_key("system", "prompt", "gpt-4", 0.9)
+    assert base != section_key("system", "prompt", "gpt-3.5-turbo", 0.5)
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import random
+import time
+
+import pytest
+
+from chats.tool_code.code_index import CodeIndex, chunk_python, terms
+from chats.tool_code.tools import TOOLS
+
+SOURCE = '''"""Config helpers"""
+import os
+
+DEFAULT = "config.toml"
+
+
+def read_config(path=DEFAULT):
+    with open(path) as file:
+        return file.read()
+
+
+class ConfigWriter:
+    """Writes config files"""
+
+    mode = "w"
+
+    @staticmethod
+    def write_config(path, text):
+        with open(path, "w") as file:
+            file.write(text)
+
+    async def flushAll(self):
+        pass
+
+    # kept in sync with the reader
+    ENCODING = "utf-8"
+
+    class Backup:
+        suffix = ".bak"
+'''
+
+
+def write(folder, relative: str, text: str) -> str:
+    path = os.path.join(folder, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+    return path
+
+
+def test_chunks_follow_the_ast():
+    chunks = {chunk.name: chunk for chunk in chunk_python(SOURCE, "config.py")}
+    expected = {"read_config", "ConfigWriter", "ConfigWriter.write_config", "ConfigWriter.flushAll", "<module>"}
+    assert set(chunks) == expected
+    assert chunks["read_config"].text.startswith("def read_config")
+    assert chunks["ConfigWriter.write_config"].text.lstrip().startswith("@staticmethod")
+    assert "mode" in chunks["ConfigWriter"].text
+    assert "def " not in chunks["ConfigWriter"].text
+    # what comes after the methods is searchable too
+    assert 'ENCODING = "utf-8"' in chunks["ConfigWriter"].text
+    assert "# kept in sync with the reader" in chunks["ConfigWriter"].text
+    assert 'suffix = ".bak"' in chunks["ConfigWriter"].text
+    assert 'DEFAULT = "config.toml"' in chunks["<module>"].text
+
+
+def test_unparsable_file_is_cut_in_line_blocks():
+    chunks = chunk_python("def broken(:\n" * 130, "broken.py")
+    assert [chunk.kind for chunk in chunks] == ["lines"] * 3
+
+
+def test_identifiers_are_split():
+    assert terms("read_config flushAll") == ["read_config", "read", "config", "flushall", "flush", "all"]
+
+
+def test_search_finds_the_relevant_chunk(tmp_path):
+    write(tmp_path, "pkg/config.py", SOURCE)
+    write(tmp_path, "pkg/other.py", "def unrelated():\n    return 42\n")
+    index = CodeIndex(str(tmp_path))
+    index.update()
+    hits = index.search("write config", max_results=2)
+    assert hits[0].name == "ConfigWriter.write_config"
+    assert hits[0].path == "pkg/config.py"
+
+
+def test_update_is_incremental(tmp_path):
+    config = write(tmp_path, "config.py", SOURCE)
+    other = write(tmp_path, "other.py", "def unrelated():\n    return 42\n")
+    index = CodeIndex(str(tmp_path))
+    assert index.update()["indexed"] == 2
+    assert index.update() == {"unchanged": 2, "touched": 0, "indexed": 0, "removed": 0}
+
+    os.utime(config, (time.time() + 10, time.time() + 10))
+    assert index.update()["touched"] == 1
+
+    write(tmp_path, "other.py", "def renamed_function():\n    return 43\n")
+    os.utime(other, (time.time() + 20, time.time() + 20))
+    assert index.update()["indexed"] == 1
+    assert not index.search("unrelated")
+    assert index.search("renamed")[0].name == "renamed_function"
+
+    os.remove(config)
+    assert index.update()["removed"] == 1
+    assert "read_config" not in index.postings
+
+    path = str(tmp_path / "index.pickle")
+    index.save(path)
+    loaded = CodeIndex.load(str(tmp_path), path)
+    assert loaded.update()["unchanged"] == 1
+    assert loaded.search("renamed")[0].name == "renamed_function"
+
+
+def test_search_code_tool(tmp_path):
+    write(tmp_path, "config.py", SOURCE)
+    index = CodeIndex(str(tmp_path))
+    index.update()
+    result = asyncio.run(TOOLS.call("search_code", {"query": "read config", "max_results": 1}, code_index=index))
+    assert result[0]["name"] == "read_config"
+    assert result[0]["lines"] == "7-9"
+    assert "search_code" in [tool.function.name for tool in TOOLS.assistant_tools("search_code")]
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="writes 10k files, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_query_latency_on_10k_files(tmp_path):
+    rng = random.Random(3)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 8))) for _ in range(5000)]
+    for number in range(10_000):
+        functions = []
+        for _ in range(5):
+            name = "_".join(rng.sample(words, 3))
+            body = " + ".join(rng.sample(words, 6))
+            functions.append(f"def {name}(self, value):\n    {rng.choice(words)} = {body}\n    return value\n")
+        write(tmp_path, f"package_{number // 100}/module_{number}.py", "import os\n\n\n" + "\n\n".join(functions))
+
+    index = CodeIndex(str(tmp_path))
+    start = time.perf_counter()
+    index.update()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    assert index.update()["unchanged"] == 10_000
+    rescan = time.perf_counter() - start
+
+    queries = [" ".join(rng.sample(words, 3)) for _ in range(100)]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    per_query = (time.perf_counter() - start) / len(queries)
+    print(
+        f"\n10k files, {len(index.chunks)} chunks: indexed in {build:.1f}s, "
+        f"rescan with nothing changed {rescan:.2f}s, {per_query * 1000:.1f} ms per query"
+    )
+    assert per_query < 0.1
@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+from openai import AsyncOpenAI
+
+from chats.ai_filesystem import AIFileSystem
+from chats.code_review_bot import get_python_files
+from chats.file_sync import FileSync, SyncManifest
+from test.fake_files_server import FakeFilesServer
+
+
+def make_folder(folder, count: int) -> None:
+    for number in range(count):
+        with open(os.path.join(folder, f"module_{number}.py"), "w", encoding="utf-8") as file:
+            file.write(f"def function_{number}():\n    return {number}\n" * 20)
+
+
+def sync(server: FakeFilesServer, folder, manifest_path: str, concurrency: int = 4):
+    file_system = AIFileSystem(client=AsyncOpenAI(api_key="test", base_url=server.base_url))
+    file_sync = FileSync(file_system, SyncManifest(manifest_path), concurrency=concurrency)
+    return asyncio.run(file_sync.sync(get_python_files(str(folder))))
+
+
+def test_list_all_follows_pages(tmp_path):
+    with FakeFilesServer(page_size=3) as server:
+        for number in range(8):
+            server.add(f"file_{number}.py", b"x")
+        file_system = AIFileSystem(client=AsyncOpenAI(api_key="test", base_url=server.base_url))
+
+        async def names():
+            return [file.filename async for file in file_system.list_all()]
+
+        assert asyncio.run(names()) == [f"file_{number}.py" for number in range(8)]
+        assert server.calls["GET"] == 3
+
+
+def test_second_sync_uploads_nothing(tmp_path):
+    folder = tmp_path / "code"
+    folder.mkdir()
+    make_folder(folder, 10)
+    with open(folder / "__init__.py", "w", encoding="utf-8"):
+        pass
+    manifest_path = str(tmp_path / "manifest.json")
+    with FakeFilesServer(page_size=4, latency=0.05) as server:
+        server.add("notes.txt", b"not ours")
+        first = sync(server, folder, manifest_path)
+        assert len(first.uploaded) == 10
+        assert 1 < server.max_in_flight <= 4
+        uploaded = server.bytes_received
+
+        second = sync(server, folder, manifest_path)
+        assert second.uploaded == [] and second.deleted == []
+        assert second.bytes_saved == uploaded
+        assert second.requests_saved == 10
+        # only the listing, three pages of four
+        assert second.requests == 3
+        assert server.bytes_received == uploaded
+        assert "notes.txt" in [file["filename"] for file in server.files.values()]
+
+
+def test_changed_and_deleted_files(tmp_path):
+    folder = tmp_path / "code"
+    folder.mkdir()
+    make_folder(folder, 5)
+    manifest_path = str(tmp_path / "manifest.json")
+    with FakeFilesServer() as server:
+        # another folder's upload, the same short name isn't enough to delete it
+        other_project = server.add("module_0.py", b"from another project")
+        sync(server, folder, manifest_path)
+        assert other_project["id"] in server.files
+
+        with open(folder / "module_1.py", "a", encoding="utf-8") as file:
+            file.write("# changed\n")
+        os.remove(folder / "module_2.py")
+        gone = SyncManifest(manifest_path).entries["module_3.py"]["file_id"]
+        del server.files[gone]
+
+        report = sync(server, folder, manifest_path)
+        assert sorted(report.uploaded) == ["module_1.py", "module_3.py"]
+        assert sorted(report.unchanged) == ["module_0.py", "module_4.py"]
+        assert len(report.deleted) == 2
+        names = sorted(file["filename"] for file in server.files.values())
+        assert names == ["module_0.py", "module_0.py", "module_1.py", "module_3.py", "module_4.py"]
+        entries = SyncManifest(manifest_path).entries
+        assert set(entries) == set(names)
+        assert {entry["file_id"] for entry in entries.values()} == set(server.files) - {other_project["id"]}
@@ -0,0 +1,71 @@
+"""
+Startup cost of the entry points, measured with `python -X importtime`.
+
+    python -m test.test_import_time
+
+prints the table: each entry point's cumulative import time (best of a few runs,
+in a fresh interpreter) and the slowest modules it pulls in. Timings depend on the
+machine, so only the report shows them; the tests check which heavy modules an
+import pulls in.
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+ENTRY_POINTS = ["chats.__main__", "chats_v28.__main__", "book_maker.__main__", "chats.bot_shell"]
+# heavy imports that belong in the function that uses them
+DEFERRED = {
+    "chats_v28.__main__": ["openai", "httpx", "mdformat", "markdown_it", "symspellpy", "tiktoken", "yaml", "pydantic"],
+    "chats.tool_code.text_shorteners": ["nltk", "readability", "markdown_it", "tiktoken"],
+    "chats.tool_code.pypi_info": ["inflect", "stdlib_list", "nltk", "readability"],
+    "chats.token_utils": ["tiktoken"],
+    "chats_v28.workflow.book_pipeline": ["openai", "httpx"],
+    "chats_v28.create_book_chatgpt": ["openai", "httpx"],
+}
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative microseconds per module, for a fresh import of `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def entry_point_ms(module: str, runs: int = 3) -> float:
+    return min(import_times(module)[module] for _ in range(runs)) / 1000
+
+
+def loaded_modules(module: str) -> set[str]:
+    code = f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return set(json.loads(output))
+
+
+@pytest.mark.parametrize("module", sorted(DEFERRED))
+def test_heavy_imports_are_deferred(module):
+    loaded = loaded_modules(module)
+    assert [name for name in DEFERRED[module] if name in loaded] == []
+
+
+def report() -> None:
+    for module in ENTRY_POINTS:
+        times = import_times(module)
+        print(f"{module:30} {entry_point_ms(module):8.1f} ms")
+        # interpreter startup (site and what it imports) shows up too, only keep what the entry point pulled in
+        own = [name for name in times if name != module and times[name] <= times[module]]
+        slowest = sorted(own, key=times.get, reverse=True)[:5]
+        for name in slowest:
+            print(f"    {name:40} {times[name] / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    report()
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import pickle
+import time
+
+import pytest
+from openai import AsyncOpenAI
+from openai.types.beta import Thread
+
+from chats.inventory import InventoryClient
+from test.fake_files_server import FakeFilesServer
+from test.fake_inventory_server import FakeInventoryServer
+
+
+async def no_sleep(seconds: float) -> None:
+    await asyncio.sleep(0)
+
+
+def inventory(server, tmp_path=None, concurrency: int = 16) -> InventoryClient:
+    client = AsyncOpenAI(api_key="test", base_url=server.base_url)
+    threads_folder = str(tmp_path) if tmp_path else "."
+    return InventoryClient(client, threads_folder=threads_folder, concurrency=concurrency, sleep=no_sleep)
+
+
+def test_iterates_every_page():
+    with FakeInventoryServer(page_size=7) as server:
+        for number in range(30):
+            server.add_assistant(f"bot {number}")
+
+        async def names():
+            return [assistant.name async for assistant in inventory(server).iter_assistants(page_size=7)]
+
+        assert asyncio.run(names()) == [f"bot {number}" for number in range(30)]
+
+
+def test_dry_run_filters_by_name_and_age():
+    old = int(time.time()) - 10 * 86400
+    with FakeInventoryServer(page_size=5) as server:
+        for number in range(12):
+            server.add_assistant(f"Python Code Review bot {number}", created_at=old if number % 2 else None)
+        server.add_assistant("Keep me", created_at=old)
+
+        report = asyncio.run(inventory(server).cleanup("assistants", "Review bot", 7 * 86400, dry_run=True))
+        assert len(report.matched) == 6
+        assert report.deleted == []
+        assert len(server.assistants) == 13
+
+
+@pytest.mark.parametrize("concurrency", [1, 16])
+def test_bulk_delete_retries_rate_limits(concurrency):
+    with FakeInventoryServer(page_size=100, latency=0.02, rate_limit_every=10) as server:
+        for number in range(200):
+            server.add_assistant(f"bot {number}")
+        server.add_assistant("keeper")
+
+        report = asyncio.run(inventory(server, concurrency=concurrency).cleanup("assistants", r"^bot \d+$"))
+        assert len(report.deleted) == 200 and not report.failed
+        assert report.retries == server.rate_limited == 20
+        assert [assistant["name"] for assistant in server.assistants.values()] == ["keeper"]
+        assert server.max_in_flight <= concurrency
+        if concurrency > 1:
+            # sequential would never have more than one delete in flight
+            assert server.max_in_flight > 1
+
+
+def test_threads_come_from_local_pickles(tmp_path):
+    with FakeInventoryServer() as server:
+        for bot_name, thread_id in [("review_bot", "thread_1"), ("review_bot", "thread_2"), ("name_bot", "thread_3")]:
+            os.makedirs(tmp_path / bot_name, exist_ok=True)
+            with open(tmp_path / bot_name / f"{thread_id}.pkl", "wb") as file:
+                pickle.dump(Thread(id=thread_id, created_at=0, metadata={}, object="thread"), file)
+        # thread_2 was deleted remotely already
+        server.threads.update({"thread_1", "thread_3"})
+
+        report = asyncio.run(inventory(server, tmp_path).cleanup("threads", "review"))
+        assert sorted(report.deleted) == ["thread_1", "thread_2"]
+        assert server.threads == {"thread_3"}
+        assert os.listdir(tmp_path / "review_bot") == []
+        assert os.listdir(tmp_path / "name_bot") == ["thread_3.pkl"]
+
+
+def test_pickle_that_cannot_be_removed_is_reported(tmp_path, monkeypatch):
+    def locked(path):
+        raise PermissionError(f"in use: {path}")
+
+    monkeypatch.setattr(os, "remove", locked)
+    with FakeInventoryServer() as server:
+        os.makedirs(tmp_path / "review_bot")
+        for thread_id in ["thread_1", "thread_2"]:
+            with open(tmp_path / "review_bot" / f"{thread_id}.pkl", "wb") as file:
+                pickle.dump(Thread(id=thread_id, created_at=0, metadata={}, object="thread"), file)
+        server.threads.update({"thread_1", "thread_2"})
+
+        report = asyncio.run(inventory(server, tmp_path).cleanup("threads"))
+        assert report.deleted == []
+        assert sorted(report.failed) == ["thread_1", "thread_2"]
+        assert "in use" in report.failed["thread_1"]
+
+
+def test_files_cleanup():
+    with FakeFilesServer(page_size=4) as server:
+        for number in range(10):
+            server.add(f"module_{number}.py" if number < 6 else f"notes_{number}.txt", b"x")
+
+        report = asyncio.run(inventory(server).cleanup("files", r"\.py$"))
+        assert len(report.deleted) == 6
+        assert sorted(file["filename"] for file in server.files.values()) == [f"notes_{n}.txt" for n in range(6, 10)]
@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+import markpickle
+import pytest
+
+from chats.log_sink import LogSink
+from chats.utils import SetEncoder
+
+EVENT = {"id": "run_abc", "status": "completed", "tools": [{"type": "function"}], "empty": None}
+
+
+def write_json_to_logs_before(obj, kind: str, folder: str):
+    """The old implementation: list the folder, dump json twice, write a markdown twin, all inline."""
+    base_file_name = os.path.join(folder, f"{str(len(os.listdir(folder))).zfill(4)}_{kind}.json")
+    with open(base_file_name, "w", encoding="utf-8", errors="backslashreplace") as f:
+        dictified = json.loads(json.dumps(obj, cls=SetEncoder))
+        dictified = {k: v for k, v in dictified.items() if v}
+        f.write(json.dumps(dictified, indent=2, cls=SetEncoder))
+    with open(base_file_name.replace(".json", ".md"), "w", encoding="utf-8", errors="backslashreplace") as md_file:
+        markpickle.dump(obj, md_file)
+
+
+def make_full_folder(path, files: int = 10_000) -> str:
+    os.makedirs(path)
+    for i in range(files):
+        open(os.path.join(path, f"{str(i).zfill(4)}_old.json"), "w").close()
+    return str(path)
+
+
+def test_numbers_continue_after_existing_logs(tmp_path):
+    sink = LogSink(make_full_folder(tmp_path / "logs", files=5))
+    sequences = [sink.write(EVENT, "run") for _ in range(3)]
+    sink.close()
+
+    assert sequences == [5, 6, 7]
+    with open(os.path.join(sink.folder, "0005_run.json"), encoding="utf-8") as f:
+        assert json.load(f) == {"id": "run_abc", "status": "completed", "tools": [{"type": "function"}]}
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_per_event_overhead(tmp_path):
+    events = 300
+    before_folder = make_full_folder(tmp_path / "before")
+    start = time.perf_counter()
+    for _ in range(events):
+        write_json_to_logs_before(EVENT, "run", before_folder)
+    before = (time.perf_counter() - start) / events
+
+    sink = LogSink(make_full_folder(tmp_path / "after"))
+    start = time.perf_counter()
+    sequences = [sink.write(EVENT, "run") for _ in range(events)]
+    queued = (time.perf_counter() - start) / events
+    sink.flush()
+    written = (time.perf_counter() - start) / events
+    sink.close()
+
+    print(
+        f"\nper event with 10k log files: inline {before * 1e6:.0f}us, "
+        f"queued {queued * 1e6:.1f}us, background write {written * 1e6:.0f}us"
+    )
+    assert sequences == list(range(10_000, 10_000 + events))
+    with open(os.path.join(sink.folder, "10000_run.json"), encoding="utf-8") as f:
+        assert json.load(f) == {"id": "run_abc", "status": "completed", "tools": [{"type": "function"}]}
+    assert queued < before
+
+
+def test_jsonl_rotates(tmp_path):
+    sink = LogSink(str(tmp_path), jsonl=True, max_bytes=2_000, backup_count=2)
+    for _ in range(100):
+        sink.write({"message": "x" * 50, "tags": {"a"}}, "message")
+    sink.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["events.jsonl", "events.jsonl.1", "events.jsonl.2"]
+    assert all(os.path.getsize(tmp_path / name) <= 2_000 for name in os.listdir(tmp_path))
+    with open(tmp_path / "events.jsonl", encoding="utf-8") as f:
+        last = json.loads(f.readlines()[-1])
+    assert last["seq"] == 99 and last["kind"] == "message" and last["data"]["tags"] == ["a"]
+
+
+def test_logs_the_object_as_it_was_when_written(tmp_path):
+    sink = LogSink(str(tmp_path), jsonl=True)
+    event = {"status": "queued", "steps": ["create"]}
+    for status in ["in_progress", "completed"]:
+        sink.write(event, "run")
+        event["status"] = status
+        event["steps"].append(status)
+    sink.close()
+
+    with open(tmp_path / "events.jsonl", encoding="utf-8") as f:
+        logged = [json.loads(line)["data"] for line in f]
+    assert logged == [
+        {"status": "queued", "steps": ["create"]},
+        {"status": "in_progress", "steps": ["create", "in_progress"]},
+    ]
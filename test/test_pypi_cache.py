@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from chats.tool_code.pypi_cache import PyPICache
+from chats.tool_code.pypi_info import PyPIChecker
+from test.fake_pypi_server import FakePyPIServer
+
+NAMES = [f"name{i}" for i in range(50)]
+EXISTING = NAMES[::2]
+
+
+async def session(base_url: str, cache: PyPICache) -> dict[str, bool]:
+    async with PyPIChecker(base_url=base_url, cache=cache) as checker:
+        return await checker.packages_exist(NAMES)
+
+
+def test_repeat_session_skips_network(tmp_path):
+    with FakePyPIServer(EXISTING) as server:
+        cache = PyPICache(str(tmp_path / "pypi.sqlite3"))
+        first = asyncio.run(session(server.base_url, cache))
+        assert server.requests == len(NAMES)
+        assert cache.stats()["misses"] == len(NAMES)
+
+        # new process, same file
+        cache = PyPICache(str(tmp_path / "pypi.sqlite3"))
+        second = asyncio.run(session(server.base_url, cache))
+        assert second == first
+        assert server.requests == len(NAMES)
+        assert cache.stats() == {
+            "lookups": 50,
+            "hits": 50,
+            "misses": 0,
+            "revalidated": 0,
+            "stale_served": 0,
+            "hit_rate": 1.0,
+            "saved_requests": 50,
+        }
+    assert first["name0"] and not first["name1"]
+
+
+def test_stale_entries_revalidate_with_etag(tmp_path):
+    with FakePyPIServer(EXISTING) as server:
+        asyncio.run(session(server.base_url, PyPICache(str(tmp_path / "pypi.sqlite3"))))
+
+        # positive answers are stale, negative ones still fresh
+        cache = PyPICache(str(tmp_path / "pypi.sqlite3"), positive_ttl=0)
+        result = asyncio.run(session(server.base_url, cache))
+        assert result["name0"]
+        assert cache.revalidated == len(EXISTING)
+        assert cache.hits == len(NAMES) - len(EXISTING)
+        assert server.requests == len(NAMES) + len(EXISTING)
+
+
+@pytest.mark.parametrize("status", [500, 503, 429])
+def test_stale_entries_are_served_when_pypi_fails(tmp_path, status):
+    with FakePyPIServer(EXISTING) as server:
+        first = asyncio.run(session(server.base_url, PyPICache(str(tmp_path / "pypi.sqlite3"))))
+
+        server.failing = status
+        cache = PyPICache(str(tmp_path / "pypi.sqlite3"), positive_ttl=0, negative_ttl=0)
+        assert asyncio.run(session(server.base_url, cache)) == first
+        assert cache.stale_served == len(NAMES)
+        # the error didn't overwrite what was cached
+        assert cache.get("name0").status == 200
+
+
+def test_stale_entries_are_served_when_pypi_is_unreachable(tmp_path):
+    with FakePyPIServer(EXISTING) as server:
+        first = asyncio.run(session(server.base_url, PyPICache(str(tmp_path / "pypi.sqlite3"))))
+        base_url = server.base_url
+
+    cache = PyPICache(str(tmp_path / "pypi.sqlite3"), positive_ttl=0, negative_ttl=0)
+    assert asyncio.run(session(base_url, cache)) == first
+    assert cache.stale_served == len(NAMES)
+
+
+def test_describe_packages_uses_cache(tmp_path):
+    with FakePyPIServer(["faker"]) as server:
+        cache = PyPICache(str(tmp_path / "pypi.sqlite3"))
+        first = asyncio.run(describe(server.base_url, cache))
+        second = asyncio.run(describe(server.base_url, cache))
+        assert first == second
+        assert first["faker"]["summary"] == "The faker package"
+        assert server.requests == 2
+        assert cache.hits == 2
+
+
+async def describe(base_url: str, cache: PyPICache):
+    async with PyPIChecker(base_url=base_url, cache=cache) as checker:
+        return await checker.describe_packages(["faker", "nope"])
+
+
+def test_names_are_normalized(tmp_path):
+    cache = PyPICache(str(tmp_path / "pypi.sqlite3"))
+    cache.put("Foo_Bar", 200, {"info": {"name": "foo-bar"}})
+    for name in ["foo-bar", "foo.bar", "FOO__bar"]:
+        assert cache.get(name).body == {"info": {"name": "foo-bar"}}
+
+
+def test_file_opened_on_first_lookup(tmp_path):
+    cache = PyPICache(str(tmp_path / "pypi.sqlite3"))
+    assert not (tmp_path / "pypi.sqlite3").exists()
+    assert cache.get("faker") is None
+    assert (tmp_path / "pypi.sqlite3").exists()
+    cache.close()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from chats.tool_code.pypi_index import PyPINameIndex, normalize, run, write_index
+from chats.tool_code.pypi_info import PyPIChecker
+
+
+def test_normalize():
+    assert normalize("Foo_Bar.baz") == "foo-bar-baz"
+    assert normalize("requests") == "requests"
+
+
+def write_half_million(path: str) -> None:
+    names = [f"Project_{i}" for i in range(500_000)]
+    write_index(path, names + ["Django", "zope.interface"], serial=42)
+
+
+def test_half_million_names(tmp_path):
+    path = str(tmp_path / "names.idx")
+    write_half_million(path)
+    index = PyPINameIndex(path)
+    found = [name in index for name in (f"project-{i}" for i in range(0, 1_000_000, 100))]
+
+    assert len(index) == 500_002
+    assert index.serial == 42
+    assert sum(found) == 5000
+    assert "zope-interface" in index and "ZOPE_interface" in index and "django" in index
+    assert "flask" not in index
+    index.close()
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_load_and_lookup(tmp_path):
+    path = str(tmp_path / "names.idx")
+    write_half_million(path)
+
+    start = time.perf_counter()
+    index = PyPINameIndex(path)
+    load_seconds = time.perf_counter() - start
+
+    probes = [f"project-{i}" for i in range(0, 1_000_000, 100)]
+    start = time.perf_counter()
+    for name in probes:
+        _ = name in index
+    lookup_seconds = time.perf_counter() - start
+    print(f"\nloaded {len(index)} names in {load_seconds * 1000:.2f}ms, {len(probes) / lookup_seconds:.0f} lookups/s")
+    assert load_seconds < 0.1
+    index.close()
+
+
+def test_add_and_variants_without_network(tmp_path):
+    path = str(tmp_path / "names.idx")
+    write_index(path, ["requests", "pandas"])
+    index = PyPINameIndex(path)
+    assert index.add(["flask", "Requests"]) == 1
+    assert list(index) == ["flask", "pandas", "requests"]
+
+    async def check():
+        # nothing listens here, any network request would fail
+        async with PyPIChecker(base_url="http://127.0.0.1:9/pypi", name_index=index) as checker:
+            return await checker.packages_or_variant_exist(["request", "brand-new-name"])
+
+    result = asyncio.run(check())
+    assert not result["request"]["available"]
+    assert result["brand-new-name"]["available"]
+    index.close()
+
+
+def test_command_line(tmp_path, capsys):
+    dump = tmp_path / "dump.txt"
+    dump.write_text("requests\nPandas\n\n", encoding="utf-8")
+    path = str(tmp_path / "names.idx")
+    run(["--index", path, "build", "--dump", str(dump)])
+    run(["--index", path, "check", "pandas", "nope"])
+    assert capsys.readouterr().out.splitlines()[-2:] == ["pandas: taken", "nope: available"]
+
+
+def test_refresh_drops_removed_projects(tmp_path, monkeypatch):
+    path = str(tmp_path / "names.idx")
+    write_index(path, ["requests", "left-pad", "old_thing"], serial=10)
+    changes = [
+        ("brand_new", None, 0, "create", 11),
+        ("left-pad", None, 0, "remove project", 12),
+        ("Old.Thing", None, 0, "remove", 13),
+        ("requests", "2.0", 0, "remove", 14),
+        ("gone-again", None, 0, "create", 15),
+        ("gone-again", None, 0, "remove project", 16),
+    ]
+
+    class FakeServerProxy:
+        def __init__(self, url):
+            pass
+
+        def changelog_since_serial(self, serial):
+            return [change for change in changes if change[4] > serial]
+
+    monkeypatch.setattr("xmlrpc.client.ServerProxy", FakeServerProxy)
+    index = PyPINameIndex(path)
+    assert index.refresh() == (1, 2)
+    assert list(index) == ["brand-new", "requests"]
+    assert index.serial == 16
+    assert index.refresh() == (0, 0)
+    index.close()
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+import pytest
+
+from chats.tool_code.pypi_info import PyPIChecker
+from test.fake_pypi_server import FakePyPIServer
+
+NAMES = [f"candidate-name-{i}" for i in range(100)]
+EXISTING = [name.replace("-", "") for name in NAMES[::3]]
+
+
+class UnpooledChecker(PyPIChecker):
+    """The old behaviour, a new client (and connection) per request."""
+
+    async def get(self, url: str, headers: Optional[dict[str, str]] = None) -> httpx.Response:
+        async with httpx.AsyncClient() as client:
+            return await client.get(url, headers=headers)
+
+
+async def variant_check(checker: PyPIChecker) -> tuple[dict, float]:
+    start = time.perf_counter()
+    async with checker:
+        result = await checker.packages_or_variant_exist(NAMES)
+    return result, time.perf_counter() - start
+
+
+def test_pooled_variant_check_reuses_connections():
+    with FakePyPIServer(EXISTING) as server:
+        unpooled, _ = asyncio.run(variant_check(UnpooledChecker(base_url=server.base_url)))
+        unpooled_connections, server.connections, server.requests = server.connections, 0, 0
+
+        pooled, _ = asyncio.run(variant_check(PyPIChecker(max_concurrency=8, base_url=server.base_url)))
+        pooled_connections, requests = server.connections, server.requests
+
+    assert pooled == unpooled
+    assert pooled_connections <= 8
+    assert unpooled_connections == requests
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_pooled_variant_check():
+    with FakePyPIServer(EXISTING) as server:
+        _, unpooled_seconds = asyncio.run(variant_check(UnpooledChecker(base_url=server.base_url)))
+        unpooled_connections, server.connections, server.requests = server.connections, 0, 0
+
+        _, pooled_seconds = asyncio.run(variant_check(PyPIChecker(max_concurrency=8, base_url=server.base_url)))
+        pooled_connections, requests = server.connections, server.requests
+
+    print(
+        f"\n100 names, {requests} variant requests: "
+        f"client per request {unpooled_connections} connections {unpooled_seconds:.3f}s, "
+        f"pooled {pooled_connections} connections {pooled_seconds:.3f}s"
+    )
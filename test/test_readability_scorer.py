@@ -0,0 +1,127 @@
+import os
+import random
+import re
+import time
+
+import pytest
+from readability import Readability
+
+from chats.tool_code.readability_scorer import LOW_WORD_COUNT, ReadabilityScorer, count_syllables
+from chats.tool_code.text_shorteners import readability_scores
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WORDS = (
+    "the cat sat on a mat while an extraordinarily complicated administrative procedure unfolded "
+    "quietly beside Wikipedia and well-known encyclopedias everywhere"
+).split()
+
+
+def split_sentences(text: str) -> list[str]:
+    """Stands in for nltk's punkt, which needs a download."""
+    return [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    # the readability package splits sentences the same way, so the scores can be compared exactly
+    monkeypatch.setattr("readability.text.analyzer.sent_tokenize", split_sentences)
+    return ReadabilityScorer(sentence_splitter=split_sentences)
+
+
+def paragraph(rng: random.Random, sentences: int = 4) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20))).capitalize() + rng.choice([".", "!", "?"])
+        for _ in range(sentences)
+    )
+
+
+def package_scores(text: str) -> dict:
+    r = Readability(text)
+    return {
+        "flesch_kincaid": round(r.flesch_kincaid().score, 1),
+        "gunning_fog": round(r.gunning_fog().score, 1),
+        "coleman_liau": round(r.coleman_liau().score, 1),
+    }
+
+
+def test_same_scores_as_the_readability_package(scorer):
+    rng = random.Random(1)
+    for _ in range(5):
+        text = "\n\n".join(paragraph(rng) for _ in range(6))
+        assert scorer.scores(text) == package_scores(text)
+
+
+def test_short_text_has_no_score(scorer):
+    assert scorer.scores("Too short to say.") == {
+        "flesch_kincaid": LOW_WORD_COUNT,
+        "gunning_fog": LOW_WORD_COUNT,
+        "coleman_liau": LOW_WORD_COUNT,
+    }
+
+
+def test_syllables():
+    assert [count_syllables(word) for word in ["cat", "the", "extraordinarily", "encyclopedias", "rate"]] == [
+        1,
+        1,
+        6,
+        5,
+        1,
+    ]
+
+
+def test_only_changed_paragraphs_are_recounted(scorer):
+    rng = random.Random(2)
+    paragraphs = [paragraph(rng) for _ in range(10)]
+    scorer.scores("\n\n".join(paragraphs))
+    assert scorer.paragraph_counts.cache_info().misses == 10
+
+    paragraphs[3] = paragraph(rng)
+    edited = "\n\n".join(paragraphs)
+    assert scorer.scores(edited) == package_scores(edited)
+    assert scorer.paragraph_counts.cache_info().misses == 11
+
+
+def test_batch(scorer):
+    rng = random.Random(3)
+    texts = ["\n\n".join(paragraph(rng) for _ in range(5)) for _ in range(4)]
+    assert scorer.scores_many(texts) == [package_scores(text) for text in texts]
+
+
+def test_text_shorteners_uses_the_scorer(monkeypatch, scorer):
+    monkeypatch.setattr("chats.tool_code.text_shorteners.default_scorer", lambda: scorer)
+    rng = random.Random(5)
+    text = "\n\n".join(paragraph(rng) for _ in range(4))
+    assert readability_scores(text) == package_scores(text)
+
+
+def edited_drafts() -> list[str]:
+    rng = random.Random(4)
+    paragraphs = [paragraph(rng, sentences=6) for _ in range(60)]
+    drafts = []
+    for _ in range(10):
+        paragraphs[rng.randrange(len(paragraphs))] = paragraph(rng, sentences=6)
+        drafts.append("\n\n".join(paragraphs))
+    return drafts
+
+
+def test_rescoring_drafts_matches_the_package(scorer):
+    drafts = edited_drafts()
+    assert scorer.scores_many(drafts) == [package_scores(draft) for draft in drafts]
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_rescoring_drafts(scorer):
+    drafts = edited_drafts()
+    start = time.perf_counter()
+    expected = [package_scores(draft) for draft in drafts]
+    package_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = scorer.scores_many(drafts)
+    scorer_seconds = time.perf_counter() - start
+    words = len(drafts[0].split())
+    print(
+        f"\n10 drafts of {words} words: readability package {package_seconds:.2f}s, "
+        f"single pass with paragraph cache {scorer_seconds:.3f}s"
+    )
+    assert scores == expected
+    assert scorer_seconds < package_seconds / 3
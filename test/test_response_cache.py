@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from chats.document_shell import Document
+from chats.response_cache import ResponseCache
+from chats.telemetry import TELEMETRY
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def chat_args(prompt: str, temperature: float = 0.9, **extra) -> dict:
+    messages = [{"role": "user", "content": prompt}]
+    return {"model": "gpt-3.5-turbo", "messages": messages, "temperature": temperature, **extra}
+
+
+def test_same_request_in_any_key_order_is_a_hit(cache):
+    calls = []
+
+    def call():
+        calls.append(1)
+        return {"choices": [{"message": {"content": "Hello"}}]}
+
+    first = cache.cached("chat.completions", chat_args("hi"), call)
+    reordered = dict(reversed(list(chat_args("hi", stream=False, seed=None).items())))
+    second = cache.cached("chat.completions", reordered, call)
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.get("completions", chat_args("hi")) is None, "other endpoints don't share entries"
+
+
+def test_ignore_temperature_is_opt_in(cache):
+    cache.put("chat.completions", chat_args("hi", 0.9), {"text": "warm"})
+    assert cache.get("chat.completions", chat_args("hi", 0.2)) is None
+    assert cache.get("chat.completions", chat_args("hi", 0.2), ignore_temperature=True) is None
+
+    cache.put("chat.completions", chat_args("hi", 0.9), {"text": "warm"}, ignore_temperature=True)
+    assert cache.get("chat.completions", chat_args("hi", 0.2), ignore_temperature=True) == {"text": "warm"}
+
+
+def test_seeded_only(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), seeded_only=True)
+    cache.put("completions", chat_args("sampled"), {"text": "a"})
+    cache.put("completions", chat_args("seeded", seed=42), {"text": "b"})
+    cache.put("completions", chat_args("greedy", temperature=0), {"text": "c"})
+    assert cache.get("completions", chat_args("sampled")) is None
+    assert cache.get("completions", chat_args("seeded", seed=42)) == {"text": "b"}
+    assert cache.get("completions", chat_args("greedy", temperature=0)) == {"text": "c"}
+    assert cache.get("completions", chat_args("seeded", seed=43)) is None
+    assert cache.stats()["skipped"] == 1
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    noise = random.Random(0)
+
+    def body() -> dict:
+        # doesn't compress, about 2kb each
+        return {"text": "".join(noise.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(2500))}
+
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), max_bytes=5000)
+    cache.put("completions", chat_args("old"), body())
+    time.sleep(0.01)
+    cache.put("completions", chat_args("newer"), body())
+    time.sleep(0.01)
+    assert cache.get("completions", chat_args("old")) is not None
+    time.sleep(0.01)
+    cache.put("completions", chat_args("newest"), body())
+
+    assert cache.get("completions", chat_args("newer")) is None
+    assert cache.get("completions", chat_args("old")) is not None
+    assert cache.get("completions", chat_args("newest")) is not None
+    assert cache.evicted == 1
+    assert cache.size() <= 5000
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_cached_reply_takes_milliseconds(cache):
+    reply = {"choices": [{"message": {"content": "A chapter about files. " * 400}}]}
+    for number in range(1000):
+        cache.put("chat.completions", chat_args(f"prompt {number}"), reply)
+
+    start = time.perf_counter()
+    for number in range(1000):
+        assert cache.get("chat.completions", chat_args(f"prompt {number}")) == reply
+    per_hit = (time.perf_counter() - start) / 1000
+    print(f"\n{per_hit * 1000:.3f} ms per cached reply, {cache.size() / 1000:.0f} kb on disk for 1000 replies")
+    assert per_hit < 0.01
+
+
+def test_document_replays_cached_completion(cache, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+    document = Document(seed=7, cache=cache, token_counter=len)
+    document.document = document.exchange_template.replace("{{USER}}", "Hi")
+    cache.put("completions", document.completion_args(), {"text": "Hello there"})
+    document.document = ""
+
+    class NoNetwork:
+        async def create(self, **kwargs):
+            raise AssertionError("should have come from the cache")
+
+    document.client.completions = NoNetwork()
+    result = asyncio.run(document.prompt("Hi"))
+    assert result.endswith("\nHello there\n")
+
+
+def test_unseeded_document_skips_the_cache(cache, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+    document = Document(cache=cache, token_counter=len)
+    sent = {}
+
+    class FreshReply:
+        async def create(self, stream: bool, **kwargs):
+            sent.update(kwargs)
+
+            async def stream():
+                yield SimpleNamespace(choices=[SimpleNamespace(text="Hi again")])
+
+            return stream()
+
+    document.client.completions = FreshReply()
+    assert asyncio.run(document.prompt("Hi")).endswith("\nHi again\n")
+    # never looked up, and not stored for next time either
+    assert cache.hits == cache.misses == 0
+    assert cache.get("completions", sent) is None
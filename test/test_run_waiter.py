@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from openai import AsyncOpenAI
+from openai.types.beta import Assistant
+from openai.types.beta.threads import Run
+
+from chats.bot_shell import BotConversation
+from chats.run_waiter import RunTimeout, RunWaiter
+from chats.telemetry import TELEMETRY
+from test.fake_assistants_server import FakeAssistantsServer
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+
+
+def make_convo(server: FakeAssistantsServer, thread_id: str, deadline: float = 10.0) -> BotConversation:
+    convo = BotConversation(Assistant.construct(id="asst_fake"), wait_deadline=deadline)
+    convo.client = AsyncOpenAI(base_url=server.base_url)
+    convo.thread_id = thread_id
+    return convo
+
+
+async def start_and_wait(convo: BotConversation) -> Run:
+    run = await convo.client.beta.threads.runs.create(thread_id=convo.thread_id, assistant_id=convo.assistant.id)
+    return await convo.poll_the_run(run)
+
+
+def test_two_conversations_wait_concurrently():
+    async def main():
+        with FakeAssistantsServer(run_seconds=0.5) as server:
+            first, second = make_convo(server, "thread_a"), make_convo(server, "thread_b")
+            run_a, run_b = await asyncio.gather(start_and_wait(first), start_and_wait(second))
+            return run_a, run_b, server, first.last_wait
+
+    run_a, run_b, server, waiter = asyncio.run(main())
+    retrieve_calls = server.retrieve_calls
+    assert run_a.status == run_b.status == "completed"
+    # time.sleep() would have blocked the loop, the second run would only start after the first finished
+    assert max(server.started.values()) < min(server.finished.values())
+    # backoff keeps polling cheap: 1s fixed sleeps would need ~1 call, tight loop hundreds
+    assert all(0 < calls < 15 for calls in retrieve_calls.values())
+    assert waiter.retrieve_calls == retrieve_calls[run_a.id]
+
+
+def test_deadline():
+    async def main():
+        with FakeAssistantsServer(run_seconds=5) as server:
+            await start_and_wait(make_convo(server, "thread_a", deadline=0.3))
+
+    with pytest.raises(RunTimeout):
+        asyncio.run(main())
+
+
+def test_backoff_grows_to_ceiling():
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    async def main():
+        waiter = RunWaiter(first_delay=0.1, max_delay=0.5, multiplier=2, deadline=None, sleep=fake_sleep)
+        for _ in range(5):
+            await waiter.pause()
+
+    asyncio.run(main())
+    assert slept == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_follow_stops_on_requires_action():
+    def event(name, status):
+        return SimpleNamespace(event=name, data=Run.construct(id="run_1", status=status))
+
+    async def stream():
+        yield event("thread.run.queued", "queued")
+        yield event("thread.run.in_progress", "in_progress")
+        yield SimpleNamespace(event="thread.message.delta", data=None)
+        yield event("thread.run.requires_action", "requires_action")
+        yield event("thread.run.completed", "completed")
+
+    waiter = RunWaiter()
+    run = asyncio.run(waiter.follow(stream()))
+    assert run.status == "requires_action"
+    assert waiter.retrieve_calls == 0
@@ -0,0 +1,100 @@
+import os
+import random
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from chats.semantic_cache import FlatIndex, SemanticCache  # noqa: E402
+
+TEMPLATES = [
+    "I need a python library that {}",
+    "Is there a python package which can {} please",
+    "Looking for a pypi project to {}",
+    "Any prior art for a tool that will {}?",
+    "What package should I use to {}",
+]
+
+
+def test_rephrased_prompt_gets_cached_answer():
+    cache = SemanticCache()
+    cache.add("I need a python library that lints google docstrings.", "pydocstyle, darglint")
+    cache.add("I need a python library that can manage TODO tasks in a plain text file.", "todotxt")
+    cache.add("I need a python text editor that works like ed or edlin.", "dedlin")
+
+    hit = cache.lookup("Is there any python library which lints Google docstrings?")
+    assert hit is not None
+    assert hit.answer == "pydocstyle, darglint"
+    assert cache.lookup("I need a python library that draws charts in the terminal.") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SemanticCache(threshold=0.6)
+    cache.add("I need a python library that lints google docstrings.", {"text": "darglint"})
+    cache.save(path)
+
+    loaded = SemanticCache.load(path)
+    assert loaded.threshold == 0.6
+    assert loaded.lookup("python library that lints google docstrings").answer == {"text": "darglint"}
+    assert len(SemanticCache.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_flat_index_grows():
+    index = FlatIndex(4, capacity=2)
+    for row in range(5):
+        vector = np.zeros(4, dtype=np.float32)
+        vector[row % 4] = 1
+        index.add(vector)
+    assert len(index) == 5
+    assert sorted(row for row, _ in index.nearest(np.array([1, 0, 0, 0], dtype=np.float32), k=2)) == [0, 4]
+    assert index.nearest(np.array([0, 0, 1, 0], dtype=np.float32))[0] == (2, 1.0)
+
+
+def fill_and_probe(size: int, probes: int = 200) -> tuple[SemanticCache, int, int]:
+    """Cache `size` prompts, then count right hits on rephrasings and false hits on new requests."""
+    rng = random.Random(1)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(3000)]
+    topics = [rng.sample(vocabulary, 6) for _ in range(size)]
+    templates = [rng.randrange(len(TEMPLATES)) for _ in topics]
+
+    cache = SemanticCache()
+    for number, (words, template) in enumerate(zip(topics, templates)):
+        cache.add(TEMPLATES[template].format(" ".join(words)), number)
+
+    # same request, other wording, vs a request nobody made yet
+    right = wrong = 0
+    for _ in range(probes):
+        number = rng.randrange(len(topics))
+        words = topics[number][:3] + ["and"] + topics[number][3:]
+        hit = cache.lookup(TEMPLATES[(templates[number] + 1) % len(TEMPLATES)].format(" ".join(words)))
+        right += hit is not None and hit.answer == number
+        new_request = TEMPLATES[rng.randrange(len(TEMPLATES))].format(" ".join(rng.sample(vocabulary, 6)))
+        wrong += cache.lookup(new_request) is not None
+    return cache, right, wrong
+
+
+def test_hit_rate_at_5k():
+    _, right, wrong = fill_and_probe(5000)
+    assert right >= 190
+    assert wrong <= 2
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="100k prompts, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_hit_rate_and_latency_at_100k():
+    start = time.perf_counter()
+    cache, right, wrong = fill_and_probe(100_000)
+    seconds = time.perf_counter() - start
+
+    stats = cache.stats()
+    print(
+        f"\n100k prompts cached and probed in {seconds:.1f}s, rephrased hits {right}/200, false hits {wrong}/200, "
+        f"{stats['mean_lookup_ms']} ms per lookup"
+    )
+    assert right >= 190
+    assert wrong <= 2
+    assert stats["mean_lookup_ms"] < 100
@@ -0,0 +1,102 @@
+import os
+import random
+import re
+import time
+
+import pytest
+
+pytest.importorskip("symspellpy")
+
+from chats_v28.preprompt import spelling_utils  # noqa: E402
+from chats_v28.preprompt.spelling_utils import check_document, get_sym_spell  # noqa: E402
+from symspellpy import Verbosity  # noqa: E402
+
+DOCUMENT = """# Speling notes
+
+Some text with a mispelled word and `inline_codde_thing` in it.
+
+```python
+def teh_function(arguement):
+    return arguement
+```
+
+    indented_codde = 1
+
+The end, teh end.
+"""
+
+
+def word_by_word(document: str) -> tuple[bool, str]:
+    """The checker as it was, one lookup per whitespace separated word."""
+    results = []
+    for word in document.split():
+        term = "".join(re.split("[^a-zA-Z]*", word)).lower()
+        suggestions = get_sym_spell().lookup(term, Verbosity.CLOSEST, max_edit_distance=2)
+        if len(suggestions) == 1:
+            results.append(word)
+        elif not suggestions:
+            results.append(f"{word} !!!(no suggestion)")
+        else:
+            results.append(f"{word} !!!({','.join(suggestion.term for suggestion in suggestions[0:3])})")
+    return all(result == word for result, word in zip(results, document.split())), " ".join(results)
+
+
+def test_code_is_skipped():
+    all_right, checked = check_document(DOCUMENT)
+    assert not all_right
+    assert "Speling !!!(" in checked
+    assert "mispelled !!!(" in checked
+    assert "teh !!!(" in checked
+    assert "`inline_codde_thing` in" in checked
+    assert "teh_function(arguement): return arguement" in checked
+    assert "indented_codde = 1" in checked
+
+
+def test_same_result_as_word_by_word_outside_code():
+    prose = "Teh quick brown fox jumpd over the lazzy dog, 42 times. Qwzxv! The fox's den."
+    assert check_document(prose) == word_by_word(prose)
+
+
+def test_process_pool_matches(monkeypatch):
+    words = [f"{word}x" for word in list(get_sym_spell().words)[:300]]
+    monkeypatch.setattr(spelling_utils, "PARALLEL_WORDS", 100)
+    monkeypatch.setattr(spelling_utils, "LOOKUPS", spelling_utils.LRU())
+    pooled = spelling_utils.check_words(set(words), workers=2)
+    assert pooled == {word: spelling_utils.lookup(word) for word in words}
+
+
+def test_lru_is_bounded():
+    lru = spelling_utils.LRU(maxsize=2)
+    lru.put("a", None)
+    lru.put("b", ("bee",))
+    lru.get("a")
+    lru.put("c", ())
+    assert "b" not in lru and "a" in lru and "c" in lru
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_50k_word_chapter(monkeypatch):
+    rng = random.Random(5)
+    vocabulary = list(get_sym_spell().words)[:5000]
+    words = []
+    for _ in range(50_000):
+        word = rng.choice(vocabulary[:300]) if rng.random() < 0.7 else rng.choice(vocabulary)
+        if rng.random() < 0.01:
+            word = word[:-1] + "q"
+        words.append(word)
+    chapter = "\n\n".join(" ".join(words[start : start + 100]) + "." for start in range(0, len(words), 100))
+
+    monkeypatch.setattr(spelling_utils, "LOOKUPS", spelling_utils.LRU())
+    start = time.perf_counter()
+    check_document(chapter)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    check_document(chapter)
+    warm = time.perf_counter() - start
+
+    sample = " ".join(words[:2000])
+    start = time.perf_counter()
+    word_by_word(sample)
+    old = (time.perf_counter() - start) * len(words) / 2000
+    print(f"\n50k words: {cold:.2f}s cold, {warm:.2f}s warm, word by word about {old:.1f}s")
+    assert cold < 1.0
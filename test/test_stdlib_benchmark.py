@@ -0,0 +1,43 @@
+import os
+import time
+
+import pytest
+from stdlib_list import stdlib_list
+
+from chats.tool_code.pypi_info import STDLIB_VERSIONS, PyPIChecker, all_stdlib_names
+
+NAMES = [f"not_stdlib_{i}" for i in range(990)] + ["io", "os", "json", "asyncio", "imp", "distutils"] + ["a"] * 4
+
+
+def package_is_stdlib_before(package_list: list[str]) -> dict[str, bool]:
+    """The old implementation, list scans per version per name."""
+    results = {}
+    for package in package_list:
+        results[package] = any(package in stdlib_list(version) for version in STDLIB_VERSIONS)
+    return results
+
+
+def test_package_is_stdlib_matches_per_version_scans():
+    checker = PyPIChecker()
+    after = checker.package_is_stdlib(NAMES)
+    assert package_is_stdlib_before(NAMES) == after
+    assert after["io"] and after["imp"] and after["distutils"]
+    assert not after["not_stdlib_0"]
+    assert checker.check_if_in_any("io") and not checker.check_if_in_any("nope_no_way_not_at_all")
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_package_is_stdlib():
+    checker = PyPIChecker()
+    all_stdlib_names()  # built once per process, don't time the first build
+
+    start = time.perf_counter()
+    before = package_is_stdlib_before(NAMES)
+    before_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = checker.package_is_stdlib(NAMES)
+    after_seconds = time.perf_counter() - start
+
+    print(f"\n{len(NAMES)} names: per-version scans {before_seconds:.4f}s, frozenset {after_seconds:.6f}s")
+    assert before == after
@@ -0,0 +1,89 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+from chats.document_shell import Document
+from chats.response_cache import ResponseCache
+from chats.stream_sink import MarkdownStreamSink
+from chats.telemetry import TELEMETRY
+from chats_v28.ai_utils.io_utils import read_streamed_completion, stream_response
+
+
+def read(path: str) -> str:
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+def test_first_token_is_on_disk_right_away_and_rest_in_chunks(tmp_path):
+    with MarkdownStreamSink(str(tmp_path), "The prompt", flush_chars=10) as sink:
+        sink.write("Hello")
+        assert read(sink.temp_path) == "The prompt\n\nHello"
+        sink.write(" wor")
+        assert read(sink.temp_path) == "The prompt\n\nHello", "buffered until 10 characters"
+        sink.write("ld, again")
+        assert read(sink.temp_path) == "The prompt\n\nHello world, again"
+        path = sink.finish("A: title")
+
+    assert path == os.path.join(str(tmp_path), "A__title.md")
+    assert read(path) == "The prompt\n\nHello world, again"
+    assert os.listdir(tmp_path) == ["A__title.md"]
+    assert sink.first_token_seconds is not None
+
+
+def test_only_the_head_stays_in_memory(tmp_path):
+    with MarkdownStreamSink(str(tmp_path), head_size=8) as sink:
+        for _ in range(1000):
+            sink.write("token ")
+        assert sink.head == "token to"
+        assert sink.buffered < sink.flush_chars
+        path = sink.finish("long")
+    assert len(read(path)) == 6000
+
+
+def test_failed_stream_keeps_partial_file(tmp_path):
+    def chunks():
+        yield "half a "
+        raise ConnectionError("dropped")
+
+    try:
+        stream_response("prompt", chunks(), "never", str(tmp_path))
+    except ConnectionError:
+        pass
+    (partial,) = os.listdir(tmp_path / "output")
+    assert partial.startswith("writing_")
+    assert read(str(tmp_path / "output" / partial)) == "prompt\n\nhalf a "
+
+
+def test_stream_response_names_file_from_text(tmp_path):
+    chunks = iter(["# Fish ", "Shell\n", "body"])
+    path = stream_response("prompt", chunks, lambda head: head.split("\n")[0][2:], str(tmp_path))
+    assert os.path.basename(path) == "Fish_Shell_0001.md"
+
+
+def test_completion_read_back_from_streamed_file(tmp_path):
+    path = stream_response("prompt\nsecond line", iter(["# Fish\n", "body"]), "fish", str(tmp_path))
+    assert read_streamed_completion(path, "prompt\nsecond line") == "# Fish\nbody"
+
+
+def test_document_streams_reply_to_named_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+
+    class FakeCompletions:
+        async def create(self, **kwargs):
+            async def stream():
+                for text in ["Loki ", "escapes."]:
+                    yield SimpleNamespace(choices=[SimpleNamespace(text=text)])
+
+            return stream()
+
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    document = Document(
+        cache=cache, output_folder=str(tmp_path / "out"), namer=lambda head: head.split()[0], token_counter=len
+    )
+    document.client.completions = FakeCompletions()
+    asyncio.run(document.prompt("Summarize Loki"))
+
+    assert document.last_path == os.path.join(str(tmp_path / "out"), "Loki.md")
+    assert read(document.last_path) == "Summarize Loki\n\nLoki escapes."
+    assert document.document.endswith("\nLoki escapes.\n")
@@ -0,0 +1,75 @@
+import importlib.resources
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("symspellpy")
+
+from symspellpy import SymSpell, Verbosity  # noqa: E402
+
+from chats_v28.preprompt.symspell_index import index_path, load_sym_spell  # noqa: E402
+
+WORDS = {"spelling": 500, "spewing": 20, "dispelled": 30, "misspelled": 40, "the": 10000, "tea": 300, "ten": 400}
+
+
+def terms(sym_spell: SymSpell, word: str) -> list[tuple[str, int, int]]:
+    return [(item.term, item.distance, item.count) for item in sym_spell.lookup(word, Verbosity.ALL, 2)]
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("".join(f"{word} {count}\n" for word, count in WORDS.items()))
+    return str(path)
+
+
+def test_mapped_index_answers_like_the_dictionary(dictionary, tmp_path):
+    plain = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
+    plain.load_dictionary(dictionary, term_index=0, count_index=1)
+    cache_path = str(tmp_path / "words.idx")
+    built = load_sym_spell(dictionary, cache_path=cache_path)
+    mapped = load_sym_spell(dictionary, cache_path=cache_path)
+    assert len(mapped._deletes) == len(plain._deletes)
+    assert set(mapped._deletes) == set(plain._deletes)
+    for word in ["speling", "mispelled", "teh", "the", "qwzxv", "tn"]:
+        assert terms(mapped, word) == terms(plain, word) == terms(built, word)
+
+
+def test_broken_index_is_rebuilt(dictionary, tmp_path):
+    cache_path = tmp_path / "words.idx"
+    cache_path.write_bytes(b"SYMIDX01 cut short")
+    assert terms(load_sym_spell(dictionary, cache_path=str(cache_path)), "speling")[0][0] == "spelling"
+    assert cache_path.stat().st_size > 100
+
+
+def test_changed_dictionary_gets_its_own_index(dictionary):
+    before = index_path(dictionary, 2, 7)
+    with open(dictionary, "a") as file:
+        file.write("tee 5\n")
+    assert index_path(dictionary, 2, 7) != before
+    assert index_path(dictionary, 1, 7) != index_path(dictionary, 2, 7)
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_warm_load():
+    dictionary = str(importlib.resources.files("symspellpy") / "frequency_dictionary_en_82_765.txt")
+    load_sym_spell(dictionary)
+    start = time.perf_counter()
+    sym_spell = load_sym_spell(dictionary)
+    warm = time.perf_counter() - start
+    start = time.perf_counter()
+    plain = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
+    plain.load_dictionary(dictionary, term_index=0, count_index=1)
+    build = time.perf_counter() - start
+    print(f"\nwarm load {warm * 1000:.0f} ms, building from the text file {build:.1f}s")
+    assert terms(sym_spell, "speling") == terms(plain, "speling")
+    assert warm < build / 10
+
+
+def test_importing_the_checker_loads_no_dictionary():
+    code = "import sys; import chats_v28.preprompt.spelling_utils; print('symspellpy' in sys.modules)"
+    loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip()
+    assert loaded == "False"
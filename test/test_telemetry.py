@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from chats import telemetry
+from chats.telemetry import Telemetry, estimate_cost, percentile, read_records, summarize, tracked
+
+
+@pytest.fixture
+def recorder(monkeypatch, tmp_path):
+    recorder = Telemetry(str(tmp_path / "telemetry.jsonl"))
+    monkeypatch.setattr(telemetry, "TELEMETRY", recorder)
+    return recorder
+
+
+class FakeConversation:
+    def __init__(self):
+        self.assistant = SimpleNamespace(name="Judge Bot", model="gpt-3.5-turbo")
+        self.thread_id = "thread_1"
+
+    @tracked("run")
+    async def poll_the_run(self, again: bool = True):
+        telemetry.current_record().poll_seconds += 0.5
+        if again:
+            # nested polls count toward the outer one
+            await self.poll_the_run(again=False)
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=500))
+
+    @tracked("create_run")
+    async def create_run(self):
+        raise ValueError("boom")
+
+
+def test_tracked_records_usage_and_nesting(recorder):
+    convo = FakeConversation()
+    asyncio.run(convo.poll_the_run())
+    with pytest.raises(ValueError):
+        asyncio.run(convo.create_run())
+
+    run, failed = read_records(recorder.path)
+    assert run["operation"] == "run" and run["bot"] == "Judge Bot" and run["thread_id"] == "thread_1"
+    assert run["poll_seconds"] == 1.0
+    assert (run["prompt_tokens"], run["completion_tokens"]) == (1000, 500)
+    assert run["cost"] == estimate_cost("gpt-3.5-turbo", 1000, 500) == 0.002
+    assert not failed["ok"] and failed["error"] == "ValueError: boom"
+
+
+def test_summary_cli(recorder, capsys):
+    for seconds in [1, 2, 3, 4, 100]:
+        with recorder.track("completion", bot="create_book", model="text-davinci-003") as record:
+            record.add_usage({"usage": {"prompt_tokens": 10, "completion_tokens": 20}})
+    records = read_records(recorder.path)
+    for record, seconds in zip(records, [1, 2, 3, 4, 100]):
+        record["wall_seconds"] = seconds
+
+    (row,) = summarize(records)
+    assert row["group"] == "create_book / completion"
+    assert (row["calls"], row["p50"], row["p95"], row["prompt_tokens"]) == (5, 3, 100, 50)
+    assert percentile([], 0.5) == 0.0
+
+    telemetry.run(["summary", recorder.path])
+    assert "create_book / completion" in capsys.readouterr().out
+
+
+def test_one_http_client_per_event_loop(recorder):
+    async def clients():
+        return recorder.http_client(), recorder.http_client()
+
+    first, same = asyncio.run(clients())
+    second, _ = asyncio.run(clients())
+    assert first is same
+    assert second is not first
+    # the first loop is closed, its client is dropped
+    assert list(recorder.http_clients.values()) == [second]
+
+    async def close():
+        client = recorder.http_client()
+        await recorder.aclose()
+        return client
+
+    assert asyncio.run(close()).is_closed
+
+
+def test_client_outside_a_loop_is_not_shared(recorder):
+    first, second = recorder.http_client(), recorder.http_client()
+    assert first is not second
+    assert recorder.http_clients == {}
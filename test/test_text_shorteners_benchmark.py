@@ -0,0 +1,106 @@
+import os
+import random
+import time
+
+import pytest
+
+from markdown_it import MarkdownIt
+from mdit_plain.renderer import RendererPlain
+from nltk.tokenize import RegexpTokenizer
+
+from chats.tool_code import text_shorteners
+from chats.tool_code.text_shorteners import convert_md_to_text, md_text_pieces, word_count
+
+BLOCKS = [
+    "# Title\n",
+    "Some *emphasis* and `code` in a paragraph,\na lazy line continues it.\n",
+    "Setext heading\n==============\n",
+    "- item one\n- item two\n\n  still item two\n- three\n",
+    "1. first\n2. second\n",
+    "```python\nx = 1\n\ny = 2\n```\n",
+    "    indented code\n    more code\n",
+    "<div>\n<b>html</b> block\n</div>\n",
+    "> a quote\nlazy quote\n> more quote\n",
+    "---\n",
+    "A hard  \nbreak and a [link](https://example.com).\n",
+]
+
+
+def readme(blocks: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return "\n".join(rng.choice(BLOCKS) for _ in range(blocks))
+
+
+def convert_md_to_text_uncached(md_data: str) -> str:
+    return MarkdownIt(renderer_cls=RendererPlain).render(md_data)
+
+
+def word_count_uncached(text: str) -> int:
+    return len(RegexpTokenizer(r"\w+").tokenize(text))
+
+
+def test_parser_and_tokenizer_are_built_once():
+    assert text_shorteners.markdown_parser() is text_shorteners.markdown_parser()
+    assert text_shorteners.word_tokenizer() is text_shorteners.word_tokenizer()
+
+
+def test_truncated_text_is_the_start_of_the_whole_text():
+    for seed in range(30):
+        md_data = readme(random.Random(seed).randint(1, 150), seed)
+        full = convert_md_to_text_uncached(md_data)
+        assert convert_md_to_text(md_data) == full
+        for max_chars in [1, 50, 1000, 10**6]:
+            assert convert_md_to_text(md_data, max_chars) == full[:max_chars]
+        # a one line window has to grow to fit lists, fences and quotes
+        assert "".join(md_text_pieces(md_data, window_lines=1)).strip() == full
+
+
+def test_empty_markdown():
+    assert convert_md_to_text("", 1000) == ""
+    assert convert_md_to_text("\n\n", 1000) == ""
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_word_count():
+    lots_of_text = text_shorteners.LOTS_OF_TEXT
+    texts = [lots_of_text[start : start + 500] for start in range(0, len(lots_of_text), 50)]
+    word_count("warm up")
+
+    start = time.perf_counter()
+    uncached = [word_count_uncached(text) for text in texts]
+    uncached_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    cached = [word_count(text) for text in texts]
+    cached_seconds = time.perf_counter() - start
+    print(f"\n{len(texts)} texts: tokenizer per call {uncached_seconds:.4f}s, cached tokenizer {cached_seconds:.4f}s")
+    assert cached == uncached
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_convert_md_to_text():
+    # a few MB, like the biggest READMEs on PyPI
+    md_data = readme(60_000)
+    convert_md_to_text("warm up")
+
+    start = time.perf_counter()
+    readmes = [readme(40, seed) for seed in range(200)]
+    uncached = [convert_md_to_text_uncached(text) for text in readmes]
+    uncached_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    cached = [convert_md_to_text(text) for text in readmes]
+    cached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    whole = convert_md_to_text(md_data)[:1000]
+    whole_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    truncated = convert_md_to_text(md_data, 1000)
+    truncated_seconds = time.perf_counter() - start
+    print(
+        f"\n200 READMEs: parser per call {uncached_seconds:.3f}s, cached parser {cached_seconds:.3f}s"
+        f"\n{len(md_data) / 1e6:.1f} MB README to 1000 characters: whole render {whole_seconds:.3f}s, "
+        f"streamed {truncated_seconds * 1000:.1f} ms"
+    )
+    assert cached == uncached
+    assert truncated == whole
+    assert truncated_seconds < whole_seconds / 10
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+from chats.telemetry import TELEMETRY
+from chats.thread_budget import ThreadBudget
+
+
+@pytest.fixture(autouse=True)
+def no_telemetry(monkeypatch):
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+
+
+def message(number: int, role: str, text: str) -> SimpleNamespace:
+    return SimpleNamespace(id=f"msg_{number}", role=role, content=[SimpleNamespace(text=SimpleNamespace(value=text))])
+
+
+class FakeConvo:
+    """Just enough of BotConversation, threads are lists of messages"""
+
+    def __init__(self):
+        self.assistant = SimpleNamespace(name="Review bot")
+        self.threads: dict[str, list] = {}
+        self.deleted: list[str] = []
+        self.thread = None
+        self.summarized: list[str] = []
+        self.thread_id = None
+        self.messages = 0
+        self.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self.summarize)))
+
+    async def create_thread(self):
+        self.thread_id = f"thread_{len(self.threads) + 1}"
+        self.thread = SimpleNamespace(id=self.thread_id)
+        self.threads[self.thread_id] = []
+
+    async def delete_thread(self, thread_id=None):
+        self.deleted.append(thread_id or self.thread_id)
+
+    async def add(self, role: str, text: str):
+        self.messages += 1
+        new = message(self.messages, role, text)
+        self.threads[self.thread_id].append(new)
+        return new
+
+    async def add_user_message(self, content: str):
+        return await self.add("user", content)
+
+    async def display_most_recent_bot_message(self):
+        return self.threads[self.thread_id][-1]
+
+    async def summarize(self, model: str, messages: list):
+        self.summarized.append(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="short summary"))], usage=None)
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+async def review(budget: ThreadBudget, convo: FakeConvo, turns: int) -> None:
+    await convo.create_thread()
+    for turn in range(turns):
+        await budget.add_user_message(f"review file {turn}")
+        await budget.before_run()
+        # the run adds the bot's reply
+        await convo.add("assistant", " ".join(["looks fine"] * 50))
+        await budget.latest_reply()
+
+
+def test_under_budget_nothing_changes():
+    convo = FakeConvo()
+    budget = ThreadBudget(convo, max_tokens=10_000, counter=words)
+    asyncio.run(review(budget, convo, 5))
+    assert list(convo.threads) == ["thread_1"]
+    assert budget.tokens_saved == 0
+    assert budget.thread_tokens == 5 * (3 + 4) + 5 * (100 + 4)
+
+
+@pytest.mark.parametrize("policy", ["drop_oldest", "summarize", "new_thread"])
+def test_over_budget_moves_to_a_smaller_thread(policy):
+    convo = FakeConvo()
+    budget = ThreadBudget(convo, max_tokens=300, policy=policy, keep_turns=1, counter=words)
+    asyncio.run(review(budget, convo, 10))
+
+    assert len(convo.threads) > 1
+    # every thread but the current one was cleaned up
+    assert sorted(convo.deleted) == sorted(set(convo.threads) - {convo.thread_id})
+    assert all(report.thread_tokens <= 300 + 111 for report in budget.reports)
+    assert budget.reports[-1].untrimmed_tokens == 10 * 7 + 9 * 104
+    assert budget.tokens_saved > 0
+    seed = convo.threads[convo.thread_id][0].content[0].text.value
+    if policy == "drop_oldest":
+        assert not convo.summarized
+        assert "review file" in seed
+    else:
+        assert "short summary" in seed
+        assert convo.summarized
+
+
+def test_summary_only_covers_older_turns():
+    convo = FakeConvo()
+    budget = ThreadBudget(convo, max_tokens=300, policy="summarize", keep_turns=1, counter=words)
+    asyncio.run(review(budget, convo, 4))
+    first_summary = convo.summarized[0]
+    assert "review file 0" in first_summary
+    assert "review file 3" not in first_summary
+    seed = convo.threads[convo.thread_id][0].content[0].text.value
+    assert "review file 3" in seed
+
+
+def test_pickled_conversation_follows_the_new_thread(tmp_path, monkeypatch):
+    def thread_file(bot_name: str, thread_id: str) -> str:
+        return str(tmp_path / f"{thread_id}.pkl")
+
+    monkeypatch.setattr("chats.bots.calculate_thread_file_name", thread_file)
+    convo = FakeConvo()
+    budget = ThreadBudget(convo, max_tokens=300, policy="drop_oldest", keep_turns=1, counter=words)
+
+    async def main():
+        await convo.create_thread()
+        with open(tmp_path / "thread_1.pkl", "wb") as convo_file:
+            pickle.dump(convo.thread, convo_file)
+        for turn in range(4):
+            await budget.add_user_message(f"review file {turn}")
+            await budget.before_run()
+            await convo.add("assistant", " ".join(["looks fine"] * 50))
+            await budget.latest_reply()
+
+    asyncio.run(main())
+    assert os.listdir(tmp_path) == [f"{convo.thread_id}.pkl"]
+    with open(tmp_path / f"{convo.thread_id}.pkl", "rb") as convo_file:
+        assert pickle.load(convo_file).id == convo.thread_id
+
+
+@pytest.mark.parametrize("policy, keep_turns", [("drop_oldest", 0), ("summarize", 0), ("new_thread", 2)])
+def test_latest_message_is_never_summarized(policy, keep_turns):
+    convo = FakeConvo()
+    budget = ThreadBudget(convo, max_tokens=300, policy=policy, keep_turns=keep_turns, counter=words)
+    asyncio.run(review(budget, convo, 4))
+
+    assert all("review file 3" not in summarized for summarized in convo.summarized)
+    seed = convo.threads[convo.thread_id][0].content[0].text.value
+    assert "user: review file 3" in seed
@@ -0,0 +1,50 @@
+import os
+import time
+
+import pytest
+import tiktoken
+
+from chats import token_utils
+
+TEXTS = [f"Tool call number {i}, please count the tokens in this sentence." for i in range(2000)]
+
+
+def count_tokens_uncached(text: str) -> int:
+    encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    return len(encoding.encode(text))
+
+
+def test_registry_returns_same_encoder():
+    assert token_utils.get_encoder("gpt-3.5-turbo") is token_utils.get_encoder("gpt-3.5-turbo")
+    assert token_utils.get_encoder("text-davinci-003").name == "p50k_base"
+    assert token_utils.get_encoder("p50k_base").name == "p50k_base"
+
+
+def test_count_tokens_many_matches_count_tokens():
+    expected = [token_utils.count_tokens(text) for text in TEXTS[:50]]
+    assert token_utils.count_tokens_many(TEXTS[:50]) == expected
+    assert token_utils.count_tokens_many([]) == []
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_SLOW_BENCHMARKS"), reason="wall clock timing, set RUN_SLOW_BENCHMARKS=1")
+def test_benchmark_count_tokens():
+    # warm up so the one time BPE load isn't measured
+    token_utils.count_tokens("warm up")
+
+    start = time.perf_counter()
+    uncached = [count_tokens_uncached(text) for text in TEXTS]
+    uncached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = [token_utils.count_tokens(text) for text in TEXTS]
+    cached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = token_utils.count_tokens_many(TEXTS)
+    batched_seconds = time.perf_counter() - start
+
+    print(
+        f"\n{len(TEXTS)} texts: encoding_for_model per call {uncached_seconds:.4f}s, "
+        f"registry {cached_seconds:.4f}s, encode_batch {batched_seconds:.4f}s"
+    )
+    assert uncached == cached == batched
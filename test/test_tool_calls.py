@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai.types.beta import Assistant
+
+from chats import bot_shell
+from chats.bot_shell import BotConversation
+from chats.telemetry import TELEMETRY
+from chats.tool_code import tools
+from chats.tool_code.pypi_info import PyPIChecker
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(bot_shell, "write_json_to_logs", lambda obj, kind: None)
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+
+
+def make_run(*calls: tuple[str, dict]):
+    tool_calls = [
+        SimpleNamespace(id=f"call_{i}", function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+        for i, (name, arguments) in enumerate(calls)
+    ]
+    return SimpleNamespace(required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=tool_calls)))
+
+
+def test_tool_calls_run_concurrently(monkeypatch):
+    lock = threading.Lock()
+    running = {"now": 0, "most": 0}
+
+    def enter():
+        with lock:
+            running["now"] += 1
+            running["most"] = max(running["most"], running["now"])
+
+    def leave():
+        with lock:
+            running["now"] -= 1
+
+    async def slow_describe(self, names):
+        enter()
+        await asyncio.sleep(0.4)
+        leave()
+        return {name: {"summary": "?"} for name in names}
+
+    async def slow_exist(self, names):
+        enter()
+        await asyncio.sleep(0.4)
+        leave()
+        return {name: True for name in names}
+
+    def slow_count(text):
+        enter()
+        time.sleep(0.4)
+        leave()
+        return len(text)
+
+    monkeypatch.setattr(PyPIChecker, "describe_packages", slow_describe)
+    monkeypatch.setattr(PyPIChecker, "packages_exist", slow_exist)
+    monkeypatch.setattr(tools, "_count_tokens", slow_count)
+    run = make_run(
+        ("describe_packages", {"package_names": ["faker"]}),
+        ("packages_exists", {"package_names": ["faker"]}),
+        ("count_tokens", {"text": "four"}),
+    )
+
+    convo = BotConversation(Assistant.construct(id="asst_fake"))
+    results = asyncio.run(convo.run_tool_calls(run))
+
+    # one after the other would never have more than one running
+    assert running["most"] == 3
+    assert [result["tool_call_id"] for result in results] == ["call_0", "call_1", "call_2"]
+    assert json.loads(results[2]["output"]) == 4
+
+
+def test_slow_tool_times_out(monkeypatch):
+    async def hang(self, names):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(PyPIChecker, "packages_exist", hang)
+    convo = BotConversation(Assistant.construct(id="asst_fake"))
+    convo.tool_timeouts["packages_exists"] = 0.1
+    run = make_run(
+        ("packages_exists", {"package_names": ["x"]}),
+        ("package_is_stdlib", {"package_names": ["io"]}),
+    )
+    results = asyncio.run(convo.run_tool_calls(run))
+    assert "error" in json.loads(results[0]["output"])
+    assert json.loads(results[1]["output"]) == {"io": True}
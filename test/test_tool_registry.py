@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import pytest
+
+from chats.tool_code.tools import TOOLS
+from chats.tool_registry import ToolRegistry
+
+REGISTRY = ToolRegistry()
+
+
+@REGISTRY.tool(kind="cpu")
+def which_process(numbers: list[int], scale: float = 1.0) -> dict:
+    """Report the worker process
+
+    Args:
+        numbers(list[int]): Some numbers
+        scale: Multiplier
+    """
+    return {"pid": os.getpid(), "total": sum(numbers) * scale}
+
+
+def test_schema_from_signature_and_docstring():
+    definition = TOOLS.get("packages_exists").definition
+    assert definition.name == "packages_exists"
+    assert definition.description == "Check if a package exists on pypi"
+    assert definition.parameters == {
+        "type": "object",
+        "properties": {
+            "package_names": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Names of packages we want to check for existence",
+            },
+        },
+        "required": ["package_names"],
+    }
+    # keyword-only context isn't exposed to the bot
+    assert TOOLS.get("packages_exists").context == ["checker"]
+
+    optional = REGISTRY.get("which_process").definition.parameters
+    assert optional["required"] == ["numbers"]
+    assert optional["properties"]["scale"] == {"type": "number", "description": "Multiplier"}
+
+
+def test_assistant_tools():
+    tools = TOOLS.assistant_tools("count_tokens", "readability_scores", "word_count")
+    assert [tool.function.name for tool in tools] == ["count_tokens", "readability_scores", "word_count"]
+    assert all(tool.type == "function" for tool in tools)
+    with pytest.raises(Exception, match="Unknown function name"):
+        TOOLS.get("rm_rf")
+
+
+def test_cpu_tools_run_in_another_process():
+    result = asyncio.run(REGISTRY.call("which_process", {"numbers": [1, 2, 3], "ignored": True}))
+    assert result["total"] == 6
+    assert result["pid"] != os.getpid()
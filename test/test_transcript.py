@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+from chats.document_shell import Document
+from chats.response_cache import ResponseCache
+from chats.telemetry import TELEMETRY
+from chats.transcript import Transcript
+
+
+class CountingCounter:
+    """Counts words, and how many characters it was asked to count"""
+
+    def __init__(self):
+        self.characters = 0
+
+    def __call__(self, text: str) -> int:
+        self.characters += len(text)
+        return len(text.split())
+
+
+def test_each_segment_is_counted_once():
+    counter = CountingCounter()
+    transcript = Transcript(counter)
+    for turn in range(200):
+        transcript.add(f"user: question {turn}\n\nbot:", new_turn=True)
+        transcript.add(f"\nanswer number {turn}\n")
+    rendered = transcript.render()
+    assert transcript.total_tokens == len(rendered.split())
+    assert counter.characters == len(rendered)
+
+
+def test_render_only_joins_new_segments():
+    transcript = Transcript(len)
+    transcript.add("a", new_turn=True)
+    first = transcript.render()
+    transcript.add("b")
+    assert first == "a"
+    assert transcript.render() == "ab"
+
+
+def test_sliding_window_drops_whole_old_turns():
+    transcript = Transcript(lambda text: len(text.split()))
+    for turn in range(10):
+        transcript.add(f"user: one two three {turn}\n", new_turn=True)
+        transcript.add(f"bot: four five {turn}\n")
+    assert transcript.total_tokens == 90
+
+    dropped = transcript.trim(budget=30)
+    assert dropped == 63
+    assert transcript.total_tokens == 27
+    assert transcript.render().startswith("user: one two three 7\n")
+    assert transcript.dropped_tokens == 63
+
+
+def test_last_turn_is_never_dropped():
+    transcript = Transcript(len)
+    transcript.add("x" * 100, new_turn=True)
+    transcript.trim(budget=10)
+    assert transcript.total_tokens == 100
+
+
+def test_summary_replaces_old_turns():
+    transcript = Transcript(lambda text: len(text.split()))
+    for turn in range(10):
+        transcript.add(f"user: one two three {turn}\n", new_turn=True)
+        transcript.add(f"bot: four five {turn}\n")
+    seen = []
+
+    async def summarize(text: str) -> str:
+        seen.append(text)
+        return "summary: they counted\n"
+
+    asyncio.run(transcript.summarize_oldest(budget=30, summarize=summarize))
+    assert transcript.summary() == "summary: they counted\n"
+    assert transcript.render().startswith("summary: they counted\nuser: one two three 7\n")
+    assert "user: one two three 0" in seen[0]
+    assert transcript.total_tokens <= 30
+
+    # the next summary folds in the earlier one
+    for turn in range(10, 14):
+        transcript.add(f"user: one two three {turn}\n", new_turn=True)
+    asyncio.run(transcript.summarize_oldest(budget=30, summarize=summarize))
+    assert seen[1].startswith("summary: they counted\n")
+    assert transcript.render().count("summary:") == 1
+
+
+def test_document_trims_to_fit_the_context(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "not-a-key")
+    monkeypatch.setattr(TELEMETRY, "enabled", False)
+    prompts = []
+
+    class FakeCompletions:
+        async def create(self, **kwargs):
+            prompts.append(kwargs["prompt"])
+
+            async def stream():
+                yield SimpleNamespace(choices=[SimpleNamespace(text="word " * 50)])
+
+            return stream()
+
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    document = Document(cache=cache, token_counter=lambda text: len(text.split()), context_tokens=1200)
+    document.client.completions = FakeCompletions()
+
+    async def main():
+        for turn in range(10):
+            await document.prompt(f"question {turn}")
+
+    asyncio.run(main())
+    assert all(len(prompt.split()) <= 200 for prompt in prompts)
+    # 53 words a turn, three whole turns and the new question fit in 1200 - 1000
+    assert prompts[-1].startswith("user: question 6\n")
+    assert document.transcript.dropped_tokens > 0